@@ -0,0 +1,67 @@
+"""Benchmarks for each stage of DomainCreator.create_domain.
+
+Each stage runs once per benchmark as the Boolean operations take tens of seconds.
+"""
+import pytest
+from protoblade import cad
+from conftest import synthetic_blade, synthetic_endwalls, AXIS
+
+pytestmark = pytest.mark.cad
+
+BLADES = {
+    'synthetic_100x3': lambda machine: (synthetic_blade(100, 3), synthetic_endwalls()),
+    'synthetic_500x11': lambda machine: (synthetic_blade(500, 11), synthetic_endwalls()),
+    'vki': lambda machine: (machine.stages[0].blades[0], machine.stages[0].endwalls),
+}
+
+
+@pytest.fixture(params=list(BLADES))
+def creator(request, vki_machine):
+    blade_def, endwalls = BLADES[request.param](vki_machine)
+    return cad.DomainCreator(blade_def, endwalls, 'metres', AXIS)
+
+
+def _run_once(benchmark, function, setup=None):
+    return benchmark.pedantic(function, setup=setup, rounds=1, iterations=1)
+
+
+SPLINE_BUILDERS = {
+    'make_spline': lambda section, cq: cad._make_spline(section, cq),
+    'cadquery': lambda section, cq: cq.Edge.makeSpline([cq.Vector(*pt) for pt in section.tolist()]),
+}
+
+
+@pytest.mark.parametrize('builder', list(SPLINE_BUILDERS))
+def test_make_spline(benchmark, creator, builder):
+    sections = creator.blade_def.ps_stack.xyz
+    cq = creator._cq
+
+    edges = benchmark(lambda: [SPLINE_BUILDERS[builder](section, cq) for section in sections])
+    assert len(edges) == len(sections)
+
+
+def test_extrude_blade(benchmark, creator):
+    _run_once(benchmark, creator.extrude_blade)
+
+
+def test_create_endwalls(benchmark, creator):
+    _run_once(benchmark, creator.create_endwalls)
+
+
+def test_create_periodic(benchmark, creator):
+    creator.create_endwalls()
+
+    _run_once(benchmark, creator.create_periodic)
+
+
+def test_intersect(benchmark, creator):
+    creator.create_endwalls()
+    creator.create_periodic()
+
+    # the same Boolean operation, with the same options, as create_domain
+    _run_once(benchmark, lambda: creator._boolean('common', [creator.per], creator.cad_endwalls.vals()))
+
+
+def test_create_domain(benchmark, creator):
+    _run_once(benchmark, creator.create_domain)
+    assert creator.domain.val().Volume() > 0.0
@@ -0,0 +1,84 @@
+"""Benchmarks for the NumPy geometry kernels."""
+import numpy as np
+import pytest
+from protoblade import geom, blade
+from conftest import synthetic_blade, synthetic_profile, write_fpd, R_HUB, R_SHROUD
+
+N_POINTS = [100, 500, 1000]
+N_SECTIONS = [3, 11]
+
+
+@pytest.mark.parametrize('n_sections', N_SECTIONS)
+@pytest.mark.parametrize('n_points', N_POINTS)
+def test_load_curves_from_fpd(benchmark, tmp_path, n_points, n_sections):
+    fname = tmp_path / 'ps.fpd'
+    write_fpd(fname, synthetic_blade(n_points, n_sections).ps_sections)
+
+    pts = benchmark(geom.load_curves_from_fpd, fname)
+    assert pts.shape == (n_sections, n_points)
+
+
+@pytest.mark.parametrize('n_points', N_POINTS)
+def test_load_curves_from_fpd_cached(benchmark, tmp_path, n_points):
+    fname = tmp_path / 'ps.fpd'
+    write_fpd(fname, synthetic_blade(n_points, 11).ps_sections)
+    geom.load_curves_from_fpd(fname, cache_dir=tmp_path / 'cache')
+
+    benchmark(geom.load_curves_from_fpd, fname, cache_dir=tmp_path / 'cache')
+
+
+@pytest.mark.parametrize('n_points', N_POINTS)
+def test_calculate_curve_length(benchmark, n_points):
+    ps, _ = synthetic_profile(n_points)
+
+    benchmark(geom.calculate_curve_length, ps['x'], ps['y'])
+
+
+@pytest.mark.parametrize('n_points', N_POINTS)
+def test_reinterpolate_curve(benchmark, n_points):
+    ps, _ = synthetic_profile(n_points)
+    s = geom.calculate_curve_length(ps['x'], ps['y'])
+
+    benchmark(geom.reinterpolate_curve, ps['x'], ps['y'], s, base=1.5, N_new=n_points // 2)
+
+
+@pytest.mark.parametrize('n_points', N_POINTS)
+def test_reinterpolate_curves(benchmark, n_points):
+    blade_def = synthetic_blade(n_points, 200)
+    x = blade_def.ps_sections['z']
+    y = blade_def.ps_sections['y']
+
+    def reinterpolate():
+        return geom.reinterpolate_curves(x, y, geom.calculate_curve_lengths(x, y), base=1.5, N_new=n_points // 2)
+
+    x_new, _, _ = benchmark(reinterpolate)
+    assert x_new.shape == (200, 2 * (n_points // 2) - 1)
+
+
+@pytest.mark.parametrize('engine', sorted(geom.MIDLINE_ENGINES))
+@pytest.mark.parametrize('n_sections', N_SECTIONS)
+@pytest.mark.parametrize('n_points', N_POINTS)
+def test_create_midlines(benchmark, n_points, n_sections, engine):
+    if engine == 'loop' and n_points * n_sections > 1000:
+        pytest.skip('the loop engine is too slow for large blades')
+    blade_def = synthetic_blade(n_points, n_sections)
+
+    mid_lines = benchmark(geom.create_midlines, blade_def.ps_sections, blade_def.ss_sections, -0.02, 0.06,
+                          blade_def.pitch_angle_rad, engine=engine)
+    assert len(mid_lines) == n_sections
+
+
+@pytest.mark.parametrize('n_sections', N_SECTIONS)
+@pytest.mark.parametrize('n_points', N_POINTS)
+def test_create_sections_from_2D_profile(benchmark, n_points, n_sections):
+    ps, ss = synthetic_profile(n_points)
+
+    benchmark(blade.create_sections_from_2D_profile, ps, ss, n_sections, (R_HUB, R_SHROUD), n_resample=n_points // 2)
+
+
+@pytest.mark.parametrize('n_points', N_POINTS)
+def test_extrude_radially(benchmark, n_points):
+    blade_def = synthetic_blade(n_points, 3)
+
+    extruded = benchmark(geom.extrude_radially, blade_def.ps_sections[0], -0.005)
+    np.testing.assert_array_equal(extruded['z'], blade_def.ps_sections[0]['z'])
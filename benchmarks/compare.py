@@ -0,0 +1,72 @@
+"""Compare a benchmark run against a stored baseline.
+
+Both files are pytest-benchmark JSON files, e.g. created with --benchmark-json or --benchmark-autosave. Any benchmark
+whose mean time has increased by more than the threshold is reported as a regression and the script exits with a
+non-zero status.
+
+Example:
+    python compare.py baselines/baseline.json results.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+
+
+def load_means(fname: str) -> dict:
+    """Load the mean time of each benchmark in a pytest-benchmark JSON file, keyed by full name."""
+    with open(fname) as f:
+        data = json.load(f)
+    return {bench['fullname']: bench['stats']['mean'] for bench in data['benchmarks']}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> tuple:
+    """
+    Compare two sets of benchmark means.
+
+    Args:
+        baseline: mean times of the baseline run keyed by benchmark name
+        current: mean times of the current run keyed by benchmark name
+        threshold: fractional increase in mean time above which a benchmark is a regression
+
+    Returns:
+        (report, n_regressions), a human readable table and the number of regressions
+
+    """
+    lines = [f'{"benchmark":<90} {"baseline (ms)":>14} {"current (ms)":>14} {"ratio":>7}  status']
+    n_regressions = 0
+    for name in sorted(set(baseline) | set(current)):
+        if name not in current:
+            lines.append(f'{name:<90} {baseline[name] * 1e3:>14.3f} {"-":>14} {"-":>7}  missing')
+            continue
+        if name not in baseline:
+            lines.append(f'{name:<90} {"-":>14} {current[name] * 1e3:>14.3f} {"-":>7}  new')
+            continue
+
+        ratio = current[name] / baseline[name]
+        if ratio > 1.0 + threshold:
+            status = 'REGRESSION'
+            n_regressions += 1
+        elif ratio < 1.0 - threshold:
+            status = 'improved'
+        else:
+            status = 'ok'
+        lines.append(f'{name:<90} {baseline[name] * 1e3:>14.3f} {current[name] * 1e3:>14.3f} {ratio:>7.2f}  {status}')
+
+    lines.append(f'{n_regressions} regression(s) with a threshold of {threshold:.0%}')
+    return '\n'.join(lines), n_regressions
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='Compare protoblade benchmark results against a baseline.')
+    parser.add_argument('baseline', help='pytest-benchmark JSON file of the baseline run.')
+    parser.add_argument('current', help='pytest-benchmark JSON file of the run to check.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Fractional increase in mean time reported as a regression.')
+    return parser
+
+
+if __name__ == '__main__':
+    args = create_parser().parse_args()
+    report, n_regressions = compare(load_means(args.baseline), load_means(args.current), args.threshold)
+    print(report)
+    sys.exit(1 if n_regressions else 0)
@@ -0,0 +1,67 @@
+"""Synthetic and example blades used by the benchmarks."""
+import pathlib
+import numpy as np
+import pytest
+from protoblade import geom, blade, stage, machine
+
+example_dir = pathlib.Path(__file__).parent.parent / 'examples'
+
+R_HUB = 0.2585
+R_SHROUD = 0.2865
+AXIS = ((0.0, 0.0, 0.0), (0.0, 0.0, 1.0))
+
+
+def synthetic_profile(n_points: int, chord: float = 0.04) -> tuple:
+    """
+    Create a cambered profile in the Z, R-Theta plane with n_points on each surface.
+
+    The profile is returned as two arrays of dtype cartesian_type where 'x' is the axial and 'y' the R-Theta
+    co-ordinate, as expected by blade.create_sections_from_2D_profile. Both surfaces start at the leading edge and
+    finish at the trailing edge.
+    """
+    # blend cosine and uniform spacing to cluster points at the edges while keeping them far enough apart for OCC
+    u = np.linspace(0.0, 1.0, n_points)
+    s = 0.5 * (u + 0.5 * (1.0 - np.cos(np.pi * u)))
+    camber = 0.3 * chord * 4.0 * s * (1.0 - s)
+    thickness = 0.12 * chord * (2.969 * np.sqrt(s) - 1.26 * s - 3.516 * s ** 2 + 2.843 * s ** 3 - 1.036 * s ** 4)
+
+    ps = np.zeros(n_points, dtype=geom.cartesian_type)
+    ss = np.zeros(n_points, dtype=geom.cartesian_type)
+    ps['x'] = ss['x'] = chord * s
+    ps['y'] = camber - 0.5 * thickness
+    ss['y'] = camber + 0.5 * thickness
+    return ps, ss
+
+
+def synthetic_blade(n_points: int, n_sections: int, n_blade: int = 60) -> blade.Blade:
+    """Create a blade by stacking a synthetic profile across a span slightly larger than the endwalls."""
+    ps, ss = synthetic_profile(n_points)
+    ps_sections, ss_sections = blade.create_sections_from_2D_profile(ps, ss, n_sections,
+                                                                     (R_HUB - 0.003, R_SHROUD + 0.003))
+    return blade.Blade(name=f'synthetic_{n_points}x{n_sections}', n_blade=n_blade,
+                       ps_sections=np.array(ps_sections), ss_sections=np.array(ss_sections))
+
+
+def synthetic_endwalls(n_points: int = 5) -> stage.Endwalls:
+    """Create constant radius fpd endwalls which cover the synthetic blade axially."""
+    hub = np.zeros(n_points, dtype=geom.cartesian_type)
+    shroud = np.zeros(n_points, dtype=geom.cartesian_type)
+    hub['z'] = shroud['z'] = np.linspace(-0.02, 0.06, n_points)
+    hub['x'] = R_HUB
+    shroud['x'] = R_SHROUD
+    return stage.Endwalls(type='fpd', hub=hub, shroud=shroud)
+
+
+def write_fpd(fname: pathlib.Path, sections: np.ndarray) -> None:
+    """Write an array of sections to a fpd file."""
+    sections = np.atleast_2d(sections)
+    with open(fname, 'w') as f:
+        f.write(f'{sections.shape[1]} {sections.shape[0]}\n')
+        xyz = np.stack((sections['x'], sections['y'], sections['z']), axis=-1).reshape(-1, 3)
+        np.savetxt(f, xyz)
+
+
+@pytest.fixture()
+def vki_machine(monkeypatch):
+    monkeypatch.chdir(example_dir / 'axial_turbine')
+    return machine.Machine.from_config_file('axial_turbine.toml')
@@ -1,26 +1,198 @@
+import os
+import sys
+import time
 from protoblade.machine import Machine
-from protoblade.cad import DomainCreator
-from protoblade.cli import create_parser
+from protoblade.cli import (boolean_overrides, create_cache_parser, create_parser, create_sweep_parser,
+                            create_validate_parser)
+from protoblade import checks, preview, runner, sweep
+from protoblade.cache import DEFAULT_MAX_BYTES, clear_cache_dir
+from protoblade.cad import DEFAULT_ANGULAR_TOLERANCE, DEFAULT_TOLERANCE
+from protoblade.profiling import Profiler
 
 
-def main(fname, output_filename=None):
+def main(fname, output_filename=None, cache_dir=None, jobs=1, cache_max_bytes=DEFAULT_MAX_BYTES, profile=None,
+         profile_format='json', boolean=None, passages=1, fuse_passages=False, preflight=True, lod='full',
+         manifest=None, force=False, export_format='step', entities=('domain',), tolerance=DEFAULT_TOLERANCE,
+         angular_tolerance=DEFAULT_ANGULAR_TOLERANCE):
+    """
+    Create and export the fluid domain of every blade row in a machine.
+
+    Args:
+        fname: path to the toml file defining the machine
+        output_filename: base name for the output files, its suffix sets their format. Defaults to fname with the
+            suffix of export_format
+        cache_dir: directory used to cache parsed input files and intermediate solids, set to None to disable caching
+        jobs: number of processes used to build the blade rows, set to 0 or less to use every core
+        cache_max_bytes: maximum size of the intermediate solid cache in bytes
+        profile: file name to write a profile of each step to, set to None to disable profiling
+        profile_format: format of the profile file, 'json' or 'chrome'
+        boolean: Boolean options which override those in the machine file, e.g. {'fuzzy': 1e-6}
+        passages: number of passages of each blade row to export, set to 0 for the full annulus
+        fuse_passages: fuse the passages into a single solid
+        preflight: check the geometry of every blade row before any CAD is created
+        lod: level of detail of each domain, 'coarse', 'medium' or 'full'
+        manifest: file holding the fingerprint of every output, defaults to the base output name with a -exports.json
+            suffix when output_filename is a file name. Outputs built from the same inputs as the last run, or holding
+            the same geometry, are not written again
+        force: build and write every output, even those which are unchanged
+        export_format: format of the outputs if output_filename is not given, 'step', 'brep', 'stl' or 'vtk'
+        entities: products of each blade row to export, any of 'blade', 'cad_endwalls', 'per' and 'domain'
+        tolerance: linear deflection of STL and VTK outputs, as a fraction of the size of each shape
+        angular_tolerance: angular deflection of STL and VTK outputs, in radians
+
+    Returns:
+        list of runner.JobResult, one per blade row
+
+    Raises:
+        checks.PreflightError : if the geometry checks find any problems
+
+    """
     if not output_filename:
-        output_filename = fname.replace('.toml', '.step')
+        output_filename = fname.replace('.toml', f'.{export_format}')
+    if not manifest and isinstance(output_filename, (str, os.PathLike)):
+        manifest = os.path.splitext(output_filename)[0] + '-exports.json'
+    if force and manifest and os.path.exists(manifest):
+        os.remove(manifest)
+
+    profiler = Profiler(label='machine') if profile else None
+    if profiler:
+        with profiler.step('load_machine'):
+            machine = Machine.from_config_file(fname, cache_dir)
+    else:
+        machine = Machine.from_config_file(fname, cache_dir)
+    _override_boolean(machine, boolean)
+
+    if preflight:
+        problems = checks.check_machine_geometry(machine)
+        if problems:
+            raise checks.PreflightError(problems)
+
+    # every blade row has been checked, so the jobs do not check them again
+    results = runner.run_jobs(runner.create_jobs(machine, output_filename, cache_dir, cache_max_bytes, bool(profile),
+                                                 passages, fuse_passages, preflight=False, lod=lod,
+                                                 manifest=manifest, entities=entities, tolerance=tolerance,
+                                                 angular_tolerance=angular_tolerance), jobs)
+
+    if profiler:
+        for result in results:
+            if result.profile is not None:
+                profiler.profile.extend(result.profile)
+        profiler.profile.write(profile, profile_format)
+
+    return results
+
+
+def _override_boolean(machine, boolean):
+    for key, value in (boolean or {}).items():
+        setattr(machine.boolean, key, value)
+
+
+def validate(fname):
+    """
+    Check a machine file and print any problems found.
+
+    Args:
+        fname: path to the toml file defining the machine
+
+    Returns:
+        True if the machine is valid
+
+    """
+    problems = checks.validate_config_file(fname)
+    for problem in problems:
+        print(problem)
+    print(f'{fname}: {len(problems)} problem(s) found' if problems else f'{fname}: ok')
+    return not problems
 
-    machine = Machine.from_config_file(fname)
 
-    for stage in machine.stages:
-        for blade_def in stage.blades:
-            if isinstance(output_filename,str):
-                temp_out_fname = output_filename.replace('.step', f'-{stage.name}-{blade_def.name}.step')
-            else:
-                temp_out_fname = output_filename.name.replace('.step', f'-{stage.name}-{blade_def.name}.step')
+def create_preview(fname, output_filename=None, cache_dir=None):
+    """
+    Write the curves every blade row is built from to a VTK or NPZ file, without creating any CAD.
 
-            creator = DomainCreator(blade_def, stage.endwalls,machine.units,machine.axis)
-            creator.create_domain()
-            creator.export('domain', temp_out_fname)
+    Args:
+        fname: path to the toml file defining the machine
+        output_filename: name of the preview file, defaults to fname with a -preview.vtk suffix
+        cache_dir: directory used to cache parsed input files, set to None to disable caching
 
+    Returns:
+        name of the preview file
 
-if __name__ == "__main__":
+    """
+    if not output_filename:
+        output_filename = fname.replace('.toml', '-preview.vtk')
+
+    machine = Machine.from_config_file(fname, cache_dir)
+    preview.write_preview(output_filename, preview.create_preview(machine))
+    return output_filename
+
+
+def run_sweep(fname, sweep_fname, output_filename=None, cache_dir=None, jobs=1, cache_max_bytes=DEFAULT_MAX_BYTES,
+              manifest=None, boolean=None):
+    """
+    Create and export the fluid domains of every variant of a machine.
+
+    Args:
+        fname: path to the toml file defining the base machine
+        sweep_fname: path to the toml file defining the sweep
+        output_filename: base name for the output files, defaults to fname with a .step suffix
+        cache_dir: directory used to cache parsed input files and intermediate solids, set to None to disable caching
+        jobs: number of processes used to build the variants, set to 0 or less to use every core
+        cache_max_bytes: maximum size of the intermediate solid cache in bytes
+        manifest: file name of the JSON manifest, defaults to the base output name with a -manifest.json suffix
+        boolean: Boolean options which override those in the machine file, e.g. {'fuzzy': 1e-6}
+
+    Returns:
+        list of runner.JobResult, one per blade row per variant
+
+    """
+    if not output_filename:
+        output_filename = os.path.splitext(fname)[0] + '.step'
+    if not manifest:
+        manifest = os.path.splitext(output_filename)[0] + '-manifest.json'
+
+    machine = Machine.from_config_file(fname, cache_dir)
+    _override_boolean(machine, boolean)
+    return sweep.run_sweep(machine, sweep.load_sweep(sweep_fname), output_filename, jobs, cache_dir, cache_max_bytes,
+                           manifest)
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ['validate']:
+    args = create_validate_parser().parse_args(sys.argv[2:])
+    sys.exit(0 if validate(args.filepath) else 1)
+
+elif __name__ == "__main__" and sys.argv[1:2] == ['cache']:
+    args = create_cache_parser().parse_args(sys.argv[2:])
+    print(f'Removed {clear_cache_dir(args.cache_dir)} file(s) from {args.cache_dir}')
+
+elif __name__ == "__main__" and sys.argv[1:2] == ['sweep']:
+    args = create_sweep_parser().parse_args(sys.argv[2:])
+    results = run_sweep(args.filepath, args.sweep, args.output, cache_dir=args.cache_dir, jobs=args.jobs,
+                        cache_max_bytes=int(args.cache_size * 1024 ** 2), manifest=args.manifest,
+                        boolean=boolean_overrides(args))
+    print(runner.summarise(results))
+    if not all(result.success for result in results):
+        sys.exit(1)
+
+elif __name__ == "__main__":
     args = create_parser().parse_args()
-    main(args.filepath)
+    if args.preview is not None:
+        start = time.perf_counter()
+        fname_out = create_preview(args.filepath, args.preview, cache_dir=args.cache_dir)
+        print(f'Preview written to {fname_out} in {time.perf_counter() - start:.2f} s')
+        sys.exit(0)
+
+    try:
+        results = main(args.filepath, cache_dir=args.cache_dir, jobs=args.jobs,
+                       cache_max_bytes=int(args.cache_size * 1024 ** 2), profile=args.profile,
+                       profile_format=args.profile_format, boolean=boolean_overrides(args), passages=args.passages,
+                       fuse_passages=args.fuse_passages, preflight=not args.no_preflight, lod=args.lod,
+                       force=args.force, export_format=args.format, entities=args.export, tolerance=args.tolerance,
+                       angular_tolerance=args.angular_tolerance)
+    except checks.PreflightError as e:
+        print(e)
+        sys.exit(1)
+    print(runner.summarise(results))
+    if args.profile:
+        print(f'Profile written to {args.profile}')
+    if not all(result.success for result in results):
+        sys.exit(1)
@@ -3,7 +3,41 @@ from __future__ import annotations
 from numpy.typing import NDArray
 import numpy as np
 from protoblade import geom
-from atom.api import Atom, Int, Enum,Str,Typed,Property, Tuple,Float
+from atom.api import Atom, Int, Enum,Str,Typed,Property, Tuple,Float,List
+
+
+class DecimationReport(Atom):
+    """Point reduction and deviation of a set of decimated curves."""
+
+    name = Str()
+    n_points = Int()
+    n_points_decimated = Int()
+    max_deviation = Float()
+
+    @classmethod
+    def from_curves(cls, name:str, curves:NDArray, tolerance:float):
+        """
+        Decimate a stack of curves.
+
+        Args:
+            name: name of the curves, e.g. ps_sections
+            curves: array of dtype cartesian_type shaped (n_curves, n_pts), or an (n_curves, n_pts, 3) array
+            tolerance: maximum deviation from the original curves
+
+        Returns:
+            (decimated curves, report)
+
+        """
+        axis = -1 if curves.dtype.names else -2
+        idx, max_deviation = geom.decimate_curves(curves, tolerance)
+        report = cls(name=name, n_points=curves.shape[axis], n_points_decimated=len(idx), max_deviation=max_deviation)
+        return np.take(curves, idx, axis=axis), report
+
+    def summary(self) -> str:
+        reduction = 1.0 - self.n_points_decimated / self.n_points
+        return (f'{self.name}: {self.n_points} -> {self.n_points_decimated} points ({reduction:.0%} fewer), '
+                f'max deviation {self.max_deviation:.3g}')
+
 
 class Blade(Atom):
     #TODO rename BladeSection?
@@ -11,35 +45,79 @@ class Blade(Atom):
     name = Str()
     n_blade = Int()
     n_sections = Property(Int)
-    ps_sections = Typed(np.ndarray)
-    ss_sections = Typed(np.ndarray)
+    ps_stack = Typed(geom.SectionStack)
+    ss_stack = Typed(geom.SectionStack)
+    ps_sections = Property()
+    ss_sections = Property()
     interface_location = Float(0.0)
+    decimation_tolerance = Float(0.0)
+    decimation = List(DecimationReport)
 
 
     pitch_angle_rad = Property()
 
     @classmethod
-    def from_config(cls,config):
+    def from_config(cls,config,cache_dir=None):
         blade = Blade()
         blade.name = config['name']
         blade.n_blade = config['n_blade']
 
         for surf,fname in  [('ps_sections',config['ps_section_fname']),('ss_sections',config['ss_section_fname'])]:
-            blade._load_sections(fname,surf)
+            blade._load_sections(fname,surf,cache_dir)
 
         if 'interface_location' in config.keys():
             blade.interface_location = config['interface_location']
+        if config.get('decimation_tolerance', 0.0) > 0.0:
+            blade.decimate(config['decimation_tolerance'])
         return blade
 
-    def _load_sections(self,fname:str,surf:str):
+    def decimate(self, tolerance:float):
+        """
+        Remove points from the sections while reproducing each section within a tolerance.
+
+        The same points are removed from every section of a surface, so the sections remain an array. The midlines
+        created from the sections are decimated with the same tolerance.
+
+        Args:
+            tolerance: maximum distance between the original points and a spline through the remaining points
+
+        Returns:
+            list of DecimationReport, one per surface
+
+        Raises:
+            ValueError : if the tolerance is not positive
+
+        """
+        self.decimation_tolerance = tolerance
+        self.decimation = []
+        for surf in ['ps_sections', 'ss_sections']:
+            sections, report = DecimationReport.from_curves(surf, getattr(self, surf), tolerance)
+            setattr(self, surf, sections)
+            self.decimation.append(report)
+        return self.decimation
+
+    def _load_sections(self,fname:str,surf:str,cache_dir:str=None):
         try:
-            setattr(self,surf,geom.load_curves_from_fpd(fname))
+            setattr(self,surf,geom.load_curves_from_fpd(fname,cache_dir=cache_dir))
         except FileNotFoundError:
             raise
 
     def _get_n_sections(self) -> int:
         return len(self.ps_sections)
 
+    # the sections are held in a SectionStack, ps_sections and ss_sections are views of the same memory
+    def _get_ps_sections(self) -> NDArray:
+        return None if self.ps_stack is None else self.ps_stack.records
+
+    def _set_ps_sections(self, sections):
+        self.ps_stack = geom.SectionStack.from_sections(sections)
+
+    def _get_ss_sections(self) -> NDArray:
+        return None if self.ss_stack is None else self.ss_stack.records
+
+    def _set_ss_sections(self, sections):
+        self.ss_stack = geom.SectionStack.from_sections(sections)
+
 
     def _get_pitch_angle_rad(self) ->float:
         return 2.0 * np.pi / self.n_blade
@@ -72,42 +150,28 @@ def create_sections_from_2D_profile(ps:NDArray,ss:NDArray,N_sections:int,r_exten
     r_min, r_max = r_extents
 
     if n_resample > 1:
-        x_ps,rt_ps,_ = geom.reinterpolate_curve(x_ps,rt_ps,geom.calculate_curve_length(x_ps,rt_ps),base=1.5,N_new=n_resample)
-        x_ss,rt_ss,_ = geom.reinterpolate_curve(x_ss,rt_ss,geom.calculate_curve_length(x_ss,rt_ss),base=1.5,N_new=n_resample)
-
-        N_ps = x_ps.shape[0]
-        N_ss = x_ss.shape[0]
-    else:
-        N_ps = len(x_ps)
-        N_ss = len(x_ss)
-
-    t_ps = rt_ps / r_min
-    t_ss = rt_ss / r_min
-
-    r = np.linspace(r_min, r_max, N_sections)
-
-
-    ps_section=[]
-    ss_section =[]
-    for i in range(N_sections):
-        ps_out = np.empty(shape=(N_ps,), dtype=geom.cartesian_type)
-        ss_out = np.empty(shape=(N_ss,), dtype=geom.cartesian_type)
-        if use_r_theta:
-            theta_ps = rt_ps / r[i]
-            theta_ss = rt_ss / r[i]
+        if len(x_ps) == len(x_ss):
+            # both surfaces are resampled as a single stack
+            x = np.stack((x_ps, x_ss))
+            rt = np.stack((rt_ps, rt_ss))
+            (x_ps, x_ss), (rt_ps, rt_ss), _ = geom.reinterpolate_curves(x, rt, geom.calculate_curve_lengths(x, rt),
+                                                                         base=1.5, N_new=n_resample)
         else:
-            theta_ps = t_ps
-            theta_ss = t_ss
+            x_ps,rt_ps,_ = geom.reinterpolate_curve(x_ps,rt_ps,geom.calculate_curve_length(x_ps,rt_ps),base=1.5,N_new=n_resample)
+            x_ss,rt_ss,_ = geom.reinterpolate_curve(x_ss,rt_ss,geom.calculate_curve_length(x_ss,rt_ss),base=1.5,N_new=n_resample)
 
-        ps_out['x'] = r[i] * np.cos(theta_ps)
-        ps_out['y'] = r[i] * np.sin(theta_ps)
-        ps_out['z'] = x_ps +del_x
+    r = np.linspace(r_min, r_max, N_sections)[:, np.newaxis]
 
-        ss_out['x'] = r[i] * np.cos(theta_ss)
-        ss_out['y'] = r[i] * np.sin(theta_ss)
-        ss_out['z'] = x_ss +del_x
+    sections = []
+    for x, rt in [(x_ps, rt_ps), (x_ss, rt_ss)]:
+        # every section is created at once, with one row per radius
+        theta = rt / r if use_r_theta else np.broadcast_to(rt / r_min, (N_sections, len(rt)))
 
-        ps_section.append(ps_out)
-        ss_section.append(ss_out)
+        out = np.empty(shape=(N_sections, len(x), 3))
+        out[..., 0] = r
+        out[..., 1] = theta
+        out[..., 2] = x + del_x
+        sections.append(geom.as_cartesian(geom.polar_to_cartesian(out, out=out)))
 
+    ps_section, ss_section = sections
     return ps_section,ss_section
\ No newline at end of file
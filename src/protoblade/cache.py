@@ -0,0 +1,319 @@
+"""Functions and classes to cache intermediate results on disk between runs."""
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+import numpy as np
+
+DEFAULT_MAX_BYTES = 1024 ** 3
+LOCK_TIMEOUT = 10.0
+
+
+def fingerprint(*items) -> str:
+    """
+    Create a hash of a set of inputs which can be used as a cache key.
+
+    Args:
+        items: numpy arrays, strings, numbers, None or (nested) tuples/lists of these
+
+    Returns:
+        hex digest which changes if any of the items change
+
+    """
+    h = hashlib.sha256()
+    _update(h, items)
+    return h.hexdigest()
+
+
+def _update(h, item):
+    """Add a single item to a hash object."""
+    if isinstance(item, np.ndarray):
+        h.update(f'array{item.dtype.descr}{item.shape}'.encode())
+        h.update(np.ascontiguousarray(item).tobytes())
+    elif isinstance(item, (tuple, list)):
+        h.update(f'seq{len(item)}'.encode())
+        for sub_item in item:
+            _update(h, sub_item)
+    elif isinstance(item, bytes):
+        h.update(b'bytes' + item)
+    else:
+        h.update(f'{type(item).__name__}{item!r}'.encode())
+
+
+def hash_file(fname: str or pathlib.Path) -> str:
+    """Create a hash of the contents of a file."""
+    h = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_state(fname: str or pathlib.Path) -> Optional[list]:
+    """Return the [size, modification time in ns] of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(fname)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+@contextlib.contextmanager
+def file_lock(fname: str or pathlib.Path, timeout: float = LOCK_TIMEOUT):
+    """
+    Hold a lock file next to a file, so that only one process at a time reads and writes it.
+
+    Args:
+        fname: file to lock, the lock is held in fname with a .lock suffix
+        timeout: seconds after which a lock is taken to be left behind by a process which died holding it, and removed
+
+    """
+    lock_fname = f'{fname}.lock'
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_fname, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(lock_fname)
+                deadline = time.monotonic() + timeout
+            time.sleep(0.001)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_fname)
+
+
+class _JsonStore:
+    """Entries keyed by absolute file path, kept in memory and in a JSON file if one is given."""
+
+    def __init__(self, fname: str or pathlib.Path = None):
+        self.fname = pathlib.Path(fname) if fname is not None else None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the lock of this store, and of its file, while entries are read, changed and written back."""
+        with self._lock:
+            if self.fname is None:
+                yield
+            else:
+                with file_lock(self.fname):
+                    yield
+
+    def _load(self) -> dict:
+        if self.fname is not None:
+            try:
+                with open(self.fname) as f:
+                    # another process may have added entries since this one last looked
+                    self._entries.update(json.load(f))
+            except (FileNotFoundError, ValueError):
+                pass
+        return self._entries
+
+    def _save(self, entries: dict) -> None:
+        if self.fname is None:
+            return
+        fd, tmp_fname = tempfile.mkstemp(dir=self.fname.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f, indent=1)
+        os.replace(tmp_fname, self.fname)
+
+
+class FileHashes(_JsonStore):
+    """
+    Content hashes of files, remembered by absolute path, size and modification time.
+
+    A file is only read again if its size or modification time has changed. The hashes are kept in memory, and in a
+    JSON file if one is given so that they are remembered between runs.
+    """
+
+    def __init__(self, fname: str or pathlib.Path = None):
+        """Create the store, with the hashes kept in fname or only in memory if fname is None."""
+        super().__init__(fname)
+
+    def hash(self, fname: str or pathlib.Path) -> str:
+        """Return the hash of the contents of a file, reading it only if it has changed since it was last hashed."""
+        path = pathlib.Path(fname).resolve()
+        state = file_state(path)
+        if state is None:
+            raise FileNotFoundError(f'{fname} does not exist')
+
+        hashes = self._load()
+        entry = hashes.get(str(path))
+        if entry is not None and entry['state'] == state:
+            return entry['sha256']
+
+        digest = hash_file(path)
+        with self._locked():
+            hashes = self._load()
+            hashes[str(path)] = {'state': state, 'sha256': digest}
+            self._save(hashes)
+        return digest
+
+
+class ExportManifest(_JsonStore):
+    """
+    Fingerprints of exported files, so that an output whose inputs and geometry are unchanged is not written again.
+
+    Each output is recorded with the fingerprint of every input it was built from, a geometric signature of the
+    exported shape, e.g. its volume, area, bounding box and face count, and the size and modification time the file
+    had when it was written. An output is only current while the file still has that size and modification time.
+    Outputs may be recorded from several threads and processes at once.
+    """
+
+    def __init__(self, fname: str or pathlib.Path = None):
+        """Create the manifest, kept in fname or only in memory if fname is None."""
+        super().__init__(fname)
+
+    def is_current(self, fname_out: str or pathlib.Path, key: str = None, signature: dict = None) -> bool:
+        """
+        Check whether an output file was written from the same inputs, or holds the same geometry, and is untouched.
+
+        Args:
+            fname_out: output file name
+            key: fingerprint of the inputs, set to None to only compare the signature
+            signature: geometric signature of the shape, set to None to only compare the key
+
+        Returns:
+            True if the file does not need to be written again
+
+        """
+        with self._lock:
+            entry = self._load().get(str(pathlib.Path(fname_out).resolve()))
+        if entry is None or entry['state'] != file_state(fname_out):
+            return False
+        return (key is None or entry['key'] == key) and (signature is None or entry['signature'] == signature)
+
+    def record(self, fname_out: str or pathlib.Path, key: str, signature: dict) -> None:
+        """Record the fingerprint of an output file, after it has been written or found to be current."""
+        with self._locked():
+            entries = self._load()
+            entries[str(pathlib.Path(fname_out).resolve())] = {'key': key, 'signature': signature,
+                                                              'state': file_state(fname_out)}
+            self._save(entries)
+
+
+class FileCache:
+    """
+    A content addressed store of files in a directory with a size cap.
+
+    Each entry is a single file named by its key. When the total size of the entries exceeds max_bytes the least
+    recently used entries are removed, where use is tracked through the file modification time. The hashes of input
+    files used to create keys, e.g. STEP files, are remembered in the same directory.
+    """
+
+    def __init__(self, directory: str or pathlib.Path, max_bytes: int = DEFAULT_MAX_BYTES, suffix: str = '.brep'):
+        """Create the cache, creating directory if it does not exist."""
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hashes = FileHashes(self.directory / 'file_hashes.json')
+
+    def fname(self, key: str) -> pathlib.Path:
+        """Return the file name used to store an entry."""
+        return self.directory / f'{key}{self.suffix}'
+
+    def get(self, key: str) -> Optional[pathlib.Path]:
+        """Return the file for key if it is in the cache, marking it as recently used, otherwise None."""
+        fname = self.fname(key)
+        try:
+            os.utime(fname)
+        except FileNotFoundError:
+            return None
+        return fname
+
+    def put(self, key: str, write: Callable[[str], object]) -> pathlib.Path:
+        """
+        Add an entry to the cache.
+
+        Args:
+            key: key for the entry
+            write: function which writes the entry to the file name it is passed
+
+        Returns:
+            file name of the new entry
+
+        """
+        fname = self.fname(key)
+        fd, tmp_fname = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp_fname)
+            os.replace(tmp_fname, fname)
+        finally:
+            if os.path.exists(tmp_fname):
+                os.remove(tmp_fname)
+        self.evict(keep=fname)
+        return fname
+
+    def entries(self):
+        """Return the cached files, least recently used first."""
+        files = []
+        for fname in self.directory.glob(f'*{self.suffix}'):
+            try:
+                files.append((fname.stat().st_mtime_ns, fname))
+            except FileNotFoundError:
+                continue
+        return [fname for _, fname in sorted(files)]
+
+    def size(self) -> int:
+        """Return the total size in bytes of the cached files."""
+        return sum(_file_size(fname) for fname in self.entries())
+
+    def evict(self, keep: pathlib.Path = None) -> None:
+        """Remove least recently used entries until the cache is within max_bytes, never removing keep."""
+        entries = [(fname, _file_size(fname)) for fname in self.entries()]
+        total = sum(size for _, size in entries)
+        for fname, size in entries:
+            if total <= self.max_bytes:
+                break
+            if fname == keep:
+                continue
+            total -= size
+            # another process sharing the cache may have removed the entry already
+            fname.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        for fname in self.entries():
+            fname.unlink(missing_ok=True)
+
+
+def clear_cache_dir(cache_dir: str or pathlib.Path) -> int:
+    """
+    Remove everything protoblade has cached in a directory: parsed fpd files, imported STEP files, intermediate solids
+    and the remembered hashes of input files.
+
+    Args:
+        cache_dir: directory passed as --cache-dir
+
+    Returns:
+        number of files removed
+
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    fnames = [fname for pattern in ['fpd/*.npy', 'brep/*.brep', 'brep/file_hashes.json', '*/*.tmp']
+              for fname in cache_dir.glob(pattern)]
+    for fname in fnames:
+        fname.unlink(missing_ok=True)
+    return len(fnames)
+
+
+def _file_size(fname: pathlib.Path) -> int:
+    """Return the size of a file, or zero if it no longer exists."""
+    try:
+        return fname.stat().st_size
+    except FileNotFoundError:
+        return 0
+
@@ -1,15 +1,99 @@
-"""Module with classes and functions to create CAD models from protoblade classes."""
-import cadquery
+"""
+Module with classes and functions to create CAD models from protoblade classes.
+
+cadquery is only imported when the first CAD operation runs, so that importing this module stays cheap.
+"""
+from __future__ import annotations
+import contextlib
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from numpy.typing import NDArray
-from typing import Tuple,List, Literal
+from typing import TYPE_CHECKING, Dict, Tuple,List, Literal
 import numpy as np
-from  protoblade import  geom, stage
-from protoblade.blade import Blade
+from  protoblade import  checks, geom, stage
+from protoblade.blade import Blade, DecimationReport
+from protoblade.cache import ExportManifest, FileCache, FileHashes, fingerprint
+from protoblade.lod import boolean_options, coarsen_blade, get_level
+from protoblade.machine import BooleanOptions
+from protoblade.profiling import Profiler
+
+if TYPE_CHECKING:
+    import cadquery
+
+EXPORT_FORMATS = ['.step', '.brep', '.stl', '.vtk']
+TESSELLATED_FORMATS = ['.stl', '.vtk']
+EXPORT_ENTITIES = ['blade', 'cad_endwalls', 'per', 'domain']
+DEFAULT_TOLERANCE = 1e-3
+DEFAULT_ANGULAR_TOLERANCE = 0.1
+
+# the STEP writer keeps its settings in global state, so only one STEP file is written at a time
+_STEP_LOCK = threading.Lock()
+# a triangulation is stored in the faces, which may be shared by several shapes
+_MESH_LOCK = threading.Lock()
+
+
+def _cadquery():
+    """Import cadquery, which takes several seconds the first time as it loads OCC."""
+    import cadquery
+    return cadquery
+
+
 def _convert_array_to_list(pts:NDArray)-> List[Tuple]:
     return [tuple(pt) for pt in pts]
 
+
+def _make_spline(pts:NDArray, cq=None):
+    """
+    Interpolate a spline edge through an array of points.
+
+    The points are converted to Python floats with a single tolist call and set in the OCC point array one gp_Pnt at a
+    time, skipping the tuple and cadquery Vector that Edge.makeSpline needs for each point. The result is the same as
+    cadquery's Edge.makeSpline with its defaults.
+
+    Args:
+        pts: points of dtype cartesian_type, or an (N,3) array
+        cq: cadquery module, or a replacement for testing. Set to None to import cadquery
+
+    Returns:
+        cadquery Edge
+
+    Raises:
+        ValueError : if the interpolation fails, e.g. if two points are within 1e-6 of each other
+
+    """
+    from OCP.BRepBuilderAPI import BRepBuilderAPI_MakeEdge
+    from OCP.GeomAPI import GeomAPI_Interpolate
+    from OCP.TColgp import TColgp_HArray1OfPnt
+    from OCP.gp import gp_Pnt
+
+    xyz = geom.as_xyz(pts).reshape(-1, 3)
+
+    pnts = TColgp_HArray1OfPnt(1, len(xyz))
+    for i, (x, y, z) in enumerate(xyz.tolist(), 1):
+        pnts.SetValue(i, gp_Pnt(x, y, z))
+
+    try:
+        builder = GeomAPI_Interpolate(pnts, False, 1e-6)
+        builder.Perform()
+    except Exception as e:
+        # OCC exceptions, e.g. Standard_ConstructionError, do not share a common Python base class
+        raise ValueError(f'B-spline interpolation failed: {e}') from e
+    if not builder.IsDone():
+        raise ValueError('B-spline interpolation failed')
+    return (cq or _cadquery()).Edge(BRepBuilderAPI_MakeEdge(builder.Curve()).Edge())
+
 class DomainCreator:
-    """Class to create a Fluid Domain that can be used in CFD analysis."""
+    """
+    Class to create a Fluid Domain that can be used in CFD analysis.
+
+    Each product (blade, cad_endwalls, mid_points, per, per_and_endwalls and domain) records a fingerprint of the inputs
+    it was built from and is only rebuilt when those inputs change. For example, changing blade_def.n_blade rebuilds
+    the midlines, the periodic solid and the Boolean operations but not the blade or the endwalls. Changing lod from
+    coarse to full rebuilds every product but the endwalls.
+
+    tolerance and angular_tolerance set the tessellation of STL and VTK exports, see write_shape.
+    """
 
     blade_def : Blade
 
@@ -18,29 +102,156 @@ class DomainCreator:
                  endwalls:stage.Endwalls,
                  units:str,
                  axis:tuple,
-                 cq=cadquery
+                 cq=None,
+                 cache:FileCache=None,
+                 profiler:Profiler=None,
+                 boolean:BooleanOptions=None,
+                 lod:str='full',
                  ):
-        """Create the object from a Stage instance."""
+        """Create the object from a Stage instance.
+
+        Args:
+            blade_def: blade to create the domain for
+            endwalls: endwalls of the stage the blade belongs to
+            units: units of the inputs and outputs
+            axis: two points which define the axis of rotation
+            cq: cadquery module, or a replacement for testing. Set to None to import cadquery when it is first needed
+            cache: cache used to store the blade, endwall and periodic solids and imported STEP files between runs, set
+                to None to disable
+            profiler: profiler used to record the time, memory and shape size of each step, set to None to disable
+            boolean: options for the Boolean operations, set to None to use the defaults
+            lod: level of detail, one of lod.LEVELS. 'full' builds the domain from every section and point, the
+                coarser levels build an approximate domain much faster
+
+        Raises:
+            ValueError : if the level of detail is not recognised
+
+        """
         #TODO : probaly want this to be a stage rather than blade - actually maybe not?
         self.blade_def = blade_def
         self.endwalls = endwalls
         self.units = units
         self.axis = axis
         #TODO: add function to cut domain at a given location
-        self._cq = cq # add cadquery as an object to allow for test mock to be easily added
+        self._cq_module = cq # add cadquery as an object to allow for test mock to be easily added
+        self.midline_engine = 'kdtree'
+        self.midline_workers = 0 # threads used to create the midlines, 0 for every core
+        self.preflight = True
+        self.lod = get_level(lod).name
+        self.tolerance = DEFAULT_TOLERANCE
+        self.angular_tolerance = DEFAULT_ANGULAR_TOLERANCE
+        self.cache = cache
+        self.profiler = profiler
+        self.boolean = BooleanOptions() if boolean is None else boolean
+        self.blade = None
+        self.cad_endwalls = None
+        self.endwall_extent = None
+        self.mid_points = None
+        self.midline_decimation = None
+        self.per = None
+        self.per_and_endwalls = None
+        self.domain = None
+        self.passages = None
+        self._built = {}
+        self._file_hashes = FileHashes()
+
+    @property
+    def _cq(self):
+        """cadquery module, imported when it is first used."""
+        if self._cq_module is None:
+            self._cq_module = _cadquery()
+        return self._cq_module
+
+    def _step(self, name:str, shape=None):
+        """Return a context manager which records a step if this instance has a profiler."""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.step(name, shape)
+
+    def _update(self, product:str, key:str, step:str, build, has_shape:bool=True) -> None:
+        """
+        Build a product and record it as a step, unless it has already been built from the same inputs.
 
-    def extrude_blade(self):
-        """Extrude/loft the blade sections to create the main blade."""
-        N_sections = self.blade_def.ps_sections.shape[0]
+        Args:
+            product: name of the attribute holding the product
+            key: fingerprint of every input the product depends on
+            step: name of the step recorded by the profiler
+            build: function returning the product
+            has_shape: set to False if the product is not a shape
+
+        """
+        if self._built.get(product) == key and getattr(self, product) is not None:
+            return
+
+        with self._step(step, (lambda: getattr(self, product)) if has_shape else None):
+            setattr(self, product, build())
+        self._built[product] = key
+
+    def _cached(self, key:str, build):
+        """Load a shape from the cache if it is present, otherwise build it and add it to the cache."""
+        if self.cache is None:
+            return build()
 
-        ps_edges = []
-        ss_edges = []
-        for i in range(N_sections):
-            ss_pts = _convert_array_to_list(self.blade_def.ss_sections[i])
-            ss_edges.append(self._cq.Edge.makeSpline([self._cq.Vector(p) for p in ss_pts]))
+        fname = self.cache.get(key)
+        if fname is not None:
+            return self._cq.Shape.importBrep(str(fname))
 
-            ps_pts = _convert_array_to_list(self.blade_def.ps_sections[i])
-            ps_edges.append(self._cq.Edge.makeSpline([self._cq.Vector(p) for p in ps_pts]))
+        shape = build()
+        self.cache.put(key, shape.exportBrep)
+        return shape
+
+    def _blade_key(self) -> str:
+        blade_def = self._detailed_blade()
+        return fingerprint('blade', blade_def.ps_sections, blade_def.ss_sections, self.units)
+
+    def _endwalls_key(self) -> str:
+        if self.endwalls.type == 'fpd':
+            return fingerprint('endwalls', self.endwalls.hub, self.endwalls.shroud, self.axis, self.units)
+        hashes = self._file_hashes if self.cache is None else self.cache.hashes
+        return fingerprint('endwalls', hashes.hash(self.endwalls.step_fname), self.units)
+
+    def _midlines_key(self) -> str:
+        blade_def = self._detailed_blade()
+        return fingerprint('midlines', blade_def.ps_sections, blade_def.ss_sections, self._endwalls_key(),
+                           self.blade_def.pitch_angle_rad, self.axis, self.midline_engine, self.units,
+                           self.blade_def.decimation_tolerance, get_level(self.lod).midline_points)
+
+    def _periodic_key(self) -> str:
+        return fingerprint('periodic', self._midlines_key())
+
+    def _boolean_key(self) -> tuple:
+        boolean = self._boolean_options()
+        return boolean.parallel, boolean.fuzzy, boolean.glue
+
+    def _detailed_blade(self) -> Blade:
+        """blade_def with the sections and points of the level of detail."""
+        return coarsen_blade(self.blade_def, get_level(self.lod))
+
+    def _boolean_options(self) -> BooleanOptions:
+        """self.boolean with the fuzzy tolerance loosened for the level of detail, relative to the blade chord."""
+        level = get_level(self.lod)
+        if level.fuzzy <= 0.0:
+            return self.boolean
+        ps = self.blade_def.ps_stack.xyz
+        chord = float(np.max(np.linalg.norm(ps[:, -1] - ps[:, 0], axis=-1)))
+        return boolean_options(self.boolean, level, chord)
+
+    def _intersect_key(self) -> str:
+        return fingerprint('intersect', self._periodic_key(), self._endwalls_key(), self._boolean_key())
+
+    def _domain_key(self) -> str:
+        return fingerprint('domain', self._intersect_key(), self._blade_key(), self._boolean_key())
+
+    def extrude_blade(self):
+        """Extrude/loft the blade sections to create the main blade, if they have changed since the last call."""
+        key = self._blade_key()
+        self._update('blade', key, 'extrude_blade', lambda: self._cached(key, self._loft_blade))
+
+    def _loft_blade(self):
+        # each section of a stack is already an (N,3) array of doubles, which _make_spline takes without a copy
+        blade_def = self._detailed_blade()
+        ps_edges = [_make_spline(section, self._cq) for section in blade_def.ps_stack.xyz]
+        ss_edges = [_make_spline(section, self._cq) for section in blade_def.ss_stack.xyz]
 
         blade_ss = self._cq.Solid.makeLoft(
             [self._cq.Wire.assembleEdges([edge]) for edge in ss_edges]
@@ -59,79 +270,203 @@ class DomainCreator:
         )
 
         shell = self._cq.Shell.makeShell([blade_ss.faces(), bottom.faces(), blade_ps.faces(), top.faces()])
-        solid = self._cq.Solid.makeSolid(shell)
+        return self._cq.Solid.makeSolid(shell)
 
+    def create_endwalls(self):
+        """Create CAD objects for the endwalls, if they have changed since the last call."""
+        key = self._endwalls_key()
+        self._update('cad_endwalls', key, 'create_endwalls', lambda: self._create_endwalls(key))
+
+    def _create_endwalls(self, key:str):
+        self.endwall_extent = None
+        if self.cache is None or self.endwalls.type == 'step':
+            # imported STEP files are cached by import_step
+            return self._build_endwalls()
+        shape = self._cached(key, lambda: _single_shape(self._build_endwalls(), self._cq))
+        return self._cq.Workplane("XY").add(shape)
+
+    def share_endwalls(self, cad_endwalls, endwall_extent:Tuple[float,float]=None):
+        """
+        Use endwalls which have already been created, e.g. by create_stage_endwalls for another blade row in the stage.
 
-        self.blade = solid
+        create_domain will not rebuild the endwalls unless the endwall definition changes.
 
-    def create_endwalls(self):
-        """Create CAD objects for the endwalls."""
-        if self.endwalls.type == 'fpd':
-            hub_pts = _convert_array_to_list(self.endwalls.hub)
-            shroud_pts = _convert_array_to_list(self.endwalls.shroud)
+        Args:
+            cad_endwalls: endwall solid of the stage
+            endwall_extent: (rmin,rmax) of the endwalls, set to None to find it when it is first needed
 
-            self.cad_endwalls =  self._cq.Workplane("XY").spline(hub_pts).polyline([hub_pts[-1], shroud_pts[-1]]).spline(
-                shroud_pts[::-1]).polyline(
-                [shroud_pts[0], hub_pts[0]]).close().revolve(360.0, self.axis[0], self.axis[1])
+        """
+        self.cad_endwalls = cad_endwalls
+        self.endwall_extent = None if endwall_extent is None else tuple(endwall_extent)
+        self._built['cad_endwalls'] = self._endwalls_key()
+
+    def _build_endwalls(self):
+        if self.endwalls.type == 'fpd':
+            hub_pts = _convert_array_to_list(self.endwalls.hub[[0, -1]])
+            shroud_pts = _convert_array_to_list(self.endwalls.shroud[[0, -1]])
+
+            # closed profile of hub, outlet, shroud and inlet which is revolved about the axis
+            edges = [
+                _make_spline(self.endwalls.hub, self._cq),
+                self._cq.Edge.makeLine(self._cq.Vector(hub_pts[-1]), self._cq.Vector(shroud_pts[-1])),
+                _make_spline(self.endwalls.shroud[::-1], self._cq),
+                self._cq.Edge.makeLine(self._cq.Vector(shroud_pts[0]), self._cq.Vector(hub_pts[0])),
+            ]
+            profile = self._cq.Wire.assembleEdges(edges)
+            return self._cq.Workplane("XY").add(profile).toPending().revolve(360.0, self.axis[0], self.axis[1])
         else:
-            self.cad_endwalls = self._cq.importers.importStep(self.endwalls.step_fname)
+            return import_step(self.endwalls.step_fname, self.cache, self._cq)
 
-    def export(self,entity:str,fname_out:str)->None:
+    def export(self,entity:str,fname_out:str,manifest:ExportManifest=None)->bool:
         """Export an entity from this class to a CAD output format.
 
         If the entity does not exist in the instance of this class that no export will occur
 
         Args:
             entity : name of entity to export
-            fname_out : output file name with suffix to denote the desired output type
+            fname_out : output file name with suffix to denote the desired output type, see write_shape
+            manifest : fingerprints of earlier exports. If fname_out was written from the same inputs, or holds a shape
+                with the same geometric signature, and has not been touched since, it is not written again. Set to
+                None to always write the file
 
+        Returns:
+            True if the file was written
 
         """
+        return self._export(entity, fname_out, manifest, lambda: self._step('export'))
+
+    def export_all(self, exports:Dict[str,str], manifest:ExportManifest=None, workers:int=0) -> Dict[str,bool]:
+        """
+        Export several entities at once, writing each file in its own thread.
+
+        STEP files are still written one at a time, as the STEP writer is not thread safe, so the files gain most from
+        being written together when they are BREP, STL or VTK. STL and VTK tessellations are created one at a time
+        before any file is written, as the faces they are stored in may be shared by several entities.
+
+        Args:
+            exports : output file name keyed by the name of the entity to export in it
+            manifest : fingerprints of earlier exports, see export
+            workers : maximum number of threads, set to 0 for one per file
+
+        Returns:
+            True for each entity whose file was written, keyed by entity
+
+        """
+        if len(exports) <= 1 or workers == 1:
+            return {entity: self.export(entity, fname_out, manifest) for entity, fname_out in exports.items()}
+
+        for entity, fname_out in exports.items():
+            if _suffix(fname_out) in TESSELLATED_FORMATS and getattr(self, entity):
+                tessellate(getattr(self, entity), self.tolerance, self.angular_tolerance, self._cq)
+
+        with self._step('export'), ThreadPoolExecutor(max_workers=workers or len(exports)) as executor:
+            futures = {entity: executor.submit(self._export, entity, fname_out, manifest, contextlib.nullcontext)
+                       for entity, fname_out in exports.items()}
+            return {entity: future.result() for entity, future in futures.items()}
+
+    def _export(self, entity:str, fname_out:str, manifest:ExportManifest, step) -> bool:
+        """Export an entity, recording the write with the context manager returned by step."""
         to_export = getattr(self,entity)
-        if to_export:
-            self._cq.exporters.export(to_export, str(fname_out))
+        if not to_export:
+            return False
+
+        if manifest is not None:
+            key = self._export_key(self._built.get(entity), fname_out)
+            signature = {**shape_signature(to_export, self._cq), **self._tessellation(fname_out)}
+            if manifest.is_current(fname_out, key) or manifest.is_current(fname_out, signature=signature):
+                manifest.record(fname_out, key, signature)
+                return False
+
+        with step():
+            write_shape(to_export, fname_out, self.tolerance, self.angular_tolerance, self._cq)
+        if manifest is not None:
+            manifest.record(fname_out, key, signature)
+        return True
+
+    def export_key(self, entity:str, fname_out:str, n_passages:int=1, fuse:bool=False) -> str:
+        """
+        Find the fingerprint an export of an entity would be recorded with, without building the entity.
 
+        Args:
+            entity : 'blade', 'cad_endwalls', 'per', 'per_and_endwalls', 'domain' or 'passages'
+            fname_out : output file name
+            n_passages : number of passages, for 'passages'
+            fuse : fuse the passages, for 'passages'
 
-    def create_periodic(self):
-        """Create a CAD object to represent the periodic fluid domain."""
-        z_min = self.cad_endwalls.objects[0].BoundingBox().zmin
-        z_max = self.cad_endwalls.objects[0].BoundingBox().zmax
+        Returns:
+            fingerprint of every input of the export
 
-        edges = []
+        """
+        keys = {'blade': self._blade_key, 'cad_endwalls': self._endwalls_key, 'per': self._periodic_key,
+                'per_and_endwalls': self._intersect_key, 'domain': self._domain_key,
+                'passages': lambda: self._passages_key(n_passages, fuse)}
+        return self._export_key(keys[entity](), fname_out)
 
-        #calculate radial limits
-        r_min_ps = np.min(np.hypot(self.blade_def.ps_sections[0]['x'],self.blade_def.ps_sections[0]['y']))
-        r_min_ss = np.min(np.hypot(self.blade_def.ss_sections[0]['x'],self.blade_def.ss_sections[0]['y']))
+    def _export_key(self, product_key:str, fname_out:str) -> str:
+        return fingerprint('export', product_key, _suffix(fname_out), *sorted(self._tessellation(fname_out).items()))
 
-        endwall_min_r,endwall_max_r = find_radial_extent_of_axisymmetric_object(self.cad_endwalls)
+    def _tessellation(self, fname_out:str) -> dict:
+        """The tessellation settings an export to fname_out depends on, empty for exact formats."""
+        if _suffix(fname_out) not in TESSELLATED_FORMATS:
+            return {}
+        return {'tolerance': self.tolerance, 'angular_tolerance': self.angular_tolerance}
 
-        if r_min_ps > endwall_min_r:
-            del_r = endwall_min_r - r_min_ps
-            extruded_ps = geom.extrude_radially(self.blade_def.ps_sections[0],1.1*del_r)
-            ps_sections = np.concatenate((np.reshape(extruded_ps,(1,extruded_ps.shape[0])),self.blade_def.ps_sections))
-        else:
-            ps_sections = self.blade_def.ps_sections
 
-        if r_min_ss > endwall_min_r:
-            del_r = endwall_min_r - r_min_ss
-            extruded_ss = geom.extrude_radially(self.blade_def.ss_sections[0], 1.1 * del_r)
-            ss_sections = np.concatenate(
-                (np.reshape(extruded_ss, (1, extruded_ss.shape[0])), self.blade_def.ss_sections))
-        else:
-            ss_sections = self.blade_def.ss_sections
+    def create_midlines(self):
+        """Create the midlines between adjacent blades which define the periodic surfaces, if their inputs changed."""
+        self.create_endwalls()
+        self._update('mid_points', self._midlines_key(), 'create_midlines', self._build_midlines, has_shape=False)
 
-        mid_points = geom.create_midlines(ps_sections,ss_sections,z_min,z_max,self.blade_def.pitch_angle_rad)
-        for i in range(len(mid_points)):
-            pts = _convert_array_to_list(mid_points[i])
-            edges.append(self._cq.Edge.makeSpline([self._cq.Vector(p) for p in pts]))
+    def _build_midlines(self):
+        bb = self.cad_endwalls.objects[0].BoundingBox()
+        endwall_min_r, _ = self.find_endwall_radial_extent()
+        mid_points, self.midline_decimation = create_blade_midlines(self._detailed_blade(), bb.zmin, bb.zmax,
+                                                                    endwall_min_r, self.midline_engine,
+                                                                    get_level(self.lod).midline_points,
+                                                                    self.midline_workers)
+        return mid_points
+
+    def create_periodic(self):
+        """Create a CAD object to represent the periodic fluid domain, if its inputs have changed."""
+        self.create_endwalls()
+        key = self._periodic_key()
+        self._update('per', key, 'create_periodic', lambda: self._cached(key, self._build_periodic))
+
+    def _build_periodic(self):
+        self.create_midlines()
+
+        edges = [_make_spline(pts, self._cq) for pts in self.mid_points]
 
         per = self._cq.Solid.makeLoft(
             [self._cq.Wire.assembleEdges([edge]) for edge in edges]
         )
 
-        self.per  = self._cq.Solid.revolve(per.Faces()[0], -np.rad2deg(self.blade_def.pitch_angle_rad), self.axis[0] , self.axis[1])
+        return self._cq.Solid.revolve(per.Faces()[0], -np.rad2deg(self.blade_def.pitch_angle_rad), self.axis[0] , self.axis[1])
 
 
+    def find_endwall_radial_extent(self) -> Tuple[float,float]:
+        """
+        Find the radial extent of the endwalls without any Boolean operations.
+
+        For fpd endwalls this comes directly from the hub and shroud points, otherwise the edges of cad_endwalls are
+        sampled. The slower slicing method is only used if the endwalls have no edges to sample. The result is kept
+        until the endwalls are created again.
+
+        Returns:
+            (rmin,rmax) , the minimum and maximum radial values respectively
+
+        """
+        if self.endwall_extent is None:
+            if self.endwalls.type == 'fpd':
+                self.endwall_extent = geom.find_radial_extent(
+                    np.concatenate((self.endwalls.hub.ravel(), self.endwalls.shroud.ravel())), self.axis)
+            else:
+                try:
+                    self.endwall_extent = sample_radial_extent(self.cad_endwalls, self.axis)
+                except ValueError:
+                    self.endwall_extent = find_radial_extent_of_axisymmetric_object(self.cad_endwalls)
+        return self.endwall_extent
+
     def create_domain(self):
         """
 
@@ -140,18 +475,420 @@ class DomainCreator:
         This will most likely be quite time consuming as it creates each aspect and then performs Boolean operations
         to create a single solid. T
 
+        Only the products whose inputs have changed since the last call are rebuilt, so calling this again after
+        editing blade_def or endwalls repeats the minimum amount of work.
+
         """
-        self.extrude_blade()
-        self.create_endwalls()
-        self.create_periodic()
+        key = self._domain_key()
+        if self._built.get('domain') == key and self.domain is not None:
+            return
+
+        if self.preflight:
+            self.check_geometry()
+
+        with self._step('create_domain', lambda: self.domain):
+            self.extrude_blade()
+            self.create_endwalls()
+            self.create_periodic()
+            self._update('per_and_endwalls', self._intersect_key(), 'intersect',
+                         lambda: self._boolean('common', [self.per], self.cad_endwalls.vals()))
+            self._update('domain', key, 'cut',
+                         lambda: self._boolean('cut', self.per_and_endwalls.vals(), [self.blade]))
+
+    def check_geometry(self):
+        """
+        Check the blade sections against each other and the endwalls before any CAD is created.
+
+        This takes milliseconds and is run by create_domain unless preflight is False, see checks.check_blade_geometry.
+
+        Raises:
+            checks.PreflightError : if any problems are found
+
+        """
+        with self._step('check_geometry'):
+            problems = checks.check_blade_geometry(self.blade_def.name or 'blade', self._detailed_blade(),
+                                                   self.endwalls, self.axis, self.midline_engine,
+                                                   self.midline_workers)
+        if problems:
+            raise checks.PreflightError(problems)
+
+    def create_passages(self, n_passages:int, fuse:bool=False):
+        """
+        Create a sector of several passages, or the full annulus, by rotating the domain about the axis.
+
+        The domain is built once and each passage is a rotated copy which shares its geometry, so no Boolean operations
+        are repeated and the exported file holds the geometry of a single passage. If fuse is set a single solid is
+        created instead, without the periodic faces shared by neighbouring passages. This fuses rotated copies of the
+        intersected periodic domain, which only touch on their periodic faces so are glued, and then cuts every blade.
+        It is much slower than creating the copies, as the Booleans are repeated over the whole sector.
+
+        Args:
+            n_passages: number of passages, set to blade_def.n_blade for the full annulus
+            fuse: fuse the passages into a single solid rather than keeping them as separate solids
+
+        Raises:
+            ValueError : if n_passages is not between 1 and blade_def.n_blade
+
+        """
+        if not 0 < n_passages <= self.blade_def.n_blade:
+            raise ValueError(f'Number of passages must be between 1 and n_blade ({self.blade_def.n_blade})')
+
+        self.create_domain()
+        key = self._passages_key(n_passages, fuse)
+        self._update('passages', key, 'create_passages', lambda: self._build_passages(n_passages, fuse))
+
+    def _passages_key(self, n_passages:int, fuse:bool) -> str:
+        return fingerprint('passages', self._domain_key(), n_passages, fuse, self.blade_def.pitch_angle_rad, self.axis)
+
+    def _build_passages(self, n_passages:int, fuse:bool):
+        from OCP.gp import gp_Ax1, gp_Dir, gp_Pnt, gp_Trsf
+
+        origin, end = np.asarray(self.axis[0], dtype=np.double), np.asarray(self.axis[1], dtype=np.double)
+        axis = gp_Ax1(gp_Pnt(*origin), gp_Dir(*(end - origin)))
 
-        blade_wp = self._cq.Workplane("XY").add(self.blade)
-        per_wp = self._cq.Workplane("XY").add(self.per)
-        per_and_endwalls = per_wp & self.cad_endwalls
-        self.domain = per_and_endwalls - blade_wp
+        locations = []
+        for i in range(n_passages):
+            rotation = gp_Trsf()
+            rotation.SetRotation(axis, i * self.blade_def.pitch_angle_rad)
+            locations.append(self._cq.Location(rotation))
 
+        if fuse and n_passages > 1:
+            per_and_endwalls = _single_shape(self.per_and_endwalls, self._cq)
+            sector = [per_and_endwalls.moved(location) for location in locations]
+            sector = self._boolean('fuse', sector[:1], sector[1:], glue='full')
+            return self._boolean('cut', sector.vals(), [self.blade.moved(location) for location in locations])
 
-def find_radial_extent_of_axisymmetric_object(input:cadquery.Workplane)->(float,float):
+        domain = _single_shape(self.domain, self._cq)
+        return self._cq.Workplane("XY").add(self._cq.Compound.makeCompound([domain.moved(location)
+                                                                            for location in locations]))
+
+    def _boolean(self, operation:str, args:list, tools:list, glue:str=None):
+        """
+        Run a Boolean operation with the OCC Boolean builder using the options in self.boolean, loosened for the level
+        of detail.
+
+        Args:
+            operation: 'common', 'cut' or 'fuse'
+            args: shapes to operate on
+            tools: shapes to intersect with, cut from or fuse with args
+            glue: glue option to use instead of self.boolean.glue, e.g. for shapes known to only share faces
+
+        Returns:
+            Workplane holding the cleaned result
+
+        Raises:
+            ValueError : if the operation fails
+
+        """
+        from OCP.BOPAlgo import BOPAlgo_GlueEnum
+        from OCP.BRepAlgoAPI import BRepAlgoAPI_Common, BRepAlgoAPI_Cut, BRepAlgoAPI_Fuse
+        from OCP.TopTools import TopTools_ListOfShape
+
+        op = {'common': BRepAlgoAPI_Common, 'cut': BRepAlgoAPI_Cut, 'fuse': BRepAlgoAPI_Fuse}[operation]()
+        for shapes, set_shapes in [(args, op.SetArguments), (tools, op.SetTools)]:
+            shape_list = TopTools_ListOfShape()
+            for shape in shapes:
+                shape_list.Append(shape.wrapped)
+            set_shapes(shape_list)
+
+        boolean = self._boolean_options()
+        op.SetRunParallel(boolean.parallel)
+        if boolean.fuzzy > 0.0:
+            op.SetFuzzyValue(boolean.fuzzy)
+        glue = boolean.glue if glue is None else glue
+        op.SetGlue(getattr(BOPAlgo_GlueEnum, f'BOPAlgo_Glue{glue.capitalize()}'))
+        op.Build()
+        if not op.IsDone():
+            raise ValueError(f'Boolean {operation} failed with {boolean.summary()}')
+
+        return self._cq.Workplane("XY").add(self._cq.Shape.cast(op.Shape()).clean())
+
+
+def create_blade_midlines(blade_def:Blade, z_min:float, z_max:float, endwall_min_r:float,
+                          engine:str='kdtree', n_points:int=200,
+                          workers:int=0) -> Tuple[List[NDArray], DecimationReport]:
+    """
+    Create the midlines of the periodic boundaries of a blade row, without any CAD.
+
+    Sections which do not reach the hub are first extended radially inwards, and the midlines are decimated if the
+    blade has a decimation tolerance.
+
+    Args:
+        blade_def: blade row
+        z_min: minimum z value of the endwalls
+        z_max: maximum z value of the endwalls
+        endwall_min_r: minimum radius of the endwalls
+        engine: name of the midline engine to use, see geom.MIDLINE_ENGINES
+        n_points: number of points in each midline
+        workers: number of threads to use, set to 0 or less to use every core
+
+    Returns:
+        (mid_points, report), the midline of each section and the decimation report, or None if not decimated
+
+    """
+    ps_sections = geom.extend_sections_to_radius(blade_def.ps_sections, endwall_min_r)
+    ss_sections = geom.extend_sections_to_radius(blade_def.ss_sections, endwall_min_r)
+
+    mid_points = geom.create_midlines(ps_sections, ss_sections, z_min, z_max, blade_def.pitch_angle_rad,
+                                      engine=engine, workers=workers, n_points=n_points)
+
+    report = None
+    if blade_def.decimation_tolerance > 0.0 and len({len(pts) for pts in mid_points}) == 1:
+        mid_points, report = DecimationReport.from_curves('midlines', np.stack(mid_points),
+                                                          blade_def.decimation_tolerance)
+        mid_points = list(mid_points)
+    return mid_points, report
+
+
+def shape_signature(shape, cq=None) -> dict:
+    """
+    Create a cheap geometric signature of a shape, which changes if its geometry changes.
+
+    Args:
+        shape: cadquery Workplane or Shape
+        cq: cadquery module, or a replacement for testing. Set to None to import cadquery
+
+    Returns:
+        volume, area, bounding box, number of solids and number of faces, with floats rounded to 9 significant figures
+        so that they are stable between runs
+
+    """
+    compound = _single_shape(shape, cq)
+    return {
+        'volume': _round(compound.Volume()),
+        'area': _round(compound.Area()),
+        'bounding_box': [_round(value) for value in _exact_bounding_box(compound)],
+        'n_solids': len(compound.Solids()),
+        'n_faces': len(compound.Faces()),
+    }
+
+
+def _round(value:float) -> float:
+    return float(f'{value:.9g}')
+
+
+def _exact_bounding_box(shape) -> tuple:
+    """(xmin, ymin, zmin, xmax, ymax, zmax) of the geometry, which does not depend on whether it is tessellated."""
+    from OCP.Bnd import Bnd_Box
+    from OCP.BRepBndLib import BRepBndLib
+
+    box = Bnd_Box()
+    BRepBndLib.AddOptimal_s(shape.wrapped, box, False, False)
+    return box.Get()
+
+
+def _suffix(fname_out:str) -> str:
+    return pathlib.Path(fname_out).suffix.lower()
+
+
+def write_shape(shape, fname_out:str, tolerance:float=DEFAULT_TOLERANCE,
+                angular_tolerance:float=DEFAULT_ANGULAR_TOLERANCE, cq=None) -> None:
+    """
+    Write a shape to a file, the format is chosen from the suffix of the file name.
+
+    STEP is read by almost every CAD tool and mesher but is slow to write and to read back. BREP, the native format of
+    OCC, holds the same exact geometry and is much faster both ways. STL and VTK files hold a triangulation of the faces
+    rather than the exact geometry, which many meshers accept, and are written in binary. Any other suffix is passed on
+    to cadquery's exporters.
+
+    Args:
+        shape: cadquery Workplane or Shape
+        fname_out: output file name, usually ending in one of EXPORT_FORMATS
+        tolerance: linear deflection of an STL or VTK triangulation, as a fraction of the diagonal of the bounding box
+            of the shape
+        angular_tolerance: angular deflection of an STL or VTK triangulation, in radians
+        cq: cadquery module, or a replacement for testing. Set to None to import cadquery
+
+    Raises:
+        OSError : if an STL or VTK file cannot be written
+
+    """
+    cq = cq or _cadquery()
+    suffix = _suffix(fname_out)
+    if suffix == '.step':
+        with _STEP_LOCK:
+            cq.exporters.export(shape, str(fname_out))
+    elif suffix == '.brep':
+        _single_shape(shape, cq).exportBrep(str(fname_out))
+    elif suffix == '.stl':
+        from OCP.StlAPI import StlAPI_Writer
+
+        compound, _ = tessellate(shape, tolerance, angular_tolerance, cq)
+        writer = StlAPI_Writer()
+        writer.ASCIIMode = False
+        if not writer.Write(compound.wrapped, str(fname_out)):
+            raise OSError(f'Cannot write {fname_out}')
+    elif suffix == '.vtk':
+        from vtkmodules.vtkIOLegacy import vtkPolyDataWriter
+
+        compound, _ = tessellate(shape, tolerance, angular_tolerance, cq)
+        writer = vtkPolyDataWriter()
+        writer.SetFileName(str(fname_out))
+        writer.SetInputData(_triangulation_polydata(compound))
+        writer.SetFileTypeToBinary()
+        if not writer.Write():
+            raise OSError(f'Cannot write {fname_out}')
+    else:
+        cq.exporters.export(shape, str(fname_out))
+
+
+def tessellate(shape, tolerance:float=DEFAULT_TOLERANCE, angular_tolerance:float=DEFAULT_ANGULAR_TOLERANCE, cq=None):
+    """
+    Triangulate the faces of a shape, unless they already hold a triangulation which is as fine.
+
+    The triangulation is stored in the faces of the shape, so later exports of the shape, or of any shape sharing its
+    faces, reuse it.
+
+    Args:
+        shape: cadquery Workplane or Shape
+        tolerance: linear deflection as a fraction of the diagonal of the bounding box of the shape
+        angular_tolerance: angular deflection in radians
+        cq: cadquery module, or a replacement for testing. Set to None to import cadquery
+
+    Returns:
+        (compound, deflection), the single shape holding the triangulation and the linear deflection in the units of
+        the shape
+
+    """
+    from OCP.BRepMesh import BRepMesh_IncrementalMesh
+    from OCP.BRepTools import BRepTools
+
+    compound = _single_shape(shape, cq)
+    box = _exact_bounding_box(compound)
+    deflection = tolerance * float(np.linalg.norm(np.subtract(box[3:], box[:3])))
+    with _MESH_LOCK:
+        if not BRepTools.Triangulation_s(compound.wrapped, deflection):
+            BRepMesh_IncrementalMesh(compound.wrapped, deflection, False, angular_tolerance, True)
+    return compound, deflection
+
+
+def _triangulation_polydata(shape):
+    """
+    vtkPolyData of the triangulation already held in the faces of a shape, see tessellate.
+
+    Unlike cadquery's Shape.toVtkPolyData this does not mesh the shape again, so the triangles are the same as those
+    written to an STL file.
+    """
+    from OCP.BRep import BRep_Tool
+    from OCP.TopAbs import TopAbs_Orientation
+    from OCP.TopLoc import TopLoc_Location
+    from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+    from vtkmodules.vtkCommonCore import vtkPoints
+    from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkPolyData
+
+    nodes, triangles, n_nodes = [], [], 0
+    for face in shape.Faces():
+        location = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation_s(face.wrapped, location)
+        if triangulation is None:
+            continue
+        transformation = location.Transformation()
+        nodes.extend(triangulation.Node(i).Transformed(transformation).Coord()
+                     for i in range(1, triangulation.NbNodes() + 1))
+        face_triangles = np.array([triangulation.Triangle(i).Get() for i in range(1, triangulation.NbTriangles() + 1)])
+        if face.wrapped.Orientation() == TopAbs_Orientation.TopAbs_REVERSED:
+            face_triangles = face_triangles[:, ::-1]
+        triangles.append(face_triangles - 1 + n_nodes)
+        n_nodes += triangulation.NbNodes()
+
+    connectivity = np.concatenate(triangles).ravel() if triangles else np.empty(0)
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(np.array(nodes, dtype=float).reshape(-1, 3), deep=True))
+    cells = vtkCellArray()
+    cells.SetData(numpy_to_vtkIdTypeArray(np.arange(0, len(connectivity) + 1, 3, dtype=np.int64), deep=True),
+                  numpy_to_vtkIdTypeArray(connectivity.astype(np.int64), deep=True))
+    polydata = vtkPolyData()
+    polydata.SetPoints(points)
+    polydata.SetPolys(cells)
+    return polydata
+
+
+def create_stage_endwalls(endwalls:stage.Endwalls, units:str, axis:tuple, cq=None, cache:FileCache=None,
+                          profiler:Profiler=None):
+    """
+    Create the endwall solid of a stage once so that it can be shared by every blade row in the stage.
+
+    Args:
+        endwalls: endwalls of the stage
+        units: units of the inputs and outputs
+        axis: two points which define the axis of rotation
+        cq: cadquery module, or a replacement for testing. Set to None to import cadquery when it is first needed
+        cache: cache used to store the endwall solid between runs, set to None to disable
+        profiler: profiler used to record the time, memory and shape size of each step, set to None to disable
+
+    Returns:
+        (cad_endwalls, (rmin,rmax)), the endwall solid and its radial extent, to be passed to
+        DomainCreator.share_endwalls
+
+    """
+    creator = DomainCreator(None, endwalls, units, axis, cq=cq, cache=cache, profiler=profiler)
+    creator.create_endwalls()
+    return creator.cad_endwalls, creator.find_endwall_radial_extent()
+
+
+def import_step(fname:str, cache:FileCache=None, cq=None):
+    """
+    Import a STEP file, converting it to BREP the first time so that later imports only load the BREP.
+
+    The BREP is keyed by the hash of the contents of the STEP file. The hash is remembered by the path, size and
+    modification time of the file, so an unchanged file is not read at all.
+
+    Args:
+        fname: path to the STEP file
+        cache: cache to store the BREP in, set to None to always import the STEP file
+        cq: cadquery module, or a replacement for testing. Set to None to import cadquery
+
+    Returns:
+        cadquery Workplane holding the imported shape
+
+    """
+    cq = cq or _cadquery()
+    if cache is None:
+        return cq.importers.importStep(fname)
+
+    key = fingerprint('step', cache.hashes.hash(fname))
+    cached = cache.get(key)
+    if cached is not None:
+        shape = cq.Shape.importBrep(str(cached))
+    else:
+        shape = _single_shape(cq.importers.importStep(fname), cq)
+        cache.put(key, shape.exportBrep)
+    return cq.Workplane("XY").add(shape)
+
+
+def _single_shape(wp, cq=None):
+    """Return the single shape held by a Workplane, combining multiple objects into a compound, or a Shape itself."""
+    shapes = wp.vals() if hasattr(wp, 'vals') else [wp]
+    if len(shapes) == 1:
+        return shapes[0]
+    return (cq or _cadquery()).Compound.makeCompound(shapes)
+
+
+def sample_radial_extent(input:'cadquery.Workplane', axis:tuple, n_samples:int=50)->Tuple[float,float]:
+    """
+    Find the radial extent of an object by sampling points along each of its edges.
+
+    Args:
+        input: cad query Workplane object that contains the object of interest
+        axis: two points which define the axis of rotation
+        n_samples: number of points to sample along each edge
+
+    Returns:
+        (rmin,rmax) , the minimum and maximum radial values respectively
+
+    Raises:
+        ValueError : if the object has no edges
+
+    """
+    ts = np.linspace(0.0, 1.0, n_samples)
+    pts = [vec.toTuple() for shape in input.vals() for edge in shape.Edges() for vec in edge.positions(ts)]
+    if not pts:
+        raise ValueError('Object has no edges to sample')
+
+    return geom.find_radial_extent(np.array(pts), axis)
+
+
+def find_radial_extent_of_axisymmetric_object(input:'cadquery.Workplane')->(float,float):
     """
     Find the radial extent of an axisymmetric object by taking a slice at Y=0 (therefore X=R).
 
@@ -162,13 +899,19 @@ def find_radial_extent_of_axisymmetric_object(input:cadquery.Workplane)->(float,
         (rmin,rmax) , the minimum and maximum radial values respectively
 
     """
+    cadquery = _cadquery()
+
+    # the cutting planes must be larger than the object
+    bb = input.objects[0].BoundingBox()
+    size = 2.0 * max(abs(bb.xmin), abs(bb.xmax), abs(bb.ymin), abs(bb.ymax), abs(bb.zmin), abs(bb.zmax)) + 1.0
+
     result2 = \
         input \
             .split(
             cadquery.Workplane()
             .add(cadquery.Face
             .makePlane(
-                5, 5,
+                size, size,
                 cadquery.Vector(0, 0, 0.0),
                 cadquery.Vector(1, 0, 0)))).solids(">>X")
 
@@ -178,7 +921,7 @@ def find_radial_extent_of_axisymmetric_object(input:cadquery.Workplane)->(float,
             cadquery.Workplane()
             .add(cadquery.Face
             .makePlane(
-                5, 5,
+                size, size,
                 cadquery.Vector(0, 0, 0.0),
                 cadquery.Vector(0, 1, 0)))).solids("<<Y")
 
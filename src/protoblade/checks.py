@@ -0,0 +1,231 @@
+"""Functions to check the inputs of a machine before any CAD is created."""
+import pathlib
+from typing import List, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from protoblade import geom
+from protoblade.blade import Blade
+from protoblade.machine import Machine, _read_toml
+from protoblade.stage import Endwalls
+
+STEP_HEADER = 'ISO-10303-21'
+# largest gap allowed between the ends of the pressure and suction sides, as a fraction of the chord
+CLOSURE_TOLERANCE = 1e-3
+
+
+def validate_config_file(fname: str, cache_dir: str = None) -> List[str]:
+    """
+    Check a machine toml file and every section and endwall file it refers to, without importing cadquery.
+
+    File names are relative to the current working directory, as they are when the machine is built.
+
+    Args:
+        fname: path to the toml file
+        cache_dir: directory used to cache parsed fpd files, set to None to disable caching
+
+    Returns:
+        list of problems found, empty if the machine is valid
+
+    """
+    try:
+        config = _read_toml(fname)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return [f'{fname}: cannot read machine definition: {e}']
+
+    problems = []
+    for i_stage, stage_config in enumerate(config.get('stage', [])):
+        name = stage_config.get('name', f'stage {i_stage}')
+        for endwall_config in stage_config.get('endwall', []):
+            problems.extend(_check_endwall_files(name, endwall_config))
+        for blade_config in stage_config.get('blade_section', []):
+            label = f'{name}/{blade_config.get("name", "")}'
+            for key in ['ps_section_fname', 'ss_section_fname']:
+                problems.extend(_check_file(label, blade_config, key))
+    if problems:
+        return problems
+
+    try:
+        machine = Machine.from_config_file(fname, cache_dir)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return [f'{fname}: cannot load machine: {e}']
+
+    if not machine.stages:
+        problems.append(f'{fname}: machine has no stages')
+    for stage in machine.stages:
+        if stage.endwalls.type == 'fpd':
+            for surf in ['hub', 'shroud']:
+                pts = getattr(stage.endwalls, surf)
+                if pts.ndim != 1 or len(pts) < 2:
+                    problems.append(f'{stage.name}: {surf} must be a single curve with at least 2 points')
+        for blade_def in stage.blades:
+            problems.extend(_check_blade(f'{stage.name}/{blade_def.name}', blade_def))
+    if problems:
+        return problems
+    return check_machine_geometry(machine)
+
+
+def _check_endwall_files(label: str, config: dict) -> List[str]:
+    if config.get('type') == 'fpd':
+        return _check_file(label, config, 'hub_fname') + _check_file(label, config, 'shroud_fname')
+    if config.get('type') == 'step':
+        problems = _check_file(label, config, 'step_fname')
+        if not problems:
+            with open(config['step_fname'], errors='replace') as f:
+                if not f.read(len(STEP_HEADER)) == STEP_HEADER:
+                    problems.append(f'{label}: {config["step_fname"]} is not a STEP file')
+        return problems
+    return [f'{label}: invalid endwall type {config.get("type")}']
+
+
+def _check_file(label: str, config: dict, key: str) -> List[str]:
+    if key not in config:
+        return [f'{label}: {key} is missing']
+    if not pathlib.Path(config[key]).is_file():
+        return [f'{label}: {config[key]} does not exist']
+    return []
+
+
+def _check_blade(label: str, blade_def) -> List[str]:
+    problems = []
+    if blade_def.n_blade <= 0:
+        problems.append(f'{label}: n_blade must be positive')
+
+    ps, ss = blade_def.ps_sections, blade_def.ss_sections
+    if ps.ndim != 2 or ss.ndim != 2:
+        problems.append(f'{label}: pressure and suction sides must each have at least 2 sections')
+    elif len(ps) != len(ss):
+        problems.append(f'{label}: pressure side has {len(ps)} sections but suction side has {len(ss)}')
+    elif ps.shape[1] < 2 or ss.shape[1] < 2:
+        problems.append(f'{label}: each section must have at least 2 points')
+    return problems
+
+
+class PreflightError(ValueError):
+    """Raised when the geometry of a machine fails the checks run before any CAD is created."""
+
+    def __init__(self, problems: List[str]):
+        super().__init__('Geometry checks failed:\n' + '\n'.join(problems))
+        self.problems = problems
+
+
+def check_machine_geometry(machine: Machine) -> List[str]:
+    """
+    Check the geometry of every blade row of a machine, see check_blade_geometry.
+
+    Args:
+        machine: machine to check
+
+    Returns:
+        list of problems found, empty if every blade row passes
+
+    """
+    problems = []
+    for stage in machine.stages:
+        for blade_def in stage.blades:
+            problems.extend(check_blade_geometry(f'{stage.name}/{blade_def.name}', blade_def, stage.endwalls,
+                                                 machine.axis))
+    return problems
+
+
+def check_blade_geometry(label: str, blade_def: Blade, endwalls: Endwalls, axis: tuple,
+                         engine: str = 'kdtree', workers: int = 0) -> List[str]:
+    """
+    Check the sections of a blade row against each other and the endwalls, using NumPy alone.
+
+    These are the mistakes which otherwise only surface as a failed loft or Boolean operation well into
+    DomainCreator.create_domain:
+
+    * the pressure and suction sides of a section do not meet at both ends
+    * a section crosses itself, in the r-theta, z plane
+    * fpd endwalls are not cut by the blade, i.e. the sections, once extended to the hub, do not reach the hub and
+      shroud curves
+    * the midline of a section crosses the blade or its neighbour
+
+    Args:
+        label: name of the blade row used in the problems
+        blade_def: blade row to check
+        endwalls: endwalls of the stage the blade row belongs to
+        axis: two points which define the axis of rotation
+        engine: name of the midline engine DomainCreator uses, see geom.MIDLINE_ENGINES
+        workers: number of threads used to create the midlines, set to 0 or less to use every core
+
+    Returns:
+        list of problems found, empty if the blade row passes
+
+    """
+    from protoblade.cad import create_blade_midlines
+    from protoblade.preview import endwall_extent
+
+    problems = _check_blade(label, blade_def)
+    if problems:
+        return problems
+
+    ps, ss = geom.as_xyz(blade_def.ps_sections), geom.as_xyz(blade_def.ss_sections)
+    chord = np.linalg.norm(ps[:, -1] - ps[:, 0], axis=-1)
+    for end, name in [(0, 'first'), (-1, 'last')]:
+        gap = np.linalg.norm(ps[:, end] - ss[:, end], axis=-1)
+        for i in np.flatnonzero(gap > CLOSURE_TOLERANCE * chord):
+            problems.append(f'{label}: section {i} pressure and suction sides do not meet, their {name} points are '
+                            f'{gap[i]:.3g} apart')
+    if problems:
+        return problems
+
+    xyz, loops = _section_loops(ps, ss)
+    for i, loop in enumerate(loops):
+        for j, k in geom.find_self_intersections(loop, closed=True):
+            x, y, z = xyz[i, k]
+            problems.append(f'{label}: section {i} crosses itself near ({x:.4g}, {y:.4g}, {z:.4g})')
+    if problems:
+        return problems
+
+    try:
+        z_min, z_max, r_min, _ = endwall_extent(endwalls, axis)
+    except (OSError, ValueError) as e:
+        return [f'{label}: cannot find the extent of the endwalls: {e}']
+
+    if endwalls.type == 'fpd':
+        problems.extend(_check_radial_coverage(label, blade_def, endwalls, r_min))
+
+    mid_points, _ = create_blade_midlines(blade_def, z_min, z_max, r_min, engine, workers=workers)
+    _, loops = _section_loops(geom.as_xyz(geom.extend_sections_to_radius(blade_def.ps_sections, r_min)),
+                              geom.as_xyz(geom.extend_sections_to_radius(blade_def.ss_sections, r_min)))
+    for i, (loop, mid_line) in enumerate(zip(loops, mid_points)):
+        mid_line = geom.cartesian_to_polar(geom.as_xyz(mid_line).reshape(-1, 3))[:, 1:]
+        mid_line[:, 0] = np.unwrap(mid_line[:, 0])
+        loop = np.concatenate((loop, loop[:1]))
+        for shift, side in [(0.0, 'blade'), (blade_def.pitch_angle_rad, 'neighbouring blade')]:
+            loop_start, loop_end = loop[:-1] + (shift, 0.0), loop[1:] + (shift, 0.0)
+            if len(geom.find_segment_intersections(mid_line[:-1], mid_line[1:], loop_start, loop_end)):
+                problems.append(f'{label}: the midline of section {i} crosses the {side}, so the periodic boundary '
+                                f'does not lie in the passage')
+    return problems
+
+
+def _section_loops(ps: NDArray, ss: NDArray) -> Tuple[NDArray, NDArray]:
+    """Join the pressure side to the reversed suction side of each section, as (xyz, (theta, z)) of each loop."""
+    xyz = np.concatenate((ps, ss[:, ::-1]), axis=1)
+    loops = geom.cartesian_to_polar(xyz)[..., 1:]
+    loops[..., 0] = np.unwrap(loops[..., 0], axis=-1)
+    return xyz, loops
+
+
+def _check_radial_coverage(label: str, blade_def: Blade, endwalls: Endwalls, r_min: float) -> List[str]:
+    problems = []
+    for surf, side in [('ps_sections', 'pressure side'), ('ss_sections', 'suction side')]:
+        # sections which do not reach the hub are extended to it before the blade is lofted
+        sections = geom.as_xyz(geom.extend_sections_to_radius(getattr(blade_def, surf), r_min))
+        for wall, section, sign in [('hub', sections[0], 1.0), ('shroud', sections[-1], -1.0)]:
+            wall_pts = geom.as_xyz(getattr(endwalls, wall)).reshape(-1, 3)
+            order = np.argsort(wall_pts[:, 2])
+            r_wall = np.hypot(wall_pts[order, 0], wall_pts[order, 1])
+            z_wall = wall_pts[order, 2]
+
+            z = section[:, 2]
+            inside = (z >= z_wall[0]) & (z <= z_wall[-1])
+            # distance by which the section falls short of the endwall
+            gap = sign * (np.hypot(section[:, 0], section[:, 1]) - np.interp(z, z_wall, r_wall))
+            if np.any(inside & (gap > 0.0)):
+                worst = np.argmax(np.where(inside, gap, -np.inf))
+                problems.append(f'{label}: the {side} does not reach the {wall}, it falls short by {gap[worst]:.3g} '
+                                f'at z = {z[worst]:.4g}')
+    return problems
@@ -1,7 +1,116 @@
 import argparse
+from protoblade.cad import DEFAULT_ANGULAR_TOLERANCE, DEFAULT_TOLERANCE, EXPORT_ENTITIES, EXPORT_FORMATS
+from protoblade.lod import LEVELS
+from protoblade.machine import GLUE_OPTIONS
+from protoblade.profiling import PROFILE_FORMATS
 
 
 def create_parser():
     parser = argparse.ArgumentParser(description=' Protoblade')
     parser.add_argument('filepath', help='Location of the input file.')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Directory used to cache parsed input files and intermediate solids between runs. '
+                             'Caching is off if not given.')
+    parser.add_argument('--cache-size', type=float, default=1024,
+                        help='Maximum size of the intermediate solid cache in MB. The least recently used solids are '
+                             'removed when this is exceeded.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of processes used to build blade rows in parallel. Set to 0 to use every core.')
+    parser.add_argument('--profile', default=None, metavar='FILE',
+                        help='Record the wall time, peak memory and shape size of each step and write them to FILE.')
+    parser.add_argument('--profile-format', choices=PROFILE_FORMATS, default='json',
+                        help='Format of the profile file, a list of steps (json) or a Chrome trace (chrome).')
+    parser.add_argument('--passages', type=int, default=1,
+                        help='Number of passages of each blade row to export, set to 0 for the full annulus. The '
+                             'passages are rotated copies of a single passage domain.')
+    parser.add_argument('--fuse-passages', action='store_true',
+                        help='Fuse the passages into a single solid without the periodic faces between them. This is '
+                             'much slower as the Boolean operations are repeated for the whole sector.')
+    parser.add_argument('--preview', nargs='?', const='', default=None, metavar='FILE',
+                        help='Write the blade sections, midlines and endwall curves to FILE (.vtk or .npz) without '
+                             'creating any CAD. FILE defaults to the input file with a -preview.vtk suffix.')
+    parser.add_argument('--lod', choices=list(LEVELS), default='full',
+                        help='Level of detail. coarse and medium build the domain from fewer sections and points, '
+                             'with shorter midlines and a looser Boolean tolerance, which is much faster. full uses '
+                             'every section and point.')
+    parser.add_argument('--format', choices=[suffix[1:] for suffix in EXPORT_FORMATS], default='step',
+                        help='Format of the output files. brep holds the same exact geometry as step and is much '
+                             'faster to write and read, stl and vtk hold a triangulation of the faces.')
+    parser.add_argument('--export', nargs='+', choices=EXPORT_ENTITIES, default=['domain'], metavar='ENTITY',
+                        help=f'Products of each blade row to export, any of {", ".join(EXPORT_ENTITIES)}. Each is '
+                             f'written to its own file, at the same time as the others.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Linear deflection of the triangulation of stl and vtk outputs, as a fraction of the '
+                             'size of each shape.')
+    parser.add_argument('--angular-tolerance', type=float, default=DEFAULT_ANGULAR_TOLERANCE,
+                        help='Angular deflection of the triangulation of stl and vtk outputs, in radians.')
+    parser.add_argument('--force', action='store_true',
+                        help='Build and write every output. By default an output whose inputs, or geometry, are '
+                             'unchanged since the last run, and which has not been touched since, is not written '
+                             'again.')
+    parser.add_argument('--no-preflight', action='store_true',
+                        help='Skip the checks of the blade sections against each other and the endwalls which are run '
+                             'before any CAD is created.')
+    add_boolean_arguments(parser)
+    return parser
+
+
+def add_boolean_arguments(parser):
+    """Add the options which override the [machine.boolean] settings of the input file."""
+    parser.add_argument('--serial-booleans', action='store_true',
+                        help='Run the Boolean operations on a single core rather than in parallel.')
+    parser.add_argument('--fuzzy', type=float, default=None,
+                        help='Fuzzy tolerance of the Boolean operations, within which near coincident faces are '
+                             'treated as coincident.')
+    parser.add_argument('--glue', choices=GLUE_OPTIONS, default=None,
+                        help='Glue option of the Boolean operations, for shapes which only touch (shift) or share '
+                             'faces (full).')
+
+
+def boolean_overrides(args) -> dict:
+    """Collect the Boolean options given on the command line."""
+    overrides = {'fuzzy': args.fuzzy, 'glue': args.glue}
+    if args.serial_booleans:
+        overrides['parallel'] = False
+    return {key: value for key, value in overrides.items() if value is not None}
+
+
+def create_validate_parser():
+    parser = argparse.ArgumentParser(prog='protoblade validate',
+                                     description='Check a machine file and every section and endwall file it refers '
+                                                 'to, without creating any CAD.')
+    parser.add_argument('filepath', help='Location of the input file.')
+    return parser
+
+
+def create_cache_parser():
+    parser = argparse.ArgumentParser(prog='protoblade cache',
+                                     description='Manage the cache of parsed input files, imported STEP files and '
+                                                 'intermediate solids.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    clear = subparsers.add_parser('clear', help='Remove everything from a cache directory, so that every input is '
+                                                'read and every solid is built again on the next run.')
+    clear.add_argument('cache_dir', help='Directory passed as --cache-dir.')
+    return parser
+
+
+def create_sweep_parser():
+    parser = argparse.ArgumentParser(prog='protoblade sweep',
+                                     description='Create the domains of every variant of a machine defined by a sweep '
+                                                 'file.')
+    parser.add_argument('filepath', help='Location of the input file defining the base machine.')
+    parser.add_argument('sweep', help='Location of the sweep file defining the parameters to vary.')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Base name of the output files. Defaults to the input file with a .step suffix.')
+    parser.add_argument('--manifest', default=None,
+                        help='File to write the outputs and timings of each variant to. Defaults to the base output '
+                             'name with a -manifest.json suffix.')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Directory used to cache parsed input files and intermediate solids between runs. '
+                             'Caching is off if not given.')
+    parser.add_argument('--cache-size', type=float, default=1024,
+                        help='Maximum size of the intermediate solid cache in MB.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of processes used to build variants in parallel. Set to 0 to use every core.')
+    add_boolean_arguments(parser)
     return parser
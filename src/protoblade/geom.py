@@ -1,9 +1,15 @@
 """A set of functions to undertake geometrical manipulations."""
+from __future__ import annotations
+import functools
+import hashlib
 import math
+import os
 import pathlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from atom.api import Atom, Property, Typed
 from numpy.typing import NDArray
-from scipy.interpolate import interp1d
 from typing import Tuple
 from enum import Enum
 
@@ -11,11 +17,127 @@ cartesian_type = np.dtype([("x", np.double), ("y", np.double), ("z", np.double)]
 polar_type = np.dtype([("r", np.double), ("theta", np.double), ("z", np.double)])
 
 
-def load_curves_from_fpd(fname: str or pathlib.Path) -> NDArray:
-    """Load a series of curves from a formatted point data (fpd) file."""
+def as_xyz(pts: NDArray) -> NDArray:
+    """
+    View an array of dtype cartesian_type as an array of doubles with a last dimension of (x,y,z).
+
+    A contiguous array of cartesian_type records has the same memory layout as an array of doubles with a last
+    dimension of 3, so no copy is made unless pts is not contiguous. Arrays of polar_type are viewed as (r,theta,z).
+
+    Args:
+        pts: array of dtype cartesian_type or polar_type, or an array which already has a last dimension of (x,y,z)
+
+    Returns:
+        array of doubles shaped pts.shape + (3,)
+
+    """
+    if pts.dtype.names:
+        if pts.dtype not in (cartesian_type, polar_type):
+            return np.stack((pts['x'], pts['y'], pts['z']), axis=-1)
+        return np.ascontiguousarray(pts).view(np.double).reshape(pts.shape + (3,))
+    return np.asarray(pts, dtype=np.double)
+
+
+def as_cartesian(xyz: NDArray) -> NDArray:
+    """
+    View an array of doubles with a last dimension of (x,y,z) as an array of dtype cartesian_type, without a copy if
+    xyz is contiguous.
+
+    Args:
+        xyz: array with a last dimension of 3
+
+    Returns:
+        array of dtype cartesian_type shaped xyz.shape[:-1]
+
+    """
+    xyz = np.ascontiguousarray(xyz, dtype=np.double)
+    return xyz.view(cartesian_type).reshape(xyz.shape[:-1])
+
+
+class SectionStack(Atom):
+    """
+    A stack of sections held as a single contiguous (n_sections, n_points, 3) array of doubles.
+
+    Whole stack operations work on xyz directly, while records gives the usual access through ['x'], ['y'] and ['z']
+    as a view of the same memory.
+    """
+
+    xyz = Typed(np.ndarray)
+    records = Property()
+    n_sections = Property()
+    n_points = Property()
+
+    @classmethod
+    def from_sections(cls, sections) -> SectionStack:
+        """
+        Create a stack from sections of dtype cartesian_type, either an (n_sections, n_points) array or a list of
+        sections, or from an (n_sections, n_points, 3) array. A contiguous array is used without a copy.
+        """
+        if isinstance(sections, (list, tuple)):
+            sections = np.stack(sections)
+        return cls(xyz=as_xyz(sections))
+
+    def _get_records(self) -> NDArray:
+        return as_cartesian(self.xyz)
+
+    def _get_n_sections(self) -> int:
+        return self.xyz.shape[0]
+
+    def _get_n_points(self) -> int:
+        return self.xyz.shape[-2]
+
+    def radius(self) -> NDArray:
+        """Return the distance of every point from the z axis, shaped (n_sections, n_points)."""
+        return np.hypot(self.xyz[..., 0], self.xyz[..., 1])
+
+
+def load_curves_from_fpd(fname: str or pathlib.Path, cache_dir: str or pathlib.Path = None) -> NDArray:
+    """
+    Load a series of curves from a formatted point data (fpd) file.
+
+    Args:
+        fname: path to the fpd file
+        cache_dir: directory used to cache the parsed points as a binary .npy file. On subsequent loads of an
+                   unchanged file the cached array is memory-mapped rather than parsed. Set to None to disable caching.
+
+    Returns:
+        array of dtype cartesian_type, shaped (n_curve, n_pts) if the file contains more than one curve
+
+    """
+    if cache_dir is None:
+        return _parse_fpd(fname)
+
+    cache_fname = _fpd_cache_fname(fname, cache_dir)
+    if cache_fname.is_file():
+        return np.load(cache_fname, mmap_mode='c')
+
+    pts = _parse_fpd(fname)
+
+    fd, tmp_fname = tempfile.mkstemp(dir=cache_fname.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, pts)
+    os.replace(tmp_fname, cache_fname)
+
+    # remove entries for older versions of this file, those still memory-mapped cannot be removed on Windows and are
+    # left for a later load
+    for stale in cache_fname.parent.glob(cache_fname.name.rsplit('-', 1)[0] + '-*.npy'):
+        if stale != cache_fname:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+    return pts
+
+
+def _parse_fpd(fname: str or pathlib.Path) -> NDArray:
+    """Parse a fpd file in a single pass into a contiguous array of points."""
     with open(fname, 'r') as f:
         n_pts, n_curve = list(map(int, f.readline().split()))
-        pts = np.array([tuple(map(float, line.split())) for line in f.readlines()], dtype=cartesian_type)
+        xyz = np.loadtxt(f, dtype=np.double, ndmin=2)
+
+    # a contiguous (N,3) array of doubles has the same memory layout as N cartesian_type records
+    pts = np.ascontiguousarray(xyz).view(cartesian_type).reshape(-1)
 
     if n_curve > 1:
         pts = np.reshape(pts, (n_curve, n_pts))
@@ -23,33 +145,118 @@ def load_curves_from_fpd(fname: str or pathlib.Path) -> NDArray:
     return pts
 
 
-def convert_to_polar(pts: NDArray) -> NDArray:
+def _fpd_cache_fname(fname: str or pathlib.Path, cache_dir: str or pathlib.Path) -> pathlib.Path:
+    """Return the cache file for fname, keyed by its absolute path, size and modification time."""
+    fname = pathlib.Path(fname).resolve()
+    stat = fname.stat()
+
+    path_key = hashlib.sha1(str(fname).encode()).hexdigest()[:12]
+    state_key = hashlib.sha1(f'{stat.st_size}-{stat.st_mtime_ns}'.encode()).hexdigest()[:12]
+
+    cache_dir = pathlib.Path(cache_dir) / 'fpd'
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    return cache_dir / f'{fname.stem}-{path_key}-{state_key}.npy'
+
+
+def convert_to_polar(pts: NDArray, out: NDArray = None) -> NDArray:
     """
     Create arrays for radius , Theta and Z from cartesian array.
 
+    Theta is in (-pi, pi], so points on or across the Y axis are handled.
+
     Args:
-        pts: array of cartesian points dtype cartesian
+        pts: array of cartesian points dtype cartesian, of any shape, e.g. a stack of sections
+        out: array of dtype polar_type, the same shape as pts, to write the result to. Set to None to create one
 
      Returns:
         An array which can be accessed through ['z'],['r'] and['theta' for Z, Radius and Theta respectively
 
     """
-    out = np.empty(shape=(pts['z'].shape[0],), dtype=polar_type)
+    if out is None:
+        out = np.empty(shape=pts.shape, dtype=polar_type)
+    cartesian_to_polar(as_xyz(pts), out=as_xyz(out))
+    return out
+
+
+def cartesian_to_polar(xyz: NDArray, out: NDArray = None) -> NDArray:
+    """
+    Convert points with a last dimension of (x,y,z) to (r,theta,z), with theta from arctan2 in (-pi, pi].
+
+    Args:
+        xyz: array with a last dimension of 3, e.g. an (n_sections, n_points, 3) stack
+        out: array of doubles the same shape as xyz to write the result to, which may be xyz itself. Set to None to
+            create one
+
+    Returns:
+        out
+
+    """
+    if out is None:
+        out = np.empty_like(xyz, dtype=np.double)
+    x, y = xyz[..., 0], xyz[..., 1]
+    if np.shares_memory(xyz, out):
+        x, y = x.copy(), y.copy()
+    else:
+        out[..., 2] = xyz[..., 2]
+
+    np.hypot(x, y, out=out[..., 0])
+    np.arctan2(y, x, out=out[..., 1])
+    return out
+
+
+def polar_to_cartesian(rtz: NDArray, out: NDArray = None) -> NDArray:
+    """
+    Convert points with a last dimension of (r,theta,z) to (x,y,z).
 
-    out['z'] = pts['z']
-    out['r'] = (pts['x'] ** 2.0 + pts['y'] ** 2) ** 0.5
-    out['theta'] = np.arctan(pts['y'] / pts['x'])
+    Args:
+        rtz: array with a last dimension of 3, e.g. an (n_sections, n_points, 3) stack
+        out: array of doubles the same shape as rtz to write the result to, which may be rtz itself. Set to None to
+            create one
 
+    Returns:
+        out
+
+    """
+    if out is None:
+        out = np.empty_like(rtz, dtype=np.double)
+    r, theta = rtz[..., 0], rtz[..., 1]
+    if np.shares_memory(rtz, out):
+        r, theta = r.copy(), theta.copy()
+    else:
+        out[..., 2] = rtz[..., 2]
+
+    np.cos(theta, out=out[..., 0])
+    out[..., 0] *= r
+    np.sin(theta, out=out[..., 1])
+    out[..., 1] *= r
     return out
 
 
 def calculate_curve_length(x: NDArray, y: NDArray) -> NDArray:
     """Create an array of curve length based on the two input arrays x,y."""
-    s = np.zeros(x.shape[0])
-    for i in range(1, x.shape[0]):
-        dx = x[i] - x[i - 1]
-        dy = y[i] - y[i - 1]
-        s[i] = s[i - 1] + np.sqrt(dx * dx + dy * dy)
+    return calculate_curve_lengths(x, y)
+
+
+def calculate_curve_lengths(x: NDArray, y: NDArray) -> NDArray:
+    """
+    Create an array of curve length for every curve in a stack of curves.
+
+    Args:
+        x: array of x co-ordinates of shape (n_curves, n_points) or (n_points,)
+        y: array of y co-ordinates, the same shape as x
+
+    Returns:
+        array of curve length along the last axis, the same shape as x
+
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    dx = np.diff(x, axis=-1)
+    dy = np.diff(y, axis=-1)
+
+    s = np.zeros(x.shape)
+    np.cumsum(np.sqrt(dx * dx + dy * dy), axis=-1, out=s[..., 1:])
     return s
 
 
@@ -68,45 +275,252 @@ def reinterpolate_curve(x: NDArray, y: NDArray, s: NDArray, base: float = 1.5, N
         A tuple of three arrays newly interpolated arrays : x_new,y_new,s_new
 
     """
-    N = x.shape[0]
-    fx = interp1d(s, x)
-    fy = interp1d(s, y)
+    x_new, y_new, s_new = reinterpolate_curves(x[np.newaxis], y[np.newaxis], s[np.newaxis], base, N_new)
+    return x_new[0], y_new[0], s_new[0]
+
+
+def reinterpolate_curves(x: NDArray, y: NDArray, s: NDArray, base: float = 1.5, N_new: int = 0) -> Tuple[
+    NDArray, NDArray, NDArray]:
+    """
+    Reinterpolate a stack of curves based on a power law to a given base.
+
+    This is the batched form of reinterpolate_curve, every curve in the stack is reinterpolated at once.
+
+    Args:
+        x: array for axial co-ordinate of shape (n_curves, n_points)
+        y: array for y co-ordinate of shape (n_curves, n_points)
+        s: array for curve length of shape (n_curves, n_points), increasing along each curve
+        base: base for power law should be >1. The higher the number the closer the clustering
+        N_new : Half the number points for the newly reintpolated array. Set to 0 to keep the same as the input
+    Returns
+        A tuple of three arrays newly interpolated arrays, each of shape (n_curves, 2*N_new-1) : x_new,y_new,s_new
+
+    """
+    if N_new == 0:
+        N_new = x.shape[-1]
+
+    del_s = np.max(s, axis=-1, keepdims=True) - np.min(s, axis=-1, keepdims=True)
+    s_new = power_law_distribution(N_new, base) * del_s
+
+    return _interp_rows(s_new, s, x), _interp_rows(s_new, s, y), s_new
+
+
+@functools.lru_cache(maxsize=None)
+def power_law_distribution(N_new: int, base: float) -> NDArray:
+    """
+    Create a distribution from 0 to 1 clustered at both ends by a power law.
+
+    The result is cached and read-only as it is reused for every curve with the same number of points.
 
-    del_s = max(s) - min(s)
+    Args:
+        N_new: Half the number of points in the distribution
+        base: base for power law should be >1. The higher the number the closer the clustering
 
+    Returns:
+        array of 2*N_new-1 increasing values from 0 to 1
+
+    """
     start = 0.0 ** (1.0 / base)
     mid = 0.5 ** (1.0 / base)
-    if N_new == 0:
-        N_new = N
-    s_new = np.zeros(N_new)
-    for i in range(1, N_new + 1):
-        s_new[i - 1] = (start + (i - 1) * (mid - start) / (N_new - 1)) ** base
+    # python floats are used so the values match the original scalar implementation bit for bit
+    half = np.array([(start + (i - 1) * (mid - start) / (N_new - 1)) ** base for i in range(1, N_new + 1)])
+
+    dist = np.concatenate((half, 1 - np.flipud(half)[1:]))
+    dist.setflags(write=False)
+    return dist
+
+
+def _interp_rows(xq: NDArray, xp: NDArray, fp: NDArray) -> NDArray:
+    """
+    Linearly interpolate each row of fp, defined at the points in the same row of xp, to the points in xq.
+
+    Points outside of a row of xp are linearly extrapolated from the end segments.
+    """
+    n_rows, n_pts = xp.shape
+    rows = np.arange(n_rows)[:, np.newaxis]
+
+    # search every row at once by normalising each row to [0,1] and shifting rows so they do not overlap
+    lo = xp[:, :1]
+    span = xp[:, -1:] - lo
+    span[span == 0.0] = 1.0
+    shift = 2.0 * rows
+    idx = np.searchsorted(((xp - lo) / span + shift).ravel(), ((xq - lo) / span + shift).ravel())
+    idx = np.clip(idx.reshape(xq.shape) - rows * n_pts, 1, n_pts - 1)
+
+    # normalising can move a point across a neighbouring value, so correct the index against the original values
+    idx -= (idx > 1) & (xq <= xp[rows, idx - 1])
+    idx += (idx < n_pts - 1) & (xq > xp[rows, idx])
+
+    x_lo = xp[rows, idx - 1]
+    f_lo = fp[rows, idx - 1]
+    slope = (fp[rows, idx] - f_lo) / (xp[rows, idx] - x_lo)
+    return slope * (xq - x_lo) + f_lo
+
+
+def calculate_curvature(x: NDArray, y: NDArray, z: NDArray = None) -> NDArray:
+    """
+    Calculate the curvature at each point of one or more curves.
+
+    Derivatives are taken with respect to the chord length along the last axis, so every row of a 2D input is treated
+    as a separate curve.
+
+    Args:
+        x: x co-ordinates of the curve
+        y: y co-ordinates of the curve
+        z: z co-ordinates of the curve, set to None for a planar curve
+
+    Returns:
+        curvature, the inverse of the radius of curvature, which is signed (positive anti-clockwise) for planar curves
+
+    """
+    s = calculate_curve_lengths(x, y) if z is None else np.concatenate(
+        (np.zeros(np.shape(x)[:-1] + (1,)),
+         np.cumsum(np.sqrt(np.diff(x) ** 2 + np.diff(y) ** 2 + np.diff(z) ** 2), axis=-1)), axis=-1)
+
+    coords = [x, y] if z is None else [x, y, z]
+    first = [_gradient(c, s) for c in coords]
+    second = [_gradient(d, s) for d in first]
+
+    if z is None:
+        (dx, dy), (ddx, ddy) = first, second
+        return (dx * ddy - dy * ddx) / np.power(dx ** 2 + dy ** 2, 1.5)
 
-    s_2 = np.flipud(s_new)
+    cross = np.cross(np.stack(first, axis=-1), np.stack(second, axis=-1))
+    speed = np.linalg.norm(np.stack(first, axis=-1), axis=-1)
+    return np.linalg.norm(cross, axis=-1) / speed ** 3
 
-    s_3 = 1 - s_2
-    s_4 = np.delete(s_3, 0)
 
-    s_new = np.concatenate((s_new, s_4)) * del_s
+def _gradient(f: NDArray, s: NDArray) -> NDArray:
+    """Gradient of each row of f with respect to the matching row of s."""
+    if np.ndim(f) == 1:
+        return np.gradient(f, s, edge_order=2)
+    return np.stack([np.gradient(f_row, s_row, edge_order=2) for f_row, s_row in zip(f, s)])
 
-    x_new = np.zeros(len(s_new))
-    y_new = np.zeros(len(s_new))
-    for i in range(len(s_new)):
-        x_new[i] = fx(s_new[i])
-        y_new[i] = fy(s_new[i])
 
-    return x_new, y_new, s_new
+# largest change in direction between two retained points before any deviation check, in radians
+MAX_TURNING_ANGLE = np.radians(20.0)
 
 
-def calculate_curvature() -> NDArray:
-    """Caluclate curvature of x,y."""
-    return
+def decimate_curve(xyz: NDArray, tolerance: float, keep: NDArray = None) -> NDArray:
+    """
+    Find the fewest points of a curve that a cubic spline can be fitted through while reproducing the curve.
+
+    Points are first retained so that the curve turns by no more than MAX_TURNING_ANGLE between them, which places
+    more points where the curvature is high, e.g. around the leading and trailing edges. The point furthest from the
+    spline is then added to every interval that deviates by more than the tolerance until the whole curve is within it.
+
+    Args:
+        xyz: (N,3) array of points along the curve
+        tolerance: maximum distance between the original points and the spline through the retained points
+        keep: indices of points which must be retained
+
+    Returns:
+        sorted indices of the retained points, which always include the first and last point
+
+    Raises:
+        ValueError : if the tolerance is not positive
+
+    """
+    if tolerance <= 0.0:
+        raise ValueError(f'Decimation tolerance must be positive, got {tolerance}')
+    n_pts = len(xyz)
+    retain = np.zeros(n_pts, dtype=bool)
+    retain[[0, -1]] = True
+    if keep is not None:
+        retain[keep] = True
+    if n_pts <= 4:
+        return np.arange(n_pts)
+
+    # curvature aware starting points, equally spaced in turning angle
+    kappa = calculate_curvature(xyz[:, 0], xyz[:, 1], xyz[:, 2])
+    s = _chord_lengths(xyz)
+    turning = np.concatenate(([0.0], np.cumsum(0.5 * (kappa[1:] + kappa[:-1]) * np.diff(s))))
+    retain[np.searchsorted(turning, np.arange(MAX_TURNING_ANGLE, turning[-1], MAX_TURNING_ANGLE))] = True
+
+    while True:
+        idx = np.flatnonzero(retain)
+        deviation = spline_deviation(xyz, idx)
+        interval = np.searchsorted(idx, np.arange(n_pts))
+        worst = {}
+        for i in np.flatnonzero(deviation > tolerance):
+            if interval[i] not in worst or deviation[i] > deviation[worst[interval[i]]]:
+                worst[interval[i]] = i
+        if not worst:
+            return idx
+        retain[list(worst.values())] = True
+
+
+def spline_deviation(xyz: NDArray, idx: NDArray) -> NDArray:
+    """
+    Find the distance of every point of a curve from a cubic spline through a subset of its points.
+
+    The spline uses chord length parameterisation, as OCC does when interpolating the points of a section. Points which
+    are not retained are compared to the spline at the parameter found by scaling their arc length position between
+    the neighbouring retained points.
 
+    Args:
+        xyz: (N,3) array of points along the curve
+        idx: sorted indices of the retained points
+
+    Returns:
+        array of N distances, zero at the retained points
 
-def create_midlines(ps_sections, ss_sections, z_min, z_max, pitch_angle_rad,n_resample: int = 0):
+    """
+    from scipy.interpolate import make_interp_spline
+
+    s = _chord_lengths(xyz)
+    u_retained = _chord_lengths(xyz[idx])
+    u = np.interp(s, s[idx], u_retained)
+
+    spline = make_interp_spline(u_retained, xyz[idx], k=min(3, len(idx) - 1))
+    return np.linalg.norm(spline(u) - xyz, axis=1)
+
+
+def decimate_curves(curves: NDArray, tolerance: float) -> Tuple[NDArray, float]:
+    """
+    Decimate a stack of curves, e.g. every section of a blade surface, keeping the same points of every curve.
+
+    The union of the points required by each curve is retained so that the result is still a rectangular array.
+
+    Args:
+        curves: array of dtype cartesian_type shaped (n_curves, n_pts), or an (n_curves, n_pts, 3) array
+        tolerance: maximum distance between the original points and the spline through the retained points
+
+    Returns:
+        (idx, max_deviation), the sorted indices of the retained points and the largest deviation of any curve
+
+    Raises:
+        ValueError : if the tolerance is not positive
+
+    """
+    xyz = as_xyz(curves)
+    keep = np.array([0], dtype=int)
+    while True:
+        # adding points for one curve can move the spline of another, so repeat until no curve needs more points
+        n_keep = len(keep)
+        for curve in xyz:
+            keep = np.union1d(keep, decimate_curve(curve, tolerance, keep))
+        if len(keep) == n_keep:
+            break
+
+    max_deviation = max(float(np.max(spline_deviation(curve, keep))) for curve in xyz)
+    return keep, max_deviation
+
+
+def _chord_lengths(xyz: NDArray) -> NDArray:
+    return np.concatenate(([0.0], np.cumsum(np.linalg.norm(np.diff(xyz, axis=0), axis=1))))
+
+
+def create_midlines(ps_sections, ss_sections, z_min, z_max, pitch_angle_rad,n_resample: int = 0,
+                    engine: str = 'loop', workers: int = 0, n_points: int = 200):
     """
     Create curves to represent the midline of a pressure and section surfaces.
 
+    The sections are independent, so they are spread across a pool of threads, scipy releases the GIL while it
+    triangulates. The 'loop' and 'kdtree' engines resample the sections with the Fourier method and, with n_resample
+    set to 0, resample every section after the first to n_points, so that they reproduce the original midlines. The
+    'delaunay' engine resamples each section uniformly by arc length and only when n_resample is set.
+
     Args:
         ps_sections: array of pressure surface sections N sections with M points
         ss_sections: array of suction surface sections N sections with M points
@@ -114,31 +528,91 @@ def create_midlines(ps_sections, ss_sections, z_min, z_max, pitch_angle_rad,n_re
         z_max: maximum z value for the midline
         pitch_angle_rad : pitch angle between blades in radians
         n_resample: number of points in the reinterpolated midpoint, set to 0 to skip reinterpolation
+        engine: name of the midline engine to use, see MIDLINE_ENGINES
+        workers: number of threads to use, set to 0 or less to use every core
+        n_points: number of points in each midline when n_resample is 0
 
     Returns:
         midpoints : array of midpoint curves : Nsections with M points
 
-    """
-    mid_points = []
-    N_sections = ps_sections.shape[0]
-    from scipy.signal import resample
-    for i in range(N_sections):
-        section_ = np.concatenate((ps_sections[i], ss_sections[i][::-1]))
-        section_polar = convert_to_polar(section_)
-        rad = np.mean(section_polar['r'])
-
-        z = section_polar['z']
-        rt = section_polar['r'] * section_polar['theta']
+    Raises:
+        ValueError : if the engine is not recognised
 
-        if n_resample > 0:
+    """
+    if engine not in MIDLINE_ENGINES:
+        raise ValueError(f'Invalid midline engine {engine}, valid options are {list(MIDLINE_ENGINES)}')
+    create = MIDLINE_ENGINES[engine]
+
+    # every section, the pressure surface followed by the reversed suction surface, converted in a single buffer
+    polar = np.concatenate((as_xyz(ps_sections), as_xyz(ss_sections)[:, ::-1]), axis=1)
+    cartesian_to_polar(polar, out=polar)
+    # keep theta continuous along sections which cross the negative X axis
+    polar[..., 1] = np.unwrap(polar[..., 1], axis=-1)
+
+    tol = 1e-3
+    tasks = []
+    for section_polar in polar:
+        rad = np.mean(section_polar[:, 0])
+
+        z = section_polar[:, 2]
+        rt = section_polar[:, 0] * section_polar[:, 1]
+
+        if engine == 'delaunay':
+            if n_resample > 0:
+                rt, z = resample_by_arc_length(rt, z, n_resample)
+        elif n_resample > 0:
             z = resample(z, n_resample)
             rt = resample(rt, n_resample)
         else:
-            n_resample = 200
-        tol = 1e-3
+            n_resample = n_points
+
+        tasks.append((n_resample or n_points, pitch_angle_rad, rad, rt, tol, z, z_max, z_min))
+
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        return [create(*task) for task in tasks]
+    with ThreadPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return list(executor.map(lambda task: create(*task), tasks))
+
+
+def resample_by_arc_length(x: NDArray, y: NDArray, num: int) -> Tuple[NDArray, NDArray]:
+    """
+    Resample a curve to num points spaced uniformly along its length, keeping both end points.
+
+    Args:
+        x: x values of the curve
+        y: y values of the curve
+        num: number of points in the resampled curve
+
+    Returns:
+        (x, y) of the resampled curve
+    """
+    s = calculate_curve_length(x, y)
+    s_new = np.linspace(0.0, s[-1], num)
+    return np.interp(s_new, s, x), np.interp(s_new, s, y)
+
+
+def resample(x: NDArray, num: int) -> NDArray:
+    """
+    Resample a real signal to num points using the Fourier method.
 
-        mid_points.append(create_midline(n_resample, pitch_angle_rad, rad, rt, tol, z, z_max, z_min))
-    return mid_points
+    This gives the same result as scipy.signal.resample without a window, which takes seconds to import.
+
+    Args:
+        x: signal to resample
+        num: number of points in the resampled signal
+
+    Returns:
+        resampled signal
+    """
+    n_x = x.shape[-1]
+    m = min(num, n_x)
+    spectrum = np.fft.rfft(x)[..., :m // 2 + 1]
+    if m % 2 == 0 and num != n_x:
+        # account for the unpaired bin at m//2
+        spectrum[..., m // 2] *= 2.0 if num < n_x else 0.5
+    return np.fft.irfft(spectrum, n=num) * (num / n_x)
 
 
 def create_midline(Nout, pitch_angle_rad, rad, rt, tol, z, z_max, z_min):
@@ -222,6 +696,172 @@ def create_midline(Nout, pitch_angle_rad, rad, rt, tol, z, z_max, z_min):
     return midpoints_cart
 
 
+def create_midline_kdtree(Nout, pitch_angle_rad, rad, rt, tol, z, z_max, z_min):
+    """
+    Find the midline between two sections based on Voronoi's algorithm, using a k-d tree to reject duplicates.
+
+    This produces the same curve as create_midline but the duplicate test is a single spatial query rather than a
+    comparison of every vertex pair, so it scales to sections with thousands of points.
+
+    Args:
+        Nout: Number of points in the ouput array
+        pitch_angle_rad: pitch angle in radians (angle between adjacent blades)
+        rad: radius of current section
+        rt: array of points in the r-Theta plane
+        tol: tolerance used when finding duplicate points
+        z: array of points in the z plane
+        z_max: maximum z value for final mid line curve
+        z_min: minimum z value for final mid line curve
+
+    Returns:
+        midpoints_cart: array of midline points in cartesian co-ordinate system
+
+    """
+    from scipy.spatial import Voronoi, cKDTree
+
+    blade_pitch = rad * pitch_angle_rad
+    points_single = np.column_stack((rt, z)).astype(np.double)
+    # the last point of the first blade is overwritten by the first point of the shifted blade
+    points = np.concatenate((points_single[:-1], points_single + (blade_pitch, 0.0)))
+
+    vor_single = Voronoi(points_single)
+    vor = Voronoi(points)
+
+    # a vertex is a duplicate if it lies within tol (in both directions) of a single blade vertex or its shifted copy
+    single = vor_single.vertices
+    tree = cKDTree(np.concatenate((single, single + (blade_pitch, 0.0))))
+    dist, _ = tree.query(vor.vertices, k=1, p=np.inf, distance_upper_bound=tol)
+
+    vor_rt = vor.vertices[:, 0]
+    vor_z = vor.vertices[:, 1]
+    keep = (dist >= tol) & (vor_z > z_min) & (vor_z < z_max) & (vor_rt > np.min(points[:, 0]) + blade_pitch * 0.25)
+
+    order = np.argsort(vor_z[keep])
+    mid_rt = vor_rt[keep][order]
+    mid_z = vor_z[keep][order]
+
+    z_int = np.linspace(z_min, z_max, Nout)
+    t = _interp_extrapolate(z_int, mid_z, mid_rt) / rad
+
+    midpoints = np.empty([Nout, 3])
+    midpoints[:, 0] = rad
+    midpoints[:, 1] = t
+    midpoints[:, 2] = z_int
+
+    return polar_to_cartesian(midpoints, out=midpoints)
+
+
+def create_midline_delaunay(Nout, pitch_angle_rad, rad, rt, tol, z, z_max, z_min):
+    """
+    Find the midline between two sections from a single Delaunay triangulation of the blade and its shifted copy.
+
+    The Voronoi vertices are the circumcentres of the triangles. A vertex lies on the boundary between the blade and its
+    neighbour only if its triangle has corners on both blades, so the points are tagged by the blade they belong to
+    rather than rejected by comparison with the Voronoi diagram of a single blade.
+
+    Args:
+        Nout: Number of points in the ouput array
+        pitch_angle_rad: pitch angle in radians (angle between adjacent blades)
+        rad: radius of current section
+        rt: array of points in the r-Theta plane
+        tol: not used, accepted so that every engine has the same arguments
+        z: array of points in the z plane
+        z_max: maximum z value for final mid line curve
+        z_min: minimum z value for final mid line curve
+
+    Returns:
+        midpoints_cart: array of midline points in cartesian co-ordinate system
+
+    """
+    from scipy.spatial import Delaunay
+
+    blade_pitch = rad * pitch_angle_rad
+    points_single = np.column_stack((rt, z)).astype(np.double)
+    points = np.concatenate((points_single, points_single + (blade_pitch, 0.0)))
+    # 0 for the blade, 1 for its shifted copy
+    tags = np.repeat(np.array([0, 1], dtype=np.int8), len(points_single))
+
+    tri = Delaunay(points)
+    corner_tags = tags[tri.simplices]
+    mixed = tri.simplices[corner_tags.min(axis=1) != corner_tags.max(axis=1)]
+
+    centres = _circumcentres(points[mixed])
+    vor_rt = centres[:, 0]
+    vor_z = centres[:, 1]
+    keep = (vor_z > z_min) & (vor_z < z_max) & (vor_rt > np.min(rt) + blade_pitch * 0.25)
+
+    order = np.argsort(vor_z[keep])
+    mid_rt = vor_rt[keep][order]
+    mid_z = vor_z[keep][order]
+
+    z_int = np.linspace(z_min, z_max, Nout)
+    t = _interp_extrapolate(z_int, mid_z, mid_rt) / rad
+
+    midpoints = np.empty([Nout, 3])
+    midpoints[:, 0] = rad
+    midpoints[:, 1] = t
+    midpoints[:, 2] = z_int
+
+    return polar_to_cartesian(midpoints, out=midpoints)
+
+
+def _circumcentres(triangles: NDArray) -> NDArray:
+    """Find the circumcentre of each of an (N,3,2) array of triangles."""
+    a = triangles[:, 0]
+    b = triangles[:, 1] - a
+    c = triangles[:, 2] - a
+    d = 2.0 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+    b2 = np.einsum('ij,ij->i', b, b)
+    c2 = np.einsum('ij,ij->i', c, c)
+    ux = (c[:, 1] * b2 - b[:, 1] * c2) / d
+    uy = (b[:, 0] * c2 - c[:, 0] * b2) / d
+    return a + np.column_stack((ux, uy))
+
+
+def _interp_extrapolate(x: NDArray, xp: NDArray, fp: NDArray) -> NDArray:
+    """Linearly interpolate as np.interp but extrapolate linearly from the end segments, as interp1d does."""
+    out = np.interp(x, xp, fp)
+
+    below = x < xp[0]
+    out[below] = fp[0] + (x[below] - xp[0]) * (fp[1] - fp[0]) / (xp[1] - xp[0])
+
+    above = x > xp[-1]
+    out[above] = fp[-1] + (x[above] - xp[-1]) * (fp[-1] - fp[-2]) / (xp[-1] - xp[-2])
+
+    return out
+
+
+MIDLINE_ENGINES = {
+    'loop': create_midline,
+    'kdtree': create_midline_kdtree,
+    'delaunay': create_midline_delaunay,
+}
+
+
+def find_radial_extent(pts: NDArray, axis: tuple) -> Tuple[float, float]:
+    """
+    Find the minimum and maximum distance of a set of points from an axis.
+
+    Args:
+        pts: array of cartesian points, of dtype cartesian_type or with a last dimension of (x,y,z)
+        axis: two points which define the axis of rotation
+
+    Returns:
+        (rmin,rmax) , the minimum and maximum radial values respectively
+
+    """
+    xyz = as_xyz(pts).reshape(-1, 3)
+
+    origin = np.asarray(axis[0], dtype=np.double)
+    direction = np.asarray(axis[1], dtype=np.double) - origin
+    direction /= np.linalg.norm(direction)
+
+    rel = xyz - origin
+    r = np.linalg.norm(rel - np.outer(rel @ direction, direction), axis=1)
+
+    return float(np.min(r)), float(np.max(r))
+
+
 def extrude_radially(input: NDArray, delta_r: float) -> NDArray:
     """Take an array of X,Y,Z points and extrude radially inwards or outwards.
 
@@ -230,23 +870,151 @@ def extrude_radially(input: NDArray, delta_r: float) -> NDArray:
         delta_r : amount to be extruded in metres. Positive for increase in radius, negative for decrease
 
     Returns
-        output : output array at new radial location
+        output : output array at new radial location, the same shape as input, which may be a stack of sections
 
     Raises
         ValueError : if new radial position is less than zero
     """
+    polar = cartesian_to_polar(as_xyz(input))
+    polar[..., 0] += delta_r
 
-    new_r = np.hypot(input['x'], input['y']) + delta_r
-
-    if np.where(new_r < 0)[0].size > 0:
+    if np.any(polar[..., 0] < 0):
         raise ValueError('New radius has gone below zero')
 
-    t = np.arctan(input['y']/ input['x'])
+    return as_cartesian(polar_to_cartesian(polar, out=polar))
+
 
-    output = np.zeros(input.size, dtype=cartesian_type)
+def extend_sections_to_radius(sections: NDArray, r_min: float, overshoot: float = 1.1) -> NDArray:
+    """
+    Add a section below the first section of a blade surface if the surface does not reach a radius.
 
-    output['x'] = new_r * np.cos(t)
-    output['y'] = new_r * np.sin(t)
-    output['z'] = input['z']
+    The new section is the first section extruded radially inwards, past r_min by a further (overshoot - 1) times the
+    gap, so that the surface still cuts through the endwall.
+
+    Args:
+        sections: array of sections of dtype cartesian_type, N sections with M points
+        r_min: radius the surface must reach, e.g. the minimum radius of the endwalls
+        overshoot: extrusion distance as a multiple of the gap between the first section and r_min
+
+    Returns:
+        sections, with an extra section at the start if the first section lies outside r_min
+
+    """
+    r_first = np.min(np.hypot(sections[0]['x'], sections[0]['y']))
+    if r_first <= r_min:
+        return sections
 
-    return output
+    extruded = extrude_radially(sections[0], overshoot * (r_min - r_first))
+    return np.concatenate((extruded[np.newaxis], sections))
+
+
+def find_segment_intersections(start_a: NDArray, end_a: NDArray, start_b: NDArray = None,
+                               end_b: NDArray = None) -> NDArray:
+    """
+    Find the pairs of 2D line segments which cross or touch.
+
+    The segments are binned into a uniform grid, with cells about the size of an average segment, and only segments
+    which share a cell are compared, so the cost grows with the number of segments rather than its square.
+
+    Args:
+        start_a: (N,2) array of the start points of the first set of segments
+        end_a: (N,2) array of the end points of the first set of segments
+        start_b: (M,2) array of the start points of the second set of segments, set to None to compare the first set
+            with itself
+        end_b: (M,2) array of the end points of the second set of segments
+
+    Returns:
+        (K,2) array of the indices (i, j) of each pair of segments i of the first set and j of the second set which
+        intersect, sorted. When the first set is compared with itself only pairs with i < j are returned
+
+    """
+    single = start_b is None
+    if single:
+        start_b, end_b = start_a, end_a
+
+    lo_a, hi_a = np.minimum(start_a, end_a), np.maximum(start_a, end_a)
+    lo_b, hi_b = np.minimum(start_b, end_b), np.maximum(start_b, end_b)
+    if len(lo_a) == 0 or len(lo_b) == 0:
+        return np.empty((0, 2), dtype=np.intp)
+
+    origin = np.minimum(lo_a.min(axis=0), lo_b.min(axis=0))
+    extent = np.maximum(hi_a.max(axis=0), hi_b.max(axis=0)) - origin
+    # cells of the average segment size, but no more than about 4 per segment in each direction
+    sizes = np.concatenate((hi_a - lo_a, hi_b - lo_b)).max(axis=1)
+    n_segments = len(lo_a) + len(lo_b)
+    cell = max(float(np.mean(sizes)), float(extent.max()) / (4 * n_segments), np.finfo(float).tiny)
+    n_cells = np.floor(extent / cell).astype(np.intp) + 1
+
+    cells_a, index_a = _grid_cells(lo_a, hi_a, origin, cell, n_cells)
+    cells_b, index_b = _grid_cells(lo_b, hi_b, origin, cell, n_cells)
+
+    # every pair of entries of a and b in the same cell
+    order = np.argsort(cells_a, kind='stable')
+    cells_a, index_a = cells_a[order], index_a[order]
+    first = np.searchsorted(cells_a, cells_b, side='left')
+    count = np.searchsorted(cells_a, cells_b, side='right') - first
+    j = np.repeat(index_b, count)
+    offsets = np.arange(len(j)) - np.repeat(np.cumsum(count) - count, count)
+    i = index_a[np.repeat(first, count) + offsets]
+
+    keep = i < j if single else np.ones(len(i), dtype=bool)
+    # segments which share more than one cell are only compared once
+    pair_ids = np.unique(i[keep].astype(np.int64) * len(lo_b) + j[keep])
+    pairs = np.column_stack((pair_ids // len(lo_b), pair_ids % len(lo_b))).astype(np.intp)
+    if len(pairs) == 0:
+        return pairs
+
+    p1, p2 = start_a[pairs[:, 0]], end_a[pairs[:, 0]]
+    q1, q2 = start_b[pairs[:, 1]], end_b[pairs[:, 1]]
+    overlap = np.all((lo_a[pairs[:, 0]] <= hi_b[pairs[:, 1]]) & (lo_b[pairs[:, 1]] <= hi_a[pairs[:, 0]]), axis=1)
+    d1, d2 = _orientation(p1, p2, q1), _orientation(p1, p2, q2)
+    d3, d4 = _orientation(q1, q2, p1), _orientation(q1, q2, p2)
+    crosses = overlap & (d1 * d2 <= 0.0) & (d3 * d4 <= 0.0)
+    return pairs[crosses]
+
+
+def _grid_cells(lo: NDArray, hi: NDArray, origin: NDArray, cell: float, n_cells: NDArray) -> tuple:
+    """Find every grid cell covered by the bounding box of each segment, as (cell ids, segment indices)."""
+    first = np.clip(np.floor((lo - origin) / cell).astype(np.intp), 0, n_cells - 1)
+    last = np.clip(np.floor((hi - origin) / cell).astype(np.intp), 0, n_cells - 1)
+    span = last - first + 1
+    count = span[:, 0] * span[:, 1]
+
+    index = np.repeat(np.arange(len(lo)), count)
+    k = np.arange(len(index)) - np.repeat(np.cumsum(count) - count, count)
+    ix = first[index, 0] + k // span[index, 1]
+    iy = first[index, 1] + k % span[index, 1]
+    return ix * n_cells[1] + iy, index
+
+
+def _orientation(a: NDArray, b: NDArray, c: NDArray) -> NDArray:
+    """Twice the signed area of each triangle abc, positive if anticlockwise."""
+    return (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+
+
+def find_self_intersections(xy: NDArray, closed: bool = False) -> NDArray:
+    """
+    Find the pairs of segments of a 2D polyline which cross or touch, other than neighbouring segments.
+
+    Args:
+        xy: (N,2) array of points along the polyline
+        closed: join the last point to the first
+
+    Returns:
+        (K,2) array of the indices (i, j) of each pair of intersecting segments, where segment i runs from point i to
+        point i+1
+
+    """
+    if closed:
+        xy = np.concatenate((xy, xy[:1]))
+    # a repeated point, to within rounding, would make the segments either side of it touch
+    eps = 1e-12 * np.max(np.ptp(xy, axis=0)) if len(xy) else 0.0
+    keep = np.ones(len(xy), dtype=bool)
+    keep[1:] = np.any(np.abs(xy[1:] - xy[:-1]) > eps, axis=1)
+    start = np.flatnonzero(keep)
+    xy = xy[keep]
+
+    pairs = find_segment_intersections(xy[:-1], xy[1:])
+    n_segments = len(xy) - 1
+    adjacent = (pairs[:, 1] - pairs[:, 0] == 1) | (closed & (pairs[:, 0] == 0) & (pairs[:, 1] == n_segments - 1))
+    return start[pairs[~adjacent]]
@@ -0,0 +1,118 @@
+"""
+Levels of detail, which trade the accuracy of a domain for the time taken to build it.
+
+A coarse domain keeps a few of the blade sections and a few points of each, has short midlines and uses a looser
+Boolean tolerance, so that it builds in seconds and can be used to check the topology of a machine before the full
+domain is built.
+"""
+from __future__ import annotations
+import numpy as np
+from atom.api import Atom, Float, Int, Str
+from numpy.typing import NDArray
+from protoblade.blade import Blade
+from protoblade.machine import BooleanOptions
+
+
+class LevelOfDetail(Atom):
+    """
+    Settings of a level of detail.
+
+    max_sections and max_points limit the number of sections of each blade surface and of points in each section, 0
+    keeps them all. midline_points is the number of points in each midline. fuzzy is the Boolean fuzzy tolerance as a
+    fraction of the blade chord, it only ever loosens the tolerance set for the machine.
+    """
+
+    name = Str()
+    max_sections = Int(0)
+    max_points = Int(0)
+    midline_points = Int(200)
+    fuzzy = Float(0.0)
+
+
+LEVELS = {
+    'coarse': LevelOfDetail(name='coarse', max_sections=5, max_points=40, midline_points=40, fuzzy=1e-4),
+    'medium': LevelOfDetail(name='medium', max_sections=11, max_points=100, midline_points=100, fuzzy=1e-5),
+    'full': LevelOfDetail(name='full'),
+}
+
+
+def get_level(name: str) -> LevelOfDetail:
+    """
+    Find a level of detail by name.
+
+    Args:
+        name: one of the keys of LEVELS
+
+    Returns:
+        the level of detail
+
+    Raises:
+        ValueError : if the name is not recognised
+
+    """
+    if name not in LEVELS:
+        raise ValueError(f'Invalid level of detail {name}, valid options are {list(LEVELS)}')
+    return LEVELS[name]
+
+
+def subsample(n: int, n_max: int) -> NDArray:
+    """
+    Choose up to n_max evenly spaced indices of n, always keeping the first and last.
+
+    Args:
+        n: number of items
+        n_max: maximum number of indices to keep, 0 keeps every index
+
+    Returns:
+        sorted array of indices
+
+    """
+    if n_max <= 0 or n <= n_max:
+        return np.arange(n)
+    return np.unique(np.round(np.linspace(0, n - 1, max(n_max, 2))).astype(np.intp))
+
+
+def coarsen_blade(blade_def: Blade, level: LevelOfDetail) -> Blade:
+    """
+    Create a copy of a blade with fewer sections and fewer points in each section.
+
+    The points are picked from the original sections rather than interpolated, so that the leading and trailing edges
+    still meet and any clustering of the points is kept. The blade is returned unchanged if nothing is removed.
+
+    Args:
+        blade_def: blade to coarsen
+        level: level of detail
+
+    Returns:
+        the coarsened blade
+
+    """
+    ps, ss = blade_def.ps_sections, blade_def.ss_sections
+    i_sections = subsample(len(ps), level.max_sections)
+    i_ps = subsample(ps.shape[1], level.max_points)
+    i_ss = subsample(ss.shape[1], level.max_points)
+    if len(i_sections) == len(ps) and len(i_ps) == ps.shape[1] and len(i_ss) == ss.shape[1]:
+        return blade_def
+
+    return Blade(name=blade_def.name, n_blade=blade_def.n_blade, interface_location=blade_def.interface_location,
+                 ps_sections=ps[np.ix_(i_sections, i_ps)], ss_sections=ss[np.ix_(i_sections, i_ss)],
+                 decimation_tolerance=blade_def.decimation_tolerance, decimation=blade_def.decimation)
+
+
+def boolean_options(boolean: BooleanOptions, level: LevelOfDetail, chord: float) -> BooleanOptions:
+    """
+    Loosen the Boolean fuzzy tolerance for a level of detail.
+
+    Args:
+        boolean: Boolean options of the machine
+        level: level of detail
+        chord: length used to scale the fuzzy tolerance of the level, e.g. the blade chord
+
+    Returns:
+        boolean, or a copy of it with the looser tolerance
+
+    """
+    fuzzy = level.fuzzy * chord
+    if fuzzy <= boolean.fuzzy:
+        return boolean
+    return BooleanOptions(parallel=boolean.parallel, fuzzy=fuzzy, glue=boolean.glue)
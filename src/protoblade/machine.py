@@ -1,11 +1,29 @@
 """A set of functions and classes to handle represent a turbomachinery machine."""
 from __future__ import annotations
-from atom.api import Atom, Int, List, Enum, Str, Typed, Property, Float, Tuple
+from atom.api import Atom, Bool, Int, List, Enum, Str, Typed, Property, Float, Tuple
 from .stage import Stage
 
 import tomli
 
 UNITS = ['metres', 'millimetres']
+GLUE_OPTIONS = ['off', 'shift', 'full']
+
+
+class BooleanOptions(Atom):
+    """
+    Options for the OCC Boolean operations used to create each domain.
+
+    parallel runs the operations across all cores, fuzzy is a tolerance within which near coincident faces and edges
+    are treated as coincident (0 to disable) and glue speeds up operations on shapes whose faces coincide rather than
+    intersect ('shift' or 'full'). Glue gives wrong results for overlapping shapes.
+    """
+
+    parallel = Bool(True)
+    fuzzy = Float(0.0)
+    glue = Enum(*GLUE_OPTIONS)
+
+    def summary(self) -> str:
+        return f'parallel {"on" if self.parallel else "off"}, fuzzy tolerance {self.fuzzy:g}, glue {self.glue}'
 
 
 class Machine(Atom):
@@ -14,17 +32,26 @@ class Machine(Atom):
     units = Enum(*UNITS)
     axis = Tuple(Tuple(float))
     stages = List(Stage)
+    boolean = Typed(BooleanOptions, factory=BooleanOptions)
 
     @classmethod
-    def from_config_file(cls, fname: str) -> Machine:
-        """Create instance of class from a toml file."""
+    def from_config_file(cls, fname: str, cache_dir: str = None) -> Machine:
+        """Create instance of class from a toml file.
+
+        Args:
+            fname: path to the toml file
+            cache_dir: directory used to cache parsed fpd files, set to None to disable caching
+
+        """
         config = _read_toml(fname)
 
         stages_config = config.pop('stage')
+        boolean_config = config['machine'].pop('boolean', {})
         machine = cls(**config['machine'])
+        machine.boolean = BooleanOptions(**boolean_config)
         stages = []
         for stage in stages_config:
-            stages.append(Stage.from_config(stage['name'], stage['endwall'][0], stage['blade_section']))
+            stages.append(Stage.from_config(stage['name'], stage['endwall'][0], stage['blade_section'], cache_dir))
         machine.stages = stages
         return machine
 
@@ -0,0 +1,166 @@
+"""
+Functions to preview the geometry of a machine without creating any CAD.
+
+The preview holds the curves DomainCreator builds its solids from: the blade sections, extended to the hub where
+needed, the midlines of the periodic boundaries and the hub and shroud profiles. Only NumPy is used, so a preview of a
+whole machine takes a fraction of a second and can be written as a VTK polyline file, e.g. for ParaView, or an NPZ file.
+"""
+from __future__ import annotations
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from protoblade import geom
+from protoblade.cad import create_blade_midlines
+from protoblade.machine import Machine
+from protoblade.stage import Endwalls
+
+PREVIEW_FORMATS = ['.vtk', '.npz']
+
+_STEP_POINT = re.compile(r"#(\d+)\s*=\s*CARTESIAN_POINT\s*\(\s*'[^']*'\s*,\s*\(([^)]*)\)\s*\)")
+_STEP_VERTEX = re.compile(r"VERTEX_POINT\s*\(\s*'[^']*'\s*,\s*#(\d+)\s*\)")
+
+
+def create_preview(machine: Machine, engine: str = 'kdtree') -> Dict[str, List[NDArray]]:
+    """
+    Create the curves of every blade row in a machine from the same inputs DomainCreator uses.
+
+    Args:
+        machine: machine to preview
+        engine: name of the midline engine to use, see geom.MIDLINE_ENGINES
+
+    Returns:
+        list of (N,3) curves keyed by <stage name>/<blade name>/<group>, where group is one of ps_sections, ss_sections
+        or midlines, and by <stage name>/hub and <stage name>/shroud for fpd endwalls
+
+    """
+    curves = {}
+    for stage in machine.stages:
+        z_min, z_max, r_min, _ = endwall_extent(stage.endwalls, machine.axis)
+        if stage.endwalls.type == 'fpd':
+            curves[f'{stage.name}/hub'] = [_as_xyz(stage.endwalls.hub)]
+            curves[f'{stage.name}/shroud'] = [_as_xyz(stage.endwalls.shroud)]
+
+        for blade_def in stage.blades:
+            label = f'{stage.name}/{blade_def.name}'
+            for surf in ['ps_sections', 'ss_sections']:
+                sections = geom.extend_sections_to_radius(getattr(blade_def, surf), r_min)
+                curves[f'{label}/{surf}'] = [_as_xyz(section) for section in sections]
+
+            mid_points, _ = create_blade_midlines(blade_def, z_min, z_max, r_min, engine)
+            curves[f'{label}/midlines'] = [_as_xyz(pts) for pts in mid_points]
+    return curves
+
+
+def endwall_extent(endwalls: Endwalls, axis: tuple) -> Tuple[float, float, float, float]:
+    """
+    Find the axial and radial extent of a set of endwalls without any CAD.
+
+    For fpd endwalls this comes from the hub and shroud points. For STEP endwalls the vertices in the file are used,
+    which is exact for the profiles made of lines and arcs that are usual for endwalls, but can miss the extremes of
+    curved edges.
+
+    Args:
+        endwalls: endwalls of a stage
+        axis: two points which define the axis of rotation
+
+    Returns:
+        (z_min, z_max, r_min, r_max)
+
+    Raises:
+        ValueError : if a STEP file has no vertices
+
+    """
+    if endwalls.type == 'fpd':
+        pts = np.concatenate((endwalls.hub.ravel(), endwalls.shroud.ravel()))
+    else:
+        pts = read_step_vertices(endwalls.step_fname)
+    xyz = _as_xyz(pts)
+    r_min, r_max = geom.find_radial_extent(xyz, axis)
+    return float(np.min(xyz[:, 2])), float(np.max(xyz[:, 2])), r_min, r_max
+
+
+def read_step_vertices(fname: str) -> NDArray:
+    """
+    Read the position of every vertex in a STEP file.
+
+    Args:
+        fname: path to the STEP file
+
+    Returns:
+        (N,3) array of points, in the units of the file
+
+    Raises:
+        ValueError : if the file has no vertices
+
+    """
+    with open(fname, errors='replace') as f:
+        text = f.read()
+
+    points = {int(i): coords for i, coords in _STEP_POINT.findall(text)}
+    vertices = [[float(value) for value in points[int(i)].split(',')] for i in _STEP_VERTEX.findall(text)
+                if int(i) in points]
+    if not vertices:
+        raise ValueError(f'{fname} has no vertices')
+    return np.array(vertices, dtype=np.double)
+
+
+def write_preview(fname: str, curves: Dict[str, List[NDArray]]) -> None:
+    """
+    Write preview curves to a file, the format is chosen from the suffix of the file name.
+
+    A VTK file holds a single polydata with one line per curve and a 'group' cell array which indexes the sorted group
+    names, which are listed in the file header. An NPZ file holds one (n_curves, n_points, 3) array per group, or one
+    (n_points, 3) array per curve named <group>/<i> where the curves of a group differ in length.
+
+    Args:
+        fname: path to the output file, ending in .vtk or .npz
+        curves: list of (N,3) curves keyed by group, as returned by create_preview
+
+    Raises:
+        ValueError : if the suffix is not one of PREVIEW_FORMATS
+
+    """
+    if fname.endswith('.npz'):
+        _write_npz(fname, curves)
+    elif fname.endswith('.vtk'):
+        _write_vtk(fname, curves)
+    else:
+        raise ValueError(f'Invalid preview file {fname}, the suffix must be one of {PREVIEW_FORMATS}')
+
+
+def _write_npz(fname: str, curves: Dict[str, List[NDArray]]) -> None:
+    arrays = {}
+    for group, group_curves in curves.items():
+        if len({len(curve) for curve in group_curves}) == 1:
+            arrays[group] = np.stack(group_curves)
+        else:
+            arrays.update({f'{group}/{i}': curve for i, curve in enumerate(group_curves)})
+    np.savez(fname, **arrays)
+
+
+def _write_vtk(fname: str, curves: Dict[str, List[NDArray]]) -> None:
+    groups = sorted(curves)
+    lines = [curve for group in groups for curve in curves[group]]
+    group_ids = [i for i, group in enumerate(groups) for _ in curves[group]]
+    n_points = sum(len(curve) for curve in lines)
+
+    with open(fname, 'w') as f:
+        f.write('# vtk DataFile Version 3.0\n')
+        f.write(f'protoblade preview, groups: {" ".join(groups)}\n')
+        f.write('ASCII\nDATASET POLYDATA\n')
+        f.write(f'POINTS {n_points} double\n')
+        np.savetxt(f, np.concatenate(lines), fmt='%.9g')
+
+        f.write(f'LINES {len(lines)} {n_points + len(lines)}\n')
+        start = 0
+        for curve in lines:
+            f.write(' '.join(map(str, [len(curve)] + list(range(start, start + len(curve))))) + '\n')
+            start += len(curve)
+
+        f.write(f'CELL_DATA {len(lines)}\nSCALARS group int 1\nLOOKUP_TABLE default\n')
+        f.write('\n'.join(map(str, group_ids)) + '\n')
+
+
+def _as_xyz(pts: NDArray) -> NDArray:
+    return geom.as_xyz(pts).reshape(-1, 3)
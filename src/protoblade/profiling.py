@@ -0,0 +1,146 @@
+"""Classes to record the wall time, memory use and shape size of each step in creating a domain."""
+from __future__ import annotations
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable
+from atom.api import Atom, Float, Int, List as AtomList, Str, Typed
+
+PROFILE_FORMATS = ['json', 'chrome']
+
+
+class StepRecord(Atom):
+    """Measurements for a single step."""
+
+    name = Str()
+    label = Str()
+    pid = Int()
+    start = Float()
+    wall_time = Float()
+    peak_memory = Int()
+    n_faces = Int(-1)
+    n_edges = Int(-1)
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in
+                ['name', 'label', 'pid', 'start', 'wall_time', 'peak_memory', 'n_faces', 'n_edges']}
+
+
+class Profile(Atom):
+    """
+    Structured report of the steps recorded while creating one or more domains.
+
+    Wall time is in seconds, peak_memory is the peak memory allocated by Python during the step in bytes and
+    n_faces/n_edges are the size of the shape the step produced, or -1 if the step does not produce a shape.
+    """
+
+    steps = AtomList(Typed(StepRecord))
+
+    def extend(self, other: Profile) -> None:
+        """Add the steps of another profile to this one."""
+        self.steps = self.steps + other.steps
+
+    def to_dict(self) -> dict:
+        return {'steps': [step.to_dict() for step in self.steps]}
+
+    def to_chrome_trace(self) -> dict:
+        """Convert to the Chrome trace event format, which can be loaded into chrome://tracing or Perfetto."""
+        events = []
+        for step in self.steps:
+            events.append({
+                'name': step.name,
+                'ph': 'X',
+                'ts': step.start * 1e6,
+                'dur': step.wall_time * 1e6,
+                'pid': step.pid,
+                'tid': step.label,
+                'args': {'peak_memory': step.peak_memory, 'n_faces': step.n_faces, 'n_edges': step.n_edges},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, fname: str, format: str = 'json') -> None:
+        """
+        Write the profile to a file.
+
+        Args:
+            fname: output file name
+            format: 'json' for a list of steps or 'chrome' for a Chrome trace file
+
+        Raises:
+            ValueError : if the format is not recognised
+
+        """
+        if format not in PROFILE_FORMATS:
+            raise ValueError(f'Invalid profile format {format}, valid options are {PROFILE_FORMATS}')
+
+        data = self.to_dict() if format == 'json' else self.to_chrome_trace()
+        with open(fname, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    def summary(self) -> str:
+        """Create a human readable table of the recorded steps."""
+        lines = [f'{"label":<24} {"step":<20} {"time (s)":>10} {"peak (MB)":>10} {"faces":>7} {"edges":>7}']
+        for step in self.steps:
+            lines.append(f'{step.label:<24} {step.name:<20} {step.wall_time:>10.3f} '
+                         f'{step.peak_memory / 1024 ** 2:>10.1f} {step.n_faces:>7} {step.n_edges:>7}')
+        return '\n'.join(lines)
+
+
+class Profiler:
+    """Record steps into a Profile. Steps may be nested, in which case the outer step includes the inner ones."""
+
+    def __init__(self, label: str = ''):
+        """Create a profiler whose steps are all given label, e.g. the name of the blade row being built."""
+        self.label = label
+        self.profile = Profile()
+        self._peaks = []
+
+    @contextmanager
+    def step(self, name: str, shape: Callable = None):
+        """
+        Record a step.
+
+        Args:
+            name: name of the step
+            shape: function returning the shape created by the step, called when the step finishes
+
+        """
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        # the peak is reset for each step, so the enclosing step keeps the highest peak seen so far
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+        _reset_peak()
+        self._peaks.append(0)
+
+        record = StepRecord(name=name, label=self.label, pid=os.getpid(), start=time.time())
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall_time = time.perf_counter() - start
+            record.peak_memory = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], record.peak_memory)
+            if started_tracing:
+                tracemalloc.stop()
+            self.profile.steps.append(record)
+
+        if shape is not None:
+            record.n_faces, record.n_edges = count_topology(shape())
+
+
+def _reset_peak() -> None:
+    """Reset the traced memory peak, which is only possible from Python 3.9."""
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+
+def count_topology(shape) -> tuple:
+    """Return the number of faces and edges in a shape or in all shapes held by a Workplane."""
+    shapes = shape.vals() if hasattr(shape, 'vals') else [shape]
+    return sum(len(s.Faces()) for s in shapes), sum(len(s.Edges()) for s in shapes)
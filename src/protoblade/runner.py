@@ -0,0 +1,394 @@
+"""Functions and classes to build the fluid domains of a machine, optionally using a pool of processes."""
+from __future__ import annotations
+import math
+import os
+import pathlib
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from atom.api import Atom, Bool, Float, Int, List as AtomList, Str, Tuple, Typed, Value
+from protoblade.blade import Blade, DecimationReport
+from protoblade.cache import DEFAULT_MAX_BYTES, ExportManifest, FileCache
+from protoblade.cad import DEFAULT_ANGULAR_TOLERANCE, DEFAULT_TOLERANCE
+from protoblade.machine import BooleanOptions, Machine
+from protoblade.profiling import Profile, Profiler
+from protoblade.stage import Endwalls
+
+
+class DomainJob(Atom):
+    """
+    Hold everything required to build and export the domain of a single blade row.
+
+    cad_endwalls and endwall_extent are set by share_stage_endwalls when the endwalls are shared with other blade rows
+    in the same stage, endwall_profile holds the steps recorded while creating them. passages is the number of passages
+    to export, where 0 is the full annulus. preflight runs the geometry checks before any CAD is created. lod is the
+    level of detail, see lod.LEVELS. manifest is the file holding the fingerprints of earlier exports, which are used to
+    skip outputs that are unchanged, or empty to always build and export. entities are the products exported, each to
+    its own file, see export_filenames, and tolerance and angular_tolerance set the tessellation of STL and VTK files.
+    threads is the number of threads used to create the midlines, 0 for every core, which run_jobs shares out between
+    its worker processes.
+    """
+
+    stage_name = Str()
+    variant = Str()
+    blade_def = Typed(Blade)
+    endwalls = Typed(Endwalls)
+    units = Str()
+    axis = Tuple()
+    fname_out = Str()
+    cache_dir = Str()
+    cache_max_bytes = Int(DEFAULT_MAX_BYTES)
+    profile = Bool()
+    boolean = Typed(BooleanOptions, factory=BooleanOptions)
+    passages = Int(1)
+    fuse_passages = Bool()
+    preflight = Bool(True)
+    lod = Str('full')
+    manifest = Str()
+    entities = AtomList(Str(), default=['domain'])
+    tolerance = Float(DEFAULT_TOLERANCE)
+    angular_tolerance = Float(DEFAULT_ANGULAR_TOLERANCE)
+    threads = Int()
+    cad_endwalls = Value()
+    endwall_extent = Tuple()
+    endwall_profile = Typed(Profile)
+
+
+class JobResult(Atom):
+    """
+    Outcome of a single DomainJob, skipped is set if the outputs were unchanged and so not written.
+
+    fnames_out lists every file exported, where more than the domain is exported.
+    """
+
+    stage_name = Str()
+    variant = Str()
+    blade_name = Str()
+    fname_out = Str()
+    fnames_out = AtomList(Str())
+    success = Bool()
+    error = Str()
+    wall_time = Float()
+    profile = Typed(Profile)
+    decimation = AtomList(Typed(DecimationReport))
+    boolean = Str()
+    passages = Int(1)
+    skipped = Bool()
+
+
+def create_jobs(machine: Machine, output_filename, cache_dir: str = None,
+                cache_max_bytes: int = DEFAULT_MAX_BYTES, profile: bool = False, passages: int = 1,
+                fuse_passages: bool = False, preflight: bool = True, lod: str = 'full',
+                manifest: str = None, entities: List[str] = ('domain',), tolerance: float = DEFAULT_TOLERANCE,
+                angular_tolerance: float = DEFAULT_ANGULAR_TOLERANCE) -> List[DomainJob]:
+    """
+    Create a job for every blade row of every stage in a machine.
+
+    Args:
+        machine: machine to be built
+        output_filename: base output file name, each job appends -<stage name>-<blade name> to this name. Its suffix
+            sets the format of every output, see cad.write_shape
+        cache_dir: directory used to cache intermediate solids, set to None to disable caching
+        cache_max_bytes: maximum size of the solid cache
+        profile: record the time, memory and shape size of each step of each job
+        passages: number of passages of each blade row to export, set to 0 for the full annulus
+        fuse_passages: fuse the passages into a single solid
+        preflight: check the geometry of each blade row before any CAD is created
+        lod: level of detail of each domain, see lod.LEVELS
+        manifest: file holding the fingerprints of earlier exports, outputs which are unchanged are not built or
+            written again. Set to None to always build and write every output
+        entities: products of each blade row to export, any of cad.EXPORT_ENTITIES
+        tolerance: linear deflection of STL and VTK outputs, as a fraction of the size of each shape
+        angular_tolerance: angular deflection of STL and VTK outputs, in radians
+
+    Returns:
+        list of jobs in the order of machine.stages and stage.blades
+
+    """
+    if not isinstance(output_filename, str):
+        output_filename = output_filename.name
+    stem, suffix = os.path.splitext(output_filename)
+
+    jobs = []
+    for stage in machine.stages:
+        for blade_def in stage.blades:
+            jobs.append(DomainJob(
+                stage_name=stage.name,
+                blade_def=blade_def,
+                endwalls=stage.endwalls,
+                units=machine.units,
+                axis=machine.axis,
+                fname_out=f'{stem}-{stage.name}-{blade_def.name}{suffix}',
+                cache_dir=str(cache_dir) if cache_dir else '',
+                cache_max_bytes=cache_max_bytes,
+                profile=profile,
+                boolean=machine.boolean,
+                passages=passages,
+                fuse_passages=fuse_passages,
+                preflight=preflight,
+                lod=lod,
+                manifest=str(manifest) if manifest else '',
+                entities=list(entities),
+                tolerance=tolerance,
+                angular_tolerance=angular_tolerance,
+            ))
+    return jobs
+
+
+def run_job(job: DomainJob, creators: dict = None) -> JobResult:
+    """
+    Create and export the domain for a single job, recording any error rather than raising it.
+
+    Args:
+        job: job to run
+        creators: DomainCreator used by earlier jobs in this process, keyed by stage and blade name. The creator of
+            the same blade row is reused so that products whose inputs are unchanged are not rebuilt. Set to None to
+            always use a new DomainCreator
+
+    Returns:
+        result of the job
+
+    """
+    from protoblade.cad import DomainCreator
+
+    result = JobResult(stage_name=job.stage_name, variant=job.variant, blade_name=job.blade_def.name,
+                       fname_out=job.fname_out)
+    label = '/'.join(name for name in [job.variant, job.stage_name, job.blade_def.name] if name)
+    profiler = Profiler(label=label) if job.profile else None
+    start = time.perf_counter()
+    try:
+        cache = FileCache(pathlib.Path(job.cache_dir) / 'brep', job.cache_max_bytes) if job.cache_dir else None
+        creator = None if creators is None else creators.get((job.stage_name, job.blade_def.name))
+        if creator is None:
+            creator = DomainCreator(job.blade_def, job.endwalls, job.units, job.axis, cache=cache, profiler=profiler,
+                                    boolean=job.boolean, lod=job.lod)
+            if creators is not None:
+                creators[(job.stage_name, job.blade_def.name)] = creator
+        else:
+            creator.blade_def, creator.endwalls, creator.units, creator.axis = (job.blade_def, job.endwalls,
+                                                                                 job.units, job.axis)
+            creator.cache, creator.profiler, creator.boolean = cache, profiler, job.boolean
+        creator.preflight, creator.lod = job.preflight, job.lod
+        creator.tolerance, creator.angular_tolerance = job.tolerance, job.angular_tolerance
+        creator.midline_workers = job.threads
+        if job.cad_endwalls is not None:
+            creator.share_endwalls(job.cad_endwalls, job.endwall_extent or None)
+        result.passages = job.passages if job.passages > 0 else job.blade_def.n_blade
+        exports = export_filenames(job)
+        if len(exports) > 1:
+            result.fnames_out = list(exports.values())
+        if is_current(job, creator):
+            # the files on disk were built from the same inputs, so there is nothing to do
+            result.skipped = True
+        else:
+            _build(creator, job, result.passages)
+            result.skipped = not any(creator.export_all(exports, _manifest(job)).values())
+        result.success = True
+        result.boolean = job.boolean.summary()
+        result.decimation = job.blade_def.decimation + ([creator.midline_decimation] if creator.midline_decimation
+                                                        else [])
+    except Exception:
+        result.error = traceback.format_exc()
+    result.wall_time = time.perf_counter() - start
+    if profiler is not None:
+        result.profile = Profile()
+        if job.endwall_profile is not None:
+            result.profile.extend(job.endwall_profile)
+        result.profile.extend(profiler.profile)
+    return result
+
+
+def _build(creator, job: DomainJob, n_passages: int) -> None:
+    """Build every product a job exports, the blade, endwalls and periodic solid are built with the domain."""
+    if 'domain' in job.entities:
+        if n_passages == 1:
+            creator.create_domain()
+        else:
+            creator.create_passages(n_passages, job.fuse_passages)
+    for entity, build in [('blade', creator.extrude_blade), ('cad_endwalls', creator.create_endwalls),
+                          ('per', creator.create_periodic)]:
+        if entity in job.entities:
+            build()
+
+
+def export_filenames(job: DomainJob) -> Dict[str, str]:
+    """
+    Find the file each product of a job is exported to.
+
+    The domain, or the passages, are exported to job.fname_out and every other product to job.fname_out with a
+    -<entity> suffix, e.g. vki-stage_1-stator-blade.step.
+
+    Args:
+        job: job to find the files of
+
+    Returns:
+        file name keyed by the name of the DomainCreator attribute exported to it
+
+    """
+    n_passages = job.passages if job.passages > 0 else job.blade_def.n_blade
+    stem, suffix = os.path.splitext(job.fname_out)
+    exports = {}
+    for entity in job.entities:
+        if entity == 'domain':
+            exports['domain' if n_passages == 1 else 'passages'] = job.fname_out
+        else:
+            exports[entity] = f'{stem}-{entity}{suffix}'
+    return exports
+
+
+def is_current(job: DomainJob, creator=None) -> bool:
+    """
+    Check whether the outputs of a job were built from the same inputs and not touched since, without any CAD.
+
+    Args:
+        job: job to check
+        creator: DomainCreator set up for the job, set to None to create one
+
+    Returns:
+        True if the job has a manifest in which every output is current
+
+    """
+    from protoblade.cad import DomainCreator
+
+    if not job.manifest:
+        return False
+    if creator is None:
+        creator = DomainCreator(job.blade_def, job.endwalls, job.units, job.axis, boolean=job.boolean, lod=job.lod)
+        creator.tolerance, creator.angular_tolerance = job.tolerance, job.angular_tolerance
+    n_passages = job.passages if job.passages > 0 else job.blade_def.n_blade
+    manifest = _manifest(job)
+    return all(manifest.is_current(fname_out, creator.export_key(entity, fname_out, n_passages, job.fuse_passages))
+               for entity, fname_out in export_filenames(job).items())
+
+
+def _manifest(job: DomainJob) -> ExportManifest:
+    return ExportManifest(job.manifest) if job.manifest else None
+
+
+def share_stage_endwalls(jobs: List[DomainJob]) -> None:
+    """
+    Create the endwalls once for each stage with more than one blade row and share them between the jobs of the stage.
+
+    If the endwalls of a stage cannot be created they are not shared, so that each job reports the error itself.
+
+    Args:
+        jobs: jobs to update in place
+
+    """
+    from protoblade.cad import create_stage_endwalls
+
+    stages = {}
+    for job in jobs:
+        if job.cad_endwalls is None and not _is_current_unchecked(job):
+            stages.setdefault(id(job.endwalls), []).append(job)
+
+    for stage_jobs in stages.values():
+        if len(stage_jobs) < 2:
+            continue
+
+        first = stage_jobs[0]
+        profiler = Profiler(label=f'{first.stage_name}/endwalls') if first.profile else None
+        try:
+            cache = FileCache(pathlib.Path(first.cache_dir) / 'brep', first.cache_max_bytes) if first.cache_dir else None
+            cad_endwalls, extent = create_stage_endwalls(first.endwalls, first.units, first.axis, cache=cache,
+                                                         profiler=profiler)
+        except Exception:
+            continue
+
+        for job in stage_jobs:
+            job.cad_endwalls = cad_endwalls
+            job.endwall_extent = tuple(extent)
+        if profiler is not None:
+            first.endwall_profile = profiler.profile
+
+
+def _is_current_unchecked(job: DomainJob) -> bool:
+    try:
+        return is_current(job)
+    except Exception:
+        # e.g. a missing STEP file, which run_job reports
+        return False
+
+
+def run_batch(jobs: List[DomainJob]) -> List[JobResult]:
+    """Run jobs one after another, reusing the products which are unchanged between jobs of the same blade row."""
+    creators = {}
+    return [run_job(job, creators) for job in jobs]
+
+
+def _create_batches(jobs: List[DomainJob], n_workers: int) -> List[List[int]]:
+    """Split jobs into batches of the same blade row, with at least one batch for each worker where possible."""
+    rows = {}
+    for i, job in enumerate(jobs):
+        rows.setdefault((job.stage_name, job.blade_def.name), []).append(i)
+
+    batch_size = math.ceil(len(jobs) / n_workers)
+    return [row[i:i + batch_size] for row in rows.values() for i in range(0, len(row), batch_size)]
+
+
+def run_jobs(jobs: List[DomainJob], n_jobs: int = 1) -> List[JobResult]:
+    """
+    Run a list of jobs, either in this process or across a pool of processes.
+
+    The endwalls of each stage are created once in this process and shared by all the jobs of that stage. Jobs for the
+    same blade row, e.g. the variants of a sweep, are run in batches so that unchanged products are reused.
+
+    Args:
+        jobs: jobs to run
+        n_jobs: number of processes to use. Set to 1 to run in this process, or to 0 or less to use every core
+
+    Returns:
+        list of results in the same order as jobs
+
+    """
+    if n_jobs <= 0:
+        n_jobs = os.cpu_count() or 1
+
+    share_stage_endwalls(jobs)
+
+    if n_jobs == 1 or len(jobs) <= 1:
+        return run_batch(jobs)
+
+    batches = _create_batches(jobs, n_jobs)
+    n_workers = min(n_jobs, len(batches))
+    # share the cores out between the processes, rather than each one starting a thread per core
+    for job in jobs:
+        if job.threads <= 0:
+            job.threads = max(1, (os.cpu_count() or 1) // n_workers)
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(run_batch, [jobs[i] for i in batch]) for batch in batches]
+        for batch, future in zip(batches, futures):
+            try:
+                batch_results = future.result()
+            except Exception:
+                # the worker died before it could report, e.g. a crash inside OCC
+                error = traceback.format_exc()
+                batch_results = [JobResult(stage_name=jobs[i].stage_name, variant=jobs[i].variant,
+                                           blade_name=jobs[i].blade_def.name, fname_out=jobs[i].fname_out,
+                                           error=error) for i in batch]
+            for i, result in zip(batch, batch_results):
+                results[i] = result
+    return results
+
+
+def summarise(results: List[JobResult]) -> str:
+    """Create a human readable summary of a list of job results."""
+    lines = []
+    for result in results:
+        status = ('unchanged' if result.skipped else 'ok') if result.success else 'FAILED'
+        label = '/'.join(name for name in [result.variant, result.stage_name, result.blade_name] if name)
+        passages = f' ({result.passages} passages)' if result.passages > 1 else ''
+        fnames_out = ', '.join(result.fnames_out) or result.fname_out
+        lines.append(f'{label}: {status} in {result.wall_time:.1f} s -> {fnames_out}{passages}')
+        if result.boolean:
+            lines.append(f'    booleans: {result.boolean}')
+        for report in result.decimation:
+            lines.append(f'    {report.summary()}')
+        if not result.success:
+            lines.append(result.error)
+
+    n_failed = sum(not result.success for result in results)
+    lines.append(f'{len(results) - n_failed} of {len(results)} domains created successfully')
+    return '\n'.join(lines)
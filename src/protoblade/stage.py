@@ -24,15 +24,15 @@ class Endwalls(Atom):
     shroud_fname = Str()
 
     @classmethod
-    def from_config(cls,config:dict) -> Endwalls:
+    def from_config(cls,config:dict,cache_dir:str=None) -> Endwalls:
         if config['type'] not in ENDWALL_TYPES:
             raise ValueError('Invalid endwall type')
 
         endwall = Endwalls()
         endwall.type = config['type']
 
-        endwall.hub =  geom.load_curves_from_fpd(config['hub_fname']) if config['type'] == 'fpd' else None
-        endwall.shroud =  geom.load_curves_from_fpd(config['shroud_fname']) if config['type'] == 'fpd' else None
+        endwall.hub =  geom.load_curves_from_fpd(config['hub_fname'],cache_dir=cache_dir) if config['type'] == 'fpd' else None
+        endwall.shroud =  geom.load_curves_from_fpd(config['shroud_fname'],cache_dir=cache_dir) if config['type'] == 'fpd' else None
 
         endwall.step_fname = config.get('step_fname','')
 
@@ -52,9 +52,10 @@ class Stage(Atom):
             name,
             endwall_config,
             blade_config,
+            cache_dir=None,
         ):
         stage = Stage()
         stage.name = name
-        stage.endwalls = Endwalls.from_config(endwall_config)
-        stage.blades = [Blade.from_config(config) for config in blade_config]
+        stage.endwalls = Endwalls.from_config(endwall_config,cache_dir)
+        stage.blades = [Blade.from_config(config,cache_dir) for config in blade_config]
         return stage
@@ -0,0 +1,203 @@
+"""
+Functions and classes to build many variants of a machine from a single base definition.
+
+A sweep file lists the parameters to vary, each identified by <stage name>.<blade name>.<parameter>:
+
+    [sweep]
+    mode = 'grid'
+
+    [sweep.parameters]
+    "stage_1.stator.n_blade" = [50, 60, 70]
+    "stage_1.stator.section_offset" = [0.0, 0.001]
+
+In grid mode a variant is created for every combination of values, in zip mode the n-th variant takes the n-th value
+of every parameter.
+"""
+from __future__ import annotations
+import itertools
+import json
+import os
+import time
+from typing import List
+import tomli
+from atom.api import Atom, Dict, Str
+from protoblade import runner
+from protoblade.blade import Blade
+from protoblade.cache import DEFAULT_MAX_BYTES
+from protoblade.machine import Machine
+from protoblade.stage import Stage
+
+SWEEP_MODES = ['grid', 'zip']
+SWEEP_PARAMETERS = ['n_blade', 'interface_location', 'section_offset']
+
+
+class Variant(Atom):
+    """A named set of parameter overrides applied to the base machine."""
+
+    name = Str()
+    overrides = Dict()
+
+
+def load_sweep(fname: str) -> List[Variant]:
+    """
+    Read the variants of a sweep from a toml file.
+
+    Args:
+        fname: path to the toml file
+
+    Returns:
+        list of variants
+
+    Raises:
+        ValueError : if the sweep mode or a parameter is not recognised, or zip mode parameters differ in length
+
+    """
+    with open(fname, mode='rb') as fp:
+        config = tomli.load(fp)['sweep']
+
+    mode = config.get('mode', 'grid')
+    if mode not in SWEEP_MODES:
+        raise ValueError(f'Invalid sweep mode {mode}, valid options are {SWEEP_MODES}')
+
+    parameters = config['parameters']
+    for path in parameters:
+        _split_path(path)
+
+    if mode == 'grid':
+        combinations = list(itertools.product(*parameters.values()))
+    else:
+        if len({len(values) for values in parameters.values()}) > 1:
+            raise ValueError('Every parameter of a zip sweep must have the same number of values')
+        combinations = list(zip(*parameters.values()))
+
+    width = len(str(len(combinations) - 1))
+    return [Variant(name=f'v{i:0{width}d}', overrides=dict(zip(parameters, values)))
+            for i, values in enumerate(combinations)]
+
+
+def _split_path(path: str) -> tuple:
+    parts = path.split('.')
+    if len(parts) != 3 or parts[2] not in SWEEP_PARAMETERS:
+        raise ValueError(f'Invalid sweep parameter {path}, parameters must be <stage>.<blade>.<parameter> where '
+                         f'<parameter> is one of {SWEEP_PARAMETERS}')
+    return tuple(parts)
+
+
+def apply_overrides(machine: Machine, overrides: dict) -> Machine:
+    """
+    Create a copy of a machine with a set of parameter overrides applied.
+
+    The base machine is not changed. Stages, endwalls and blades which are not overridden are shared with the base
+    machine, so the sections are not copied and the endwalls of each stage can be reused by every variant.
+
+    Args:
+        machine: base machine
+        overrides: value of each overridden parameter, keyed by <stage name>.<blade name>.<parameter>
+
+    Returns:
+        machine with the overrides applied
+
+    Raises:
+        ValueError : if a stage or blade does not exist in the machine
+
+    """
+    blade_overrides = {}
+    for path, value in overrides.items():
+        stage_name, blade_name, parameter = _split_path(path)
+        blade_overrides.setdefault((stage_name, blade_name), {})[parameter] = value
+
+    stages = []
+    for stage in machine.stages:
+        blades = []
+        for blade_def in stage.blades:
+            params = blade_overrides.pop((stage.name, blade_def.name), None)
+            blades.append(blade_def if params is None else _override_blade(blade_def, params))
+        stages.append(stage if blades == stage.blades else
+                      Stage(name=stage.name, endwalls=stage.endwalls, blades=blades))
+
+    if blade_overrides:
+        raise ValueError(f'Blade rows {sorted(blade_overrides)} do not exist in the machine')
+
+    return Machine(name=machine.name, n_blade=machine.n_blade, units=machine.units, axis=machine.axis, stages=stages,
+                   boolean=machine.boolean)
+
+
+def _override_blade(blade_def: Blade, params: dict) -> Blade:
+    new = Blade(name=blade_def.name, n_blade=params.get('n_blade', blade_def.n_blade),
+                interface_location=params.get('interface_location', blade_def.interface_location),
+                ps_sections=blade_def.ps_sections, ss_sections=blade_def.ss_sections,
+                decimation_tolerance=blade_def.decimation_tolerance, decimation=blade_def.decimation)
+
+    offset = params.get('section_offset', 0.0)
+    if offset:
+        # axial offset of every section
+        for surf in ['ps_sections', 'ss_sections']:
+            sections = getattr(blade_def, surf).copy()
+            sections['z'] += offset
+            setattr(new, surf, sections)
+    return new
+
+
+def run_sweep(machine: Machine, variants: List[Variant], output_filename: str, jobs: int = 1, cache_dir: str = None,
+              cache_max_bytes: int = DEFAULT_MAX_BYTES, manifest: str = None) -> List[runner.JobResult]:
+    """
+    Create and export the fluid domain of every blade row for every variant of a machine.
+
+    The machine is only loaded once and the endwalls of each stage are created once for all the variants. The variants
+    of each blade row are run in batches so that products which do not depend on the overridden parameters, e.g. the
+    blade solid when only n_blade changes, are reused.
+
+    Args:
+        machine: base machine
+        variants: variants to create
+        output_filename: base output file name, each job appends -<variant>-<stage name>-<blade name> to this name
+            before its suffix
+        jobs: number of processes used to build the variants, set to 0 or less to use every core
+        cache_dir: directory used to cache intermediate solids, set to None to disable caching
+        cache_max_bytes: maximum size of the solid cache in bytes
+        manifest: file name to write a JSON manifest of the variants, outputs and timings to, set to None to skip
+
+    Returns:
+        list of runner.JobResult, one per blade row per variant
+
+    """
+    start = time.perf_counter()
+    stem, suffix = os.path.splitext(output_filename)
+    all_jobs = []
+    for variant in variants:
+        variant_jobs = runner.create_jobs(apply_overrides(machine, variant.overrides),
+                                          f'{stem}-{variant.name}{suffix}', cache_dir, cache_max_bytes)
+        for job in variant_jobs:
+            job.variant = variant.name
+        all_jobs.extend(variant_jobs)
+
+    results = runner.run_jobs(all_jobs, jobs)
+
+    if manifest:
+        write_manifest(manifest, machine, variants, results, time.perf_counter() - start)
+    return results
+
+
+def write_manifest(fname: str, machine: Machine, variants: List[Variant], results: List[runner.JobResult],
+                   wall_time: float) -> None:
+    """Write the overrides, output files and timings of every variant of a sweep to a JSON file."""
+    outputs = {}
+    for result in results:
+        outputs.setdefault(result.variant, []).append({
+            'stage': result.stage_name,
+            'blade': result.blade_name,
+            'fname_out': result.fname_out,
+            'success': result.success,
+            'wall_time': result.wall_time,
+            'error': result.error,
+        })
+
+    data = {
+        'machine': machine.name,
+        'wall_time': wall_time,
+        'boolean': machine.boolean.summary(),
+        'variants': [{'name': variant.name, 'overrides': variant.overrides, 'outputs': outputs.get(variant.name, [])}
+                     for variant in variants],
+    }
+    with open(fname, 'w') as f:
+        json.dump(data, f, indent=2)
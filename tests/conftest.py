@@ -71,7 +71,9 @@ def vki_cad_fixtures():
         'endwalls': vki_dir/ 'endwalls.step',
         'final': vki_dir/ 'final.step',
         'periodic': vki_dir/ 'periodic.step',
-        'final_with_cavity': vki_dir /'final_with_cavity.step'
+        'final_with_cavity': vki_dir /'final_with_cavity.step',
+        'example_final': vki_dir / 'example_final.step',
+        'example_final_with_cavity': vki_dir / 'example_final_with_cavity.step',
     }
 
 
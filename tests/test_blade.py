@@ -1,4 +1,34 @@
+import numpy as np
 from protoblade import geom,blade
+
+
+def test_sections_are_held_in_a_stack(vki_sections):
+    ps_sections, ss_sections = vki_sections
+    blade_def = blade.Blade(ps_sections=ps_sections, ss_sections=ss_sections, n_blade=60)
+
+    assert blade_def.ps_stack.xyz.shape == ps_sections.shape + (3,)
+    assert np.shares_memory(blade_def.ps_sections, blade_def.ps_stack.xyz)
+    np.testing.assert_array_equal(blade_def.ss_sections, ss_sections)
+
+    z = ps_sections['z'].copy()
+    blade_def.ps_sections['z'] += 1.0
+    np.testing.assert_array_equal(blade_def.ps_stack.xyz[..., 2], z + 1.0)
+
+
+def test_decimate(vki_sections):
+    ps_sections, ss_sections = vki_sections
+    blade_def = blade.Blade(ps_sections=ps_sections, ss_sections=ss_sections, n_blade=60)
+
+    reports = blade_def.decimate(1e-5)
+
+    assert [report.name for report in reports] == ['ps_sections', 'ss_sections']
+    assert blade_def.ps_sections.shape == (3, reports[0].n_points_decimated)
+    assert blade_def.ss_sections.shape == (3, reports[1].n_points_decimated)
+    for report in reports:
+        assert report.n_points == 199
+        assert report.max_deviation <= 1e-5
+        assert '199 ->' in report.summary()
+
 def test_create_sections_from_2D_profile(vki_files):
     ps_pnts = geom.load_curves_from_fpd(vki_files['pressure'])
     ss_pnts = geom.load_curves_from_fpd(vki_files['suction'])
@@ -11,6 +41,8 @@ def test_create_sections_from_2D_profile(vki_files):
     ps_section,ss_section = blade.create_sections_from_2D_profile(ps_pnts,ss_pnts,N_sections,(r_min,r_max),n_resample=N_resample)
 
     assert len(ps_section)==len(ss_section)==N_sections
+    assert ps_section.shape == ss_section.shape
+    assert ps_section.dtype == geom.cartesian_type
 
     #for sec_ps,sec_ss in zip(ps_section,ss_section):
     #    assert sec_ps.shape == (N_resample,)
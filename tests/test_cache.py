@@ -0,0 +1,135 @@
+"""Test functionality of protoblade's cache module."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from protoblade import cache
+
+
+def test_fingerprint():
+    a = np.linspace(0, 1, 10)
+
+    assert cache.fingerprint('blade', a, (1.0, 2.0)) == cache.fingerprint('blade', a.copy(), (1.0, 2.0))
+    assert cache.fingerprint('blade', a) != cache.fingerprint('endwalls', a)
+    assert cache.fingerprint('blade', a) != cache.fingerprint('blade', a[::-1])
+    assert cache.fingerprint('blade', a) != cache.fingerprint('blade', a.astype(np.float32))
+    assert cache.fingerprint(1) != cache.fingerprint(1.0)
+
+
+def test_hash_file(tmp_path):
+    fname = tmp_path / 'a.txt'
+    fname.write_text('hello')
+    first = cache.hash_file(fname)
+
+    fname.write_text('world')
+    assert cache.hash_file(fname) != first
+
+
+def test_file_hashes(tmp_path, mocker):
+    fname = tmp_path / 'a.txt'
+    fname.write_text('hello')
+    hashes = cache.FileHashes(tmp_path / 'hashes.json')
+    assert hashes.hash(fname) == cache.hash_file(fname)
+
+    # the hash is remembered between runs while the file is unchanged
+    hash_file = mocker.spy(cache, 'hash_file')
+    assert cache.FileHashes(tmp_path / 'hashes.json').hash(fname) == cache.hash_file(fname)
+    assert hash_file.call_count == 1
+
+    fname.write_text('hello world')
+    assert hashes.hash(fname) == cache.hash_file(fname)
+
+
+def test_export_manifest(tmp_path):
+    fname = tmp_path / 'domain.step'
+    fname.write_text('solid')
+    signature = {'volume': 1.0, 'n_faces': 6}
+    manifest = cache.ExportManifest(tmp_path / 'exports.json')
+    assert not manifest.is_current(fname, 'abc')
+
+    manifest.record(fname, 'abc', signature)
+    assert manifest.is_current(fname, 'abc')
+    assert not manifest.is_current(fname, 'def')
+    assert manifest.is_current(fname, signature=signature)
+    assert not manifest.is_current(fname, signature={'volume': 2.0, 'n_faces': 6})
+
+    # the manifest is remembered between runs, until the file is touched
+    assert cache.ExportManifest(tmp_path / 'exports.json').is_current(fname, 'abc')
+    os.utime(fname, ns=(0, 0))
+    assert not manifest.is_current(fname, 'abc')
+    fname.unlink()
+    assert not manifest.is_current(fname, 'abc')
+
+
+def _record(fname_manifest, fnames):
+    manifest = cache.ExportManifest(fname_manifest)
+    for fname in fnames:
+        manifest.record(fname, 'abc', {})
+
+
+def test_export_manifest_from_processes(tmp_path):
+    fnames = [tmp_path / f'domain_{i}.step' for i in range(200)]
+    for fname in fnames:
+        fname.write_text('solid')
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        list(executor.map(_record, [tmp_path / 'exports.json'] * 2, [fnames[::2], fnames[1::2]]))
+
+    # neither process overwrites the outputs recorded by the other
+    manifest = cache.ExportManifest(tmp_path / 'exports.json')
+    assert all(manifest.is_current(fname, 'abc') for fname in fnames)
+    assert sorted(path.name for path in tmp_path.iterdir() if not path.name.endswith('.step')) == ['exports.json']
+
+
+def test_clear_cache_dir(tmp_path):
+    store = cache.FileCache(tmp_path / 'brep')
+    store.put('abc', _write('solid'))
+    (tmp_path / 'a.txt').write_text('hello')
+    store.hashes.hash(tmp_path / 'a.txt')
+    (tmp_path / 'fpd').mkdir()
+    (tmp_path / 'fpd' / 'hub-123-456.npy').write_text('points')
+
+    assert cache.clear_cache_dir(tmp_path) == 3
+    assert store.get('abc') is None
+    assert sorted(fname.name for fname in tmp_path.rglob('*') if fname.is_file()) == ['a.txt']
+
+
+def _write(text):
+    def write(fname):
+        with open(fname, 'w') as f:
+            f.write(text)
+    return write
+
+
+def test_file_cache_get_and_put(tmp_path):
+    store = cache.FileCache(tmp_path / 'brep')
+
+    assert store.get('abc') is None
+
+    fname = store.put('abc', _write('solid'))
+    assert fname == store.get('abc')
+    assert fname.read_text() == 'solid'
+    assert list((tmp_path / 'brep').glob('*.tmp')) == []
+
+    store.clear()
+    assert store.get('abc') is None
+
+
+def test_file_cache_evicts_least_recently_used(tmp_path):
+    store = cache.FileCache(tmp_path, max_bytes=25)
+
+    for i, key in enumerate(['a', 'b']):
+        fname = store.put(key, _write('x' * 10))
+        os.utime(fname, ns=(i * 10 ** 9, i * 10 ** 9))
+
+    # using 'a' makes 'b' the least recently used entry
+    store.get('a')
+    store.put('c', _write('x' * 10))
+
+    assert store.get('b') is None
+    assert store.get('a') is not None
+    assert store.get('c') is not None
+    assert store.size() == 20
+
+    # an entry bigger than the cap is kept until the next entry is added
+    store.put('d', _write('x' * 30))
+    assert [fname.stem for fname in store.entries()] == ['d']
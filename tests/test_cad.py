@@ -1,6 +1,6 @@
 """Test functionality of protoblade's cad module."""
 import protoblade.stage
-from protoblade import geom, cad, blade,stage
+from protoblade import geom, cad, blade,stage, cache, checks, profiling
 import pathlib
 import cadquery as cq
 import pytest
@@ -33,6 +33,20 @@ def test_convert_array_to_list(naca0012_files):
             assert pt_1[i] == pt_2[i]
 
 
+def test_make_spline(vki_sections):
+    ps_sections, _ = vki_sections
+    pts = ps_sections[1]
+
+    expected = cq.Edge.makeSpline([cq.Vector(p) for p in cad._convert_array_to_list(pts)])
+    xyz = np.stack((pts['x'], pts['y'], pts['z']), axis=-1)
+    for edge in [cad._make_spline(pts), cad._make_spline(xyz)]:
+        assert edge.Length() == expected.Length()
+        assert (edge.positionAt(0.3) - expected.positionAt(0.3)).Length == 0.0
+
+    with pytest.raises(ValueError):
+        cad._make_spline(np.zeros((2, 3)))
+
+
 def test_extrude_naca0012(naca0012_files, tmp_path):
     pts = cad._convert_array_to_list(geom.load_curves_from_fpd(naca0012_files['upper']))
     p = cq.Workplane("XY").spline(pts)
@@ -55,6 +69,256 @@ def test_loft_turbine(vki_blade_def, tmp_path,vki_cad_fixtures):
     file_cmp(fname,vki_cad_fixtures['blade'])
 
 
+def test_extrude_blade_with_cache(vki_blade_def, tmp_path, mocker):
+    blade_sec, axis, endwalls = vki_blade_def
+    shape_cache = cache.FileCache(tmp_path / 'brep')
+
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis, cache=shape_cache)
+    creator.extrude_blade()
+    creator.create_endwalls()
+    assert len(shape_cache.entries()) == 2
+
+    cached_creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis, cache=shape_cache)
+    loft = mocker.spy(cached_creator, '_loft_blade')
+    build_endwalls = mocker.spy(cached_creator, '_build_endwalls')
+    cached_creator.extrude_blade()
+    cached_creator.create_endwalls()
+
+    assert loft.call_count == 0
+    assert build_endwalls.call_count == 0
+    assert abs(cached_creator.blade.Volume() - creator.blade.Volume()) < 1e-12
+    assert abs(cached_creator.cad_endwalls.val().Volume() - creator.cad_endwalls.val().Volume()) < 1e-12
+
+    # a change to the sections invalidates the blade but not the endwalls
+    blade_sec.ps_sections = blade_sec.ps_sections.copy()
+    blade_sec.ps_sections['z'] += 1e-3
+    cached_creator.extrude_blade()
+    assert loft.call_count == 1
+    assert len(shape_cache.entries()) == 3
+
+
+def test_create_domain_rebuilds_changed_products(vki_blade_def, mocker):
+    blade_sec, axis, endwalls = vki_blade_def
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis, cq=mocker.MagicMock())
+    builds = {name: mocker.spy(creator, name) for name in ['_loft_blade', '_build_endwalls', '_build_periodic']}
+    boolean = mocker.patch.object(creator, '_boolean')
+    mid_points = np.zeros(2, dtype=geom.cartesian_type)
+    mid_points['x'] = [0.0, 1.0]
+    builds['_build_midlines'] = mocker.patch.object(creator, '_build_midlines', return_value=[mid_points])
+
+    def call_counts():
+        return [builds[name].call_count for name in ['_loft_blade', '_build_endwalls', '_build_midlines',
+                                                     '_build_periodic']]
+
+    creator.create_domain()
+    assert call_counts() == [1, 1, 1, 1]
+    assert boolean.call_count == 2
+
+    creator.create_domain()
+    assert call_counts() == [1, 1, 1, 1]
+    assert boolean.call_count == 2
+
+    # only the Boolean operations depend on their options
+    creator.boolean.fuzzy = 1e-7
+    creator.create_domain()
+    assert call_counts() == [1, 1, 1, 1]
+    assert boolean.call_count == 4
+
+    # the pitch only affects the midlines and the periodic solid
+    blade_sec.n_blade = 50
+    creator.create_domain()
+    assert call_counts() == [1, 1, 2, 2]
+
+    # move the whole blade, so that it still passes the geometry checks
+    for surf in ['ps_sections', 'ss_sections']:
+        sections = getattr(blade_sec, surf).copy()
+        sections['z'] += 1e-3
+        setattr(blade_sec, surf, sections)
+    creator.create_domain()
+    assert call_counts() == [2, 1, 3, 3]
+
+
+def test_create_domain_with_lod(vki_blade_def, mocker):
+    blade_sec, axis, endwalls = vki_blade_def
+    with pytest.raises(ValueError):
+        cad.DomainCreator(blade_sec, endwalls, 'metres', axis, lod='rough')
+
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis, cq=mocker.MagicMock(), lod='coarse')
+    make_spline = mocker.patch.object(cad, '_make_spline')
+    cad_endwalls = mocker.MagicMock()
+    bounding_box = cad_endwalls.objects[0].BoundingBox.return_value
+    bounding_box.zmin, bounding_box.zmax = -0.02, 0.03
+    mocker.patch.object(creator, '_build_endwalls', return_value=cad_endwalls)
+    mocker.patch.object(creator, 'find_endwall_radial_extent', return_value=(0.2585, 0.2865))
+    boolean = mocker.patch.object(creator, '_boolean')
+
+    creator.create_domain()
+    # 3 sections of each side and 3 midlines
+    assert [len(call.args[0]) for call in make_spline.call_args_list] == [40] * 9
+    chord = np.linalg.norm(blade_sec.ps_stack.xyz[:, -1] - blade_sec.ps_stack.xyz[:, 0], axis=-1).max()
+    assert creator._boolean_options().fuzzy == pytest.approx(1e-4 * chord)
+    assert creator.boolean.fuzzy == 0.0
+
+    # only the endwalls are shared between the levels of detail
+    creator.lod = 'full'
+    creator.create_domain()
+    assert [len(call.args[0]) for call in make_spline.call_args_list[9:]] == [199] * 6 + [200] * 3
+    assert creator._build_endwalls.call_count == 1
+    assert boolean.call_count == 4
+
+
+def _volume(shape, eps:float=1e-9) -> float:
+    """Volume of a shape integrated to a relative error of eps, rather than with the fixed order of Shape.Volume."""
+    from OCP.BRepGProp import BRepGProp
+    from OCP.GProp import GProp_GProps
+
+    props = GProp_GProps()
+    BRepGProp.VolumeProperties_s(shape.wrapped, props, eps)
+    return props.Mass()
+
+
+def test_create_passages(vki_blade_def, tmp_path):
+    blade_sec, axis, endwalls = vki_blade_def
+    blade_sec.decimate(1e-5)
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis)
+
+    with pytest.raises(ValueError):
+        creator.create_passages(101)
+
+    creator.create_passages(3)
+    solids = creator.passages.solids().vals()
+    volume = creator.domain.val().Volume()
+    assert len(solids) == 3
+    assert [solid.Volume() for solid in solids] == pytest.approx([volume] * 3)
+
+    # each passage is the previous one rotated by the pitch angle
+    centres = [solid.Center() for solid in solids]
+    angles = np.unwrap([np.arctan2(centre.y, centre.x) for centre in centres])
+    np.testing.assert_allclose(np.diff(angles), blade_sec.pitch_angle_rad)
+
+    creator.export('passages', tmp_path / 'passages.step')
+    assert (tmp_path / 'passages.step').is_file()
+
+    creator.create_passages(2, fuse=True)
+    assert len(creator.passages.solids().vals()) == 1
+    # Shape.Volume integrates the twisted periodic faces to within about 0.5% only, which hides the difference
+    assert _volume(creator.passages.val()) == pytest.approx(2 * _volume(creator.domain.val()), rel=1e-4)
+
+
+def test_create_domain_checks_geometry(vki_blade_def, mocker):
+    blade_sec, axis, endwalls = vki_blade_def
+    blade_sec.n_blade = 400
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis)
+    loft = mocker.spy(creator, '_loft_blade')
+
+    with pytest.raises(checks.PreflightError) as excinfo:
+        creator.create_domain()
+    assert 'does not lie in the passage' in str(excinfo.value)
+    assert loft.call_count == 0
+
+
+def test_export_with_manifest(vki_blade_def, tmp_path, mocker):
+    blade_sec, axis, endwalls = vki_blade_def
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis)
+    creator.extrude_blade()
+    fname = tmp_path / 'blade.step'
+    manifest = cache.ExportManifest(tmp_path / 'exports.json')
+    export = mocker.spy(cq.exporters, 'export')
+
+    assert creator.export('blade', fname, manifest)
+    state = cache.file_state(fname)
+    assert manifest.is_current(fname, creator.export_key('blade', fname))
+
+    # neither the same inputs nor the same geometry are written again
+    assert not creator.export('blade', fname, manifest)
+    manifest.record(fname, 'other inputs', cad.shape_signature(creator.blade))
+    assert not creator.export('blade', fname, manifest)
+    assert export.call_count == 1
+    assert cache.file_state(fname) == state
+
+    signature = cad.shape_signature(creator.blade)
+    assert signature['n_solids'] == 1
+    assert signature['n_faces'] == len(creator.blade.Faces())
+    assert signature['volume'] == pytest.approx(creator.blade.Volume())
+
+    # a file changed by someone else is written again
+    fname.write_text('edited')
+    assert creator.export('blade', fname, manifest)
+    assert export.call_count == 2
+
+
+def test_write_shape(tmp_path, mocker):
+    box = cq.Workplane().box(1.0, 2.0, 3.0)
+    export = mocker.spy(cq.exporters, 'export')
+    for suffix in cad.EXPORT_FORMATS:
+        cad.write_shape(box, tmp_path / f'box{suffix}')
+    assert export.call_count == 1
+
+    assert cq.Shape.importBrep(str(tmp_path / 'box.brep')).Volume() == pytest.approx(6.0)
+    # binary STL, an 84 byte header and 50 bytes per triangle, two triangles per face of the box
+    assert (tmp_path / 'box.stl').stat().st_size == 84 + 50 * 12
+    with open(tmp_path / 'box.vtk', 'rb') as f:
+        assert f.readline().startswith(b'# vtk DataFile')
+
+    # a finer tessellation of a curved shape has more triangles
+    cylinder = cq.Workplane().cylinder(1.0, 1.0)
+    cad.write_shape(cylinder, tmp_path / 'coarse.stl', tolerance=1e-2)
+    cad.write_shape(cylinder, tmp_path / 'fine.stl', tolerance=1e-4)
+    assert (tmp_path / 'fine.stl').stat().st_size > (tmp_path / 'coarse.stl').stat().st_size
+
+    # VTK files hold the same triangles as STL files at the same tolerance, facing outwards
+    from vtkmodules.vtkFiltersCore import vtkMassProperties
+    from vtkmodules.vtkIOLegacy import vtkPolyDataReader
+    sphere = cq.Workplane().sphere(50.0)
+    cad.write_shape(sphere, tmp_path / 'sphere.vtk', tolerance=1e-4)
+    cad.write_shape(sphere, tmp_path / 'sphere.stl', tolerance=1e-4)
+    reader = vtkPolyDataReader()
+    reader.SetFileName(str(tmp_path / 'sphere.vtk'))
+    reader.Update()
+    n_triangles = ((tmp_path / 'sphere.stl').stat().st_size - 84) // 50
+    assert reader.GetOutput().GetNumberOfPolys() == n_triangles
+    mass_properties = vtkMassProperties()
+    mass_properties.SetInputData(reader.GetOutput())
+    assert mass_properties.GetVolume() == pytest.approx(4.0 / 3.0 * np.pi * 50.0 ** 3, rel=1e-3)
+
+
+def test_export_all(vki_blade_def, tmp_path):
+    blade_sec, axis, endwalls = vki_blade_def
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis)
+    creator.extrude_blade()
+    creator.create_endwalls()
+    exports = {'blade': tmp_path / 'blade.brep', 'cad_endwalls': tmp_path / 'endwalls.stl',
+               'per': tmp_path / 'per.step'}
+    manifest = cache.ExportManifest(tmp_path / 'exports.json')
+
+    # the periodic solid has not been built so is not exported
+    assert creator.export_all(exports, manifest) == {'blade': True, 'cad_endwalls': True, 'per': False}
+    assert cq.Shape.importBrep(str(exports['blade'])).Volume() == pytest.approx(creator.blade.Volume())
+    size = exports['cad_endwalls'].stat().st_size
+    assert creator.export_all(exports, manifest) == {'blade': False, 'cad_endwalls': False, 'per': False}
+
+    # only the tessellated file depends on the tolerance
+    creator.tolerance = 1e-4
+    assert creator.export_all(exports, manifest) == {'blade': False, 'cad_endwalls': True, 'per': False}
+    assert exports['cad_endwalls'].stat().st_size > size
+
+
+def test_profile_steps(vki_blade_def, tmp_path):
+    blade_sec, axis, endwalls = vki_blade_def
+    profiler = profiling.Profiler(label='vki')
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis, profiler=profiler)
+
+    creator.extrude_blade()
+    creator.create_endwalls()
+    creator.export('blade', pathlib.Path(tmp_path) / 'vki.step')
+
+    steps = {step.name: step for step in profiler.profile.steps}
+    assert list(steps) == ['extrude_blade', 'create_endwalls', 'export']
+    assert steps['extrude_blade'].n_faces == len(creator.blade.Faces())
+    assert steps['create_endwalls'].n_edges > 0
+    assert steps['export'].n_faces == -1
+
+
 def test_create_periodic(vki_blade_def, tmp_path,vki_cad_fixtures):
     blade_sec,axis,endwalls = vki_blade_def
     creator = cad.DomainCreator(blade_sec,endwalls,'metres',axis)
@@ -125,6 +389,22 @@ def test_create_endwalls_from_step(vki_blade_def_step, tmp_path,vki_cad_fixtures
     filecmp.cmp(fname_out_endwalls,vki_cad_fixtures['endwalls'])
 
 
+def test_import_step_with_cache(vki_endwalls_step, tmp_path, mocker):
+    shape_cache = cache.FileCache(tmp_path / 'brep')
+
+    imported = cad.import_step(str(vki_endwalls_step), shape_cache)
+    assert len(shape_cache.entries()) == 1
+
+    # later imports load the BREP without reading the STEP file at all
+    import_step = mocker.spy(cq.importers, 'importStep')
+    hash_file = mocker.spy(cache, 'hash_file')
+    loaded = cad.import_step(str(vki_endwalls_step), cache.FileCache(tmp_path / 'brep'))
+
+    import_step.assert_not_called()
+    hash_file.assert_not_called()
+    assert loaded.val().Volume() == pytest.approx(imported.val().Volume())
+
+
 def test_find_radial_extent_of_axisymmetric_object(vki_blade_def):
     blade_sec, axis, endwalls = vki_blade_def
     creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis)
@@ -135,3 +415,50 @@ def test_find_radial_extent_of_axisymmetric_object(vki_blade_def):
 
     assert abs(rmin - 0.2584999)< 1e-6
     assert abs(rmax - 0.2865001) <1e-6
+
+    rmin, rmax = creator.find_endwall_radial_extent()
+    assert abs(rmin - 0.2585) < 1e-9
+    assert abs(rmax - 0.2865) < 1e-9
+
+
+def test_find_endwall_radial_extent_from_step(vki_blade_def_step):
+    blade_sec, axis, endwalls = vki_blade_def_step
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis)
+    creator.create_endwalls()
+
+    rmin, rmax = creator.find_endwall_radial_extent()
+    rmin_slice, rmax_slice = cad.find_radial_extent_of_axisymmetric_object(creator.cad_endwalls)
+
+    assert abs(rmin - rmin_slice) < 1e-6
+    assert abs(rmax - rmax_slice) < 1e-6
+
+
+def test_share_stage_endwalls(vki_blade_def, mocker):
+    blade_sec, axis, endwalls = vki_blade_def
+    cad_endwalls, extent = cad.create_stage_endwalls(endwalls, 'metres', axis)
+
+    assert abs(extent[0] - 0.2585) < 1e-9
+    assert abs(extent[1] - 0.2865) < 1e-9
+
+    creator = cad.DomainCreator(blade_sec, endwalls, 'metres', axis, cq=mocker.MagicMock())
+    creator.share_endwalls(cad_endwalls, extent)
+    build_endwalls = mocker.spy(creator, '_build_endwalls')
+    mocker.patch.object(creator, 'extrude_blade')
+    mocker.patch.object(creator, 'create_periodic')
+    mocker.patch.object(creator, '_boolean')
+
+    creator.create_domain()
+
+    build_endwalls.assert_not_called()
+    assert creator.cad_endwalls is cad_endwalls
+    assert creator.find_endwall_radial_extent() == extent
+
+
+def test_radial_extent_of_large_object():
+    annulus = cq.Workplane("XY").circle(6.0).circle(4.0).extrude(1.0)
+    axis = ((0.0, 0.0, 0.0), (0.0, 0.0, 1.0))
+
+    for rmin, rmax in [cad.sample_radial_extent(annulus, axis),
+                       cad.find_radial_extent_of_axisymmetric_object(annulus)]:
+        assert abs(rmin - 4.0) < 1e-6
+        assert abs(rmax - 6.0) < 1e-6
@@ -0,0 +1,138 @@
+"""Test functionality of protoblade's checks module."""
+import os
+import subprocess
+import sys
+from distutils.dir_util import copy_tree
+import pytest
+from protoblade import blade, checks, runner, stage
+from protoblade.__main__ import main
+from protoblade.machine import Machine
+
+AXIS = ((0.0, 0.0, 0.0), (0.0, 0.0, 1.0))
+
+
+@pytest.fixture()
+def vki_blade(vki_sections, vki_endwalls):
+    ps_sections, ss_sections = vki_sections
+    hub, shroud = vki_endwalls
+    endwalls = stage.Endwalls(hub=hub, shroud=shroud, type='fpd')
+    return blade.Blade(name='stator', ps_sections=ps_sections.copy(), ss_sections=ss_sections.copy(),
+                       n_blade=100), endwalls
+
+
+def test_validate_example(example_directory, tmp_path):
+    copy_tree(str(example_directory / 'axial_turbine_with_cavity'), str(tmp_path))
+    os.chdir(tmp_path)
+
+    assert checks.validate_config_file('axial_turbine_with_cavity.toml') == []
+
+
+def test_validate_missing_and_invalid_files(example_directory, tmp_path):
+    copy_tree(str(example_directory / 'axial_turbine_with_cavity'), str(tmp_path))
+    os.chdir(tmp_path)
+    os.remove('vki_ps.fpd')
+    with open('with_cavity.step', 'w') as f:
+        f.write('not a step file')
+
+    problems = checks.validate_config_file('axial_turbine_with_cavity.toml')
+
+    assert len(problems) == 2
+    assert 'with_cavity.step is not a STEP file' in problems[0]
+    assert 'vki_ps.fpd does not exist' in problems[1]
+
+
+def test_validate_inconsistent_sections(example_directory, tmp_path):
+    copy_tree(str(example_directory / 'axial_turbine'), str(tmp_path))
+    os.chdir(tmp_path)
+    with open('vki_ss.fpd') as f:
+        lines = f.readlines()
+    n_pts, n_curve = map(int, lines[0].split())
+    with open('vki_ss.fpd', 'w') as f:
+        f.write(f'{n_pts} {n_curve - 1}\n')
+        f.writelines(lines[1:1 + n_pts * (n_curve - 1)])
+
+    problems = checks.validate_config_file('axial_turbine.toml')
+
+    assert problems == [f'stage_1/stator: pressure side has {n_curve} sections but suction side has {n_curve - 1}']
+
+
+def test_check_blade_geometry(vki_blade):
+    blade_def, endwalls = vki_blade
+    assert checks.check_blade_geometry('stator', blade_def, endwalls, AXIS) == []
+
+    # the suction side of the middle section stops short of the trailing edge
+    ss_sections = blade_def.ss_sections.copy()
+    ss_sections[1, -1]['z'] -= 1e-3
+    blade_def.ss_sections = ss_sections
+    problems = checks.check_blade_geometry('stator', blade_def, endwalls, AXIS)
+    assert len(problems) == 1
+    assert problems[0].startswith('stator: section 1 pressure and suction sides do not meet, their last points are')
+
+
+def test_check_self_intersection(vki_blade):
+    blade_def, endwalls = vki_blade
+    ps_sections = blade_def.ps_sections.copy()
+    # swap two points so that the pressure side doubles back on itself
+    ps_sections[2, [50, 60]] = ps_sections[2, [60, 50]]
+    blade_def.ps_sections = ps_sections
+
+    problems = checks.check_blade_geometry('stator', blade_def, endwalls, AXIS)
+    assert problems
+    assert all(problem.startswith('stator: section 2 crosses itself near (') for problem in problems)
+
+
+def test_check_radial_coverage(vki_blade):
+    blade_def, endwalls = vki_blade
+    shroud = endwalls.shroud.copy()
+    shroud['x'] = 0.3
+    endwalls.shroud = shroud
+
+    problems = checks.check_blade_geometry('stator', blade_def, endwalls, AXIS)
+    assert len(problems) == 2
+    assert problems[0].startswith('stator: the pressure side does not reach the shroud, it falls short by 0.01 at z')
+    assert problems[1].startswith('stator: the suction side does not reach the shroud, it falls short by 0.01 at z')
+
+
+def test_check_midline_in_passage(vki_blade):
+    blade_def, endwalls = vki_blade
+    # the blades overlap their neighbours, so there is no passage between them
+    blade_def.n_blade = 400
+
+    problems = checks.check_blade_geometry('stator', blade_def, endwalls, AXIS)
+    assert problems
+    assert all('so the periodic boundary does not lie in the passage' in problem for problem in problems)
+
+
+def test_check_machine_geometry(example_directory, tmp_path):
+    copy_tree(str(example_directory / 'axial_turbine'), str(tmp_path))
+    os.chdir(tmp_path)
+    machine = Machine.from_config_file('axial_turbine.toml')
+    assert checks.check_machine_geometry(machine) == []
+
+
+def test_main_runs_checks_before_cad(example_directory, tmp_path, mocker):
+    copy_tree(str(example_directory / 'axial_turbine'), str(tmp_path))
+    os.chdir(tmp_path)
+    with open('axial_turbine.toml') as f:
+        config = f.read()
+    with open('axial_turbine.toml', 'w') as f:
+        f.write(config.replace('n_blade = 60', 'n_blade = 400'))
+    run_jobs = mocker.patch.object(runner, 'run_jobs', return_value=[])
+
+    with pytest.raises(checks.PreflightError) as excinfo:
+        main('axial_turbine.toml')
+    assert 'stage_1/stator: the midline of section 0 crosses the' in str(excinfo.value)
+    assert run_jobs.call_count == 0
+
+    main('axial_turbine.toml', preflight=False)
+    assert run_jobs.call_count == 1
+    assert not any(job.preflight for job in run_jobs.call_args[0][0])
+
+
+def test_validate_does_not_import_cadquery(example_directory, tmp_path):
+    copy_tree(str(example_directory / 'axial_turbine'), str(tmp_path))
+    code = ("import sys; from protoblade.__main__ import validate; import protoblade.cad; "
+            "assert validate('axial_turbine.toml'); assert 'cadquery' not in sys.modules")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+    subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env, check=True)
@@ -1,27 +1,69 @@
 """Test examples that are stored in protoblade repo."""
 import pathlib
 import os
+import subprocess
+import sys
 from protoblade.__main__ import main
-import filecmp
+from protoblade.cad import _exact_bounding_box
+import cadquery as cq
+import numpy as np
+import pytest
 from distutils.dir_util import copy_tree
 
 
+def assert_same_geometry(fname, fname_ref):
+    """
+    Check that two STEP files hold the same geometry.
+
+    The files themselves differ with the time and the version of OCC they were written with, so the shapes are compared
+    by their face count, bounding box, area and volume, integrated to a set precision.
+    """
+    from OCP.BRepGProp import BRepGProp
+    from OCP.GProp import GProp_GProps
+
+    shapes = [cq.importers.importStep(str(f)).val() for f in [fname, fname_ref]]
+    volumes, areas = [], []
+    for shape in shapes:
+        props = GProp_GProps()
+        BRepGProp.VolumeProperties_s(shape.wrapped, props, 1e-9)
+        volumes.append(props.Mass())
+        props = GProp_GProps()
+        BRepGProp.SurfaceProperties_s(shape.wrapped, props, 1e-9)
+        areas.append(props.Mass())
+
+    assert len(shapes[0].Faces()) == len(shapes[1].Faces())
+    np.testing.assert_allclose(_exact_bounding_box(shapes[0]), _exact_bounding_box(shapes[1]), rtol=0, atol=1e-7)
+    assert areas[0] == pytest.approx(areas[1], rel=1e-6)
+    assert volumes[0] == pytest.approx(volumes[1], rel=1e-6)
+
+
 def test_example_axial_turbine(example_directory,tmp_path,vki_cad_fixtures):
 
     copy_tree(example_directory /'axial_turbine', str(tmp_path))
     os.chdir(tmp_path)
     fname_final = pathlib.Path(tmp_path) / 'final.step'
 
-    main('axial_turbine.toml',fname_final)
+    results = main('axial_turbine.toml',fname_final)
+    assert all(result.success for result in results)
     fname_2 = pathlib.Path(tmp_path) / 'final-stage_1-stator.step'
-    filecmp.cmp(fname_2,vki_cad_fixtures['final'],shallow=False)
+    assert_same_geometry(fname_2, vki_cad_fixtures['example_final'])
+
+def test_example_axial_turbine_full_lod(example_directory, tmp_path, vki_cad_fixtures):
+    # the full level of detail builds the same domain as before levels of detail were added
+    copy_tree(example_directory / 'axial_turbine', str(tmp_path))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+    subprocess.run([sys.executable, '-m', 'protoblade', 'axial_turbine.toml', '--lod', 'full'], cwd=tmp_path, env=env,
+                   check=True)
+    assert_same_geometry(tmp_path / 'axial_turbine-stage_1-stator.step', vki_cad_fixtures['example_final'])
 
 def test_example_axial_turbine_with_cavity(example_directory,tmp_path,vki_cad_fixtures):
     copy_tree(example_directory / 'axial_turbine_with_cavity', str(tmp_path))
     os.chdir(tmp_path)
     fname_final = pathlib.Path(tmp_path) / 'final_with_cavity.step'
 
-    main('axial_turbine_with_cavity.toml', fname_final)
+    results = main('axial_turbine_with_cavity.toml', fname_final)
+    assert all(result.success for result in results)
     fname_2 = pathlib.Path(tmp_path) / 'final_with_cavity-stage_1-stator.step'
 
-    filecmp.cmp(fname_2, vki_cad_fixtures['final_with_cavity'],shallow=False)
\ No newline at end of file
+    assert_same_geometry(fname_2, vki_cad_fixtures['example_final_with_cavity'])
\ No newline at end of file
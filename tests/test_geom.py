@@ -1,5 +1,6 @@
 """Set of tests for geom module."""
 import math
+import pathlib
 
 import pytest
 
@@ -15,6 +16,61 @@ def test_read_from_fpd(naca0012_files):
             assert len(pnts[item]) == 66
 
 
+def test_read_from_fpd_multiple_curves(vki_sections):
+    ps_sections = geom.load_curves_from_fpd(pathlib.Path(__file__).parents[1] / 'examples' / 'axial_turbine' / 'vki_ps.fpd')
+
+    assert ps_sections.dtype == geom.cartesian_type
+    np.testing.assert_array_equal(ps_sections, vki_sections[0])
+
+
+def test_read_from_fpd_cache(naca0012_files, tmp_path):
+    fname = tmp_path / 'upper.fpd'
+    fname.write_bytes(naca0012_files['upper'].read_bytes())
+    cache_dir = tmp_path / 'cache'
+
+    first = geom.load_curves_from_fpd(fname, cache_dir=cache_dir)
+    cached_files = list((cache_dir / 'fpd').glob('*.npy'))
+    assert len(cached_files) == 1
+
+    second = geom.load_curves_from_fpd(fname, cache_dir=cache_dir)
+    assert isinstance(second, np.memmap)
+    np.testing.assert_array_equal(first, second)
+
+    # changing the file invalidates the cache and replaces the stale entry
+    with open(fname, 'w') as f:
+        f.write('2 1\n0.0 0.0 0.0\n1.0 1.0 1.0\n')
+
+    third = geom.load_curves_from_fpd(fname, cache_dir=cache_dir)
+    assert third.shape == (2,)
+    assert list((cache_dir / 'fpd').glob('*.npy')) != cached_files
+    assert len(list((cache_dir / 'fpd').glob('*.npy'))) == 1
+
+
+def test_read_from_fpd_cache_with_mapped_entry(naca0012_files, tmp_path, mocker):
+    fname = tmp_path / 'upper.fpd'
+    fname.write_bytes(naca0012_files['upper'].read_bytes())
+    cache_dir = tmp_path / 'cache'
+    geom.load_curves_from_fpd(fname, cache_dir=cache_dir)
+    mapped = geom.load_curves_from_fpd(fname, cache_dir=cache_dir)
+
+    # Windows does not remove a file which is still memory-mapped
+    with open(fname, 'w') as f:
+        f.write('2 1\n0.0 0.0 0.0\n1.0 1.0 1.0\n')
+    mocker.patch('pathlib.Path.unlink', side_effect=PermissionError('in use'))
+
+    assert geom.load_curves_from_fpd(fname, cache_dir=cache_dir).shape == (2,)
+    assert geom.load_curves_from_fpd(fname, cache_dir=cache_dir).shape == (2,)
+    assert len(list((cache_dir / 'fpd').glob('*.npy'))) == 2
+
+    # the stale entry is removed by a later load, once it is no longer mapped
+    del mapped
+    mocker.stopall()
+    with open(fname, 'w') as f:
+        f.write('3 1\n0.0 0.0 0.0\n1.0 1.0 1.0\n2.0 2.0 2.0\n')
+    assert geom.load_curves_from_fpd(fname, cache_dir=cache_dir).shape == (3,)
+    assert len(list((cache_dir / 'fpd').glob('*.npy'))) == 1
+
+
 def test_reinterpolate_curve(naca0012_files,naca0012_interp):
     naca = geom.load_curves_from_fpd(naca0012_files['upper'])
     s = geom.calculate_curve_length(naca['x'], naca['y'])
@@ -43,6 +99,24 @@ def test_convert_to_polar():
     np.testing.assert_array_equal(polar['z'], np.array([1.0, 2.0, 3.0]))
 
 
+def test_polar_kernels():
+    # points in every quadrant and on both axes
+    theta = np.linspace(-np.pi, np.pi, 9)[1:]
+    rtz = np.stack((np.full(8, 2.0), theta, np.arange(8.0)), axis=-1)
+
+    xyz = geom.polar_to_cartesian(rtz)
+    np.testing.assert_allclose(xyz[:, 0], 2.0 * np.cos(theta), atol=1e-15)
+    np.testing.assert_allclose(geom.cartesian_to_polar(xyz), rtz, atol=1e-15)
+
+    # in place on a stack of sections
+    stack = np.stack((xyz, xyz))
+    geom.cartesian_to_polar(stack, out=stack)
+    np.testing.assert_allclose(stack, np.stack((rtz, rtz)), atol=1e-15)
+
+    polar = geom.convert_to_polar(geom.as_cartesian(xyz))
+    np.testing.assert_allclose(polar['theta'], theta, atol=1e-15)
+
+
 def test_calculate_curve_length():
     N = 20
     x = np.linspace(0, 1, N)
@@ -56,6 +130,46 @@ def test_calculate_curve_length():
                                                         1.19091668, 1.26534898, 1.33978127, 1.41421356]))
 
 
+def test_calculate_curve_lengths():
+    x = np.stack((np.linspace(0, 1, 20), np.linspace(0, 2, 20)))
+    y = np.stack((np.linspace(1, 2, 20), np.zeros(20)))
+
+    s = geom.calculate_curve_lengths(x, y)
+
+    assert s.shape == (2, 20)
+    np.testing.assert_array_equal(s[0], geom.calculate_curve_length(x[0], y[0]))
+    np.testing.assert_array_almost_equal(s[1], np.linspace(0, 2, 20))
+
+
+def test_reinterpolate_curves(vki_sections):
+    ps_sections, ss_sections = vki_sections
+    x = np.concatenate((ps_sections['z'], ss_sections['z']))
+    y = np.concatenate((ps_sections['y'], ss_sections['y']))
+    s = geom.calculate_curve_lengths(x, y)
+
+    x_new, y_new, s_new = geom.reinterpolate_curves(x, y, s, base=1.5, N_new=50)
+
+    assert x_new.shape == y_new.shape == s_new.shape == (6, 99)
+    for i in range(x.shape[0]):
+        x_single, y_single, s_single = geom.reinterpolate_curve(x[i], y[i], s[i], base=1.5, N_new=50)
+        np.testing.assert_array_equal(x_new[i], x_single)
+        np.testing.assert_array_equal(y_new[i], y_single)
+        np.testing.assert_array_equal(s_new[i], s_single)
+
+        np.testing.assert_allclose(x_new[i], np.interp(s_new[i], s[i], x[i]), rtol=0, atol=1e-15)
+
+
+def test_power_law_distribution():
+    dist = geom.power_law_distribution(10, 1.5)
+
+    assert dist.shape == (19,)
+    assert dist[0] == 0.0 and dist[-1] == 1.0
+    assert np.all(np.diff(dist) > 0)
+    np.testing.assert_allclose(dist, 1.0 - dist[::-1], atol=1e-15)
+    assert geom.power_law_distribution(10, 1.5) is dist
+    assert not dist.flags.writeable
+
+
 def test_make_mid_point_curve(vki_sections):
 
     ps_sections, ss_sections = vki_sections
@@ -97,6 +211,133 @@ def test_make_mid_points(vki_sections,vki_mid_lines):
     mid_lines = geom.create_midlines(ps_sections, ss_sections, z_min - delta_z * 0.1, z_max + delta_z * 0.1,pitch_angle_rad)
     assert mid_lines[0].shape[0] != 0
 
+def test_make_mid_points_across_negative_x_axis(vki_sections):
+    ps_sections, ss_sections = vki_sections
+    z_min, z_max = np.min(ps_sections['z']), np.max(ps_sections['z'])
+    pitch_angle_rad = 2.0 * np.pi / 100
+
+    # rotate the blade so that it straddles the negative X axis, where theta jumps from pi to -pi
+    rotation = np.pi - np.mean(geom.convert_to_polar(ps_sections)['theta'])
+    rotated = []
+    for sections in [ps_sections, ss_sections]:
+        polar = geom.convert_to_polar(sections)
+        polar['theta'] += rotation
+        rotated.append(geom.as_cartesian(geom.polar_to_cartesian(geom.as_xyz(polar))))
+
+    for engine in geom.MIDLINE_ENGINES:
+        mid_lines = geom.create_midlines(ps_sections, ss_sections, z_min, z_max, pitch_angle_rad, engine=engine)
+        rotated_mid_lines = geom.create_midlines(*rotated, z_min, z_max, pitch_angle_rad, engine=engine)
+
+        for mid_line, rotated_mid_line in zip(mid_lines, rotated_mid_lines):
+            # the rotated midline is the original one turned by the same angle
+            theta = np.arctan2(mid_line[:, 1], mid_line[:, 0])
+            rotated_theta = np.arctan2(rotated_mid_line[:, 1], rotated_mid_line[:, 0])
+            np.testing.assert_allclose(np.angle(np.exp(1j * (rotated_theta - theta - rotation))), 0.0, atol=1e-9)
+            np.testing.assert_allclose(np.hypot(rotated_mid_line[:, 0], rotated_mid_line[:, 1]),
+                                       np.hypot(mid_line[:, 0], mid_line[:, 1]))
+            np.testing.assert_allclose(rotated_mid_line[:, 2], mid_line[:, 2])
+
+
+def test_make_mid_points_kdtree(vki_sections):
+    ps_sections, ss_sections = vki_sections
+
+    z_min = np.min(ps_sections[0]['z'])
+    z_max = np.max(ps_sections[0]['z'])
+
+    delta_z = z_max - z_min
+    n_blade = 100
+    pitch_angle_rad = 2.0 * np.pi / n_blade
+
+    for n_resample in [0, 200]:
+        args = (ps_sections, ss_sections, z_min - delta_z * 0.1, z_max + delta_z * 0.1, pitch_angle_rad, n_resample)
+        np.testing.assert_allclose(geom.create_midlines(*args, engine='kdtree'), geom.create_midlines(*args),
+                                   rtol=0, atol=1e-12)
+
+    with pytest.raises(ValueError) as excinfo:
+        geom.create_midlines(*args, engine='unknown')
+    assert 'Invalid midline engine' in str(excinfo.value)
+
+def test_make_mid_points_delaunay(vki_sections):
+    ps_sections, ss_sections = vki_sections
+
+    z_min = np.min(ps_sections[0]['z'])
+    z_max = np.max(ps_sections[0]['z'])
+    delta_z = z_max - z_min
+    pitch_angle_rad = 2.0 * np.pi / 100
+    z_min, z_max = z_min - delta_z * 0.1, z_max + delta_z * 0.1
+
+    # on the same section the single triangulation finds the same midline as the two Voronoi diagrams
+    section_polar = geom.convert_to_polar(np.concatenate((ps_sections[0], ss_sections[0][::-1])))
+    rad = np.mean(section_polar['r'])
+    args = (200, pitch_angle_rad, rad, section_polar['r'] * section_polar['theta'], 1e-3, section_polar['z'], z_max,
+            z_min)
+    np.testing.assert_allclose(geom.create_midline_delaunay(*args), geom.create_midline_kdtree(*args), rtol=0,
+                               atol=1e-6)
+
+    for n_resample in [0, 150]:
+        args = (ps_sections, ss_sections, z_min, z_max, pitch_angle_rad, n_resample)
+        mid_lines = geom.create_midlines(*args, engine='delaunay', workers=1)
+        assert [mid_line.shape for mid_line in mid_lines] == [(n_resample or 200, 3)] * len(ps_sections)
+        np.testing.assert_allclose(mid_lines, geom.create_midlines(*args, engine='kdtree'), rtol=0, atol=1e-4)
+        np.testing.assert_array_equal(geom.create_midlines(*args, engine='delaunay', workers=3), mid_lines)
+
+
+def test_resample_by_arc_length():
+    # two sides of a unit square
+    x, y = geom.resample_by_arc_length(np.array([0.0, 1.0, 1.0]), np.array([0.0, 0.0, 1.0]), 5)
+    np.testing.assert_allclose(x, [0.0, 0.5, 1.0, 1.0, 1.0])
+    np.testing.assert_allclose(y, [0.0, 0.0, 0.0, 0.5, 1.0])
+
+
+def test_find_segment_intersections():
+    start = np.array([[0.0, 0.0], [0.0, 1.0], [2.0, 0.0], [0.0, 2.0]])
+    end = np.array([[1.0, 1.0], [1.0, 0.0], [3.0, 0.0], [1.0, 3.0]])
+    # 0 and 1 cross, 2 and 3 are apart from every other segment
+    np.testing.assert_array_equal(geom.find_segment_intersections(start, end), [[0, 1]])
+
+    # segments which only touch at an end count as intersecting
+    other_start = np.array([[1.0, 1.0], [5.0, 5.0]])
+    other_end = np.array([[2.0, 2.0], [6.0, 6.0]])
+    np.testing.assert_array_equal(geom.find_segment_intersections(start, end, other_start, other_end), [[0, 0]])
+
+    # a grid of crossing lines
+    t = np.linspace(0.0, 1.0, 11)
+    lines_start = np.column_stack((t, np.zeros(11)))
+    lines_end = np.column_stack((t, np.ones(11)))
+    pairs = geom.find_segment_intersections(lines_start, lines_end, lines_start[:, ::-1], lines_end[:, ::-1])
+    assert len(pairs) == 121
+
+
+def test_find_self_intersections():
+    t = np.linspace(0.0, 2.0 * np.pi, 200, endpoint=False)
+    circle = np.column_stack((np.cos(t), np.sin(t)))
+    assert len(geom.find_self_intersections(circle, closed=True)) == 0
+    # repeated points do not make the segments either side of them touch
+    assert len(geom.find_self_intersections(np.repeat(circle, 2, axis=0), closed=True)) == 0
+    # also when they differ by rounding, e.g. where the two sides of a blade meet at a sharp trailing edge
+    nearly_repeated = np.insert(circle, 101, circle[100] + [0.0, 1e-17], axis=0)
+    assert len(geom.find_self_intersections(nearly_repeated, closed=True)) == 0
+
+    figure_of_eight = np.column_stack((np.sin(t + 0.01), np.sin(2.0 * (t + 0.01))))
+    np.testing.assert_array_equal(geom.find_self_intersections(figure_of_eight, closed=True), [[99, 199]])
+    assert len(geom.find_self_intersections(figure_of_eight[:150])) == 0
+
+
+def test_find_radial_extent(vki_endwalls):
+    hub, shroud = vki_endwalls
+    axis = ((0.0, 0.0, 0.0), (0.0, 0.0, 1.0))
+
+    r_min, r_max = geom.find_radial_extent(np.concatenate((hub, shroud)), axis)
+    assert r_min == pytest.approx(0.2585)
+    assert r_max == pytest.approx(0.2865)
+
+    # same points about an offset axis along x
+    xyz = np.array([[1.0, 2.0, 0.0], [5.0, 1.0, 3.0]])
+    r_min, r_max = geom.find_radial_extent(xyz, ((0.0, 1.0, 3.0), (2.0, 1.0, 3.0)))
+    assert r_min == pytest.approx(0.0)
+    assert r_max == pytest.approx(np.sqrt(10.0))
+
+
 def test_extrude_radially(vki_sections):
     ps_section = vki_sections[0]
 
@@ -112,3 +353,81 @@ def test_extrude_radially(vki_sections):
     with pytest.raises(ValueError) as excinfo:
         geom.extrude_radially(ps_section[0], -100)
     assert 'New radius has gone below zero' in str(excinfo.value)
+
+    # a whole stack of sections on the far side of the Y axis
+    rotated = ps_section.copy()
+    rotated['x'], rotated['y'] = -ps_section['x'], -ps_section['y']
+    extruded = geom.extrude_radially(rotated, 0.05)
+    assert extruded.shape == rotated.shape
+    np.testing.assert_allclose(extruded['x'], -geom.extrude_radially(ps_section, 0.05)['x'])
+
+
+def test_section_stack(vki_sections):
+    ps_sections = vki_sections[0]
+
+    xyz = geom.as_xyz(ps_sections)
+    assert xyz.shape == ps_sections.shape + (3,)
+    assert np.shares_memory(xyz, ps_sections)
+    np.testing.assert_array_equal(xyz[..., 1], ps_sections['y'])
+    assert np.shares_memory(geom.as_cartesian(xyz), xyz)
+
+    stack = geom.SectionStack.from_sections(list(ps_sections))
+    assert (stack.n_sections, stack.n_points) == ps_sections.shape
+    np.testing.assert_array_equal(stack.records, ps_sections)
+    np.testing.assert_allclose(stack.radius(), np.hypot(ps_sections['x'], ps_sections['y']))
+
+
+def test_extend_sections_to_radius(vki_sections):
+    ps_sections = vki_sections[0]
+    r_first = np.min(np.hypot(ps_sections[0]['x'], ps_sections[0]['y']))
+
+    assert geom.extend_sections_to_radius(ps_sections, r_first + 0.01) is ps_sections
+
+    extended = geom.extend_sections_to_radius(ps_sections, r_first - 0.01)
+    assert extended.shape == (ps_sections.shape[0] + 1, ps_sections.shape[1])
+    assert np.min(np.hypot(extended[0]['x'], extended[0]['y'])) == pytest.approx(r_first - 0.011)
+    np.testing.assert_array_equal(extended[1:], ps_sections)
+
+
+def test_resample():
+    from scipy.signal import resample
+
+    x = np.sin(np.linspace(0.0, 3.0, 397)) + np.linspace(0.0, 1.0, 397) ** 2
+    for num in [100, 200, 201, 397, 800]:
+        np.testing.assert_allclose(geom.resample(x, num), resample(x, num), atol=1e-12)
+
+
+def test_calculate_curvature():
+    t = np.linspace(0.0, np.pi, 200)
+    x, y = 2.0 * np.cos(t), 2.0 * np.sin(t)
+
+    assert np.allclose(geom.calculate_curvature(x, y)[2:-2], 0.5, rtol=1e-3)
+    assert np.allclose(geom.calculate_curvature(x[::-1], y[::-1])[2:-2], -0.5, rtol=1e-3)
+    assert np.allclose(geom.calculate_curvature(x, y, np.zeros_like(x))[2:-2], 0.5, rtol=1e-3)
+    assert np.allclose(geom.calculate_curvature(np.stack((x, 2 * x)), np.stack((y, 2 * y)))[:, 2:-2],
+                       [[0.5], [0.25]], rtol=1e-3)
+
+
+def test_decimate_curves(vki_sections):
+    ps_sections, _ = vki_sections
+    tolerance = 1e-5
+
+    idx, max_deviation = geom.decimate_curves(ps_sections, tolerance)
+
+    assert idx[0] == 0 and idx[-1] == ps_sections.shape[1] - 1
+    assert len(idx) < ps_sections.shape[1] / 4
+    assert max_deviation <= tolerance
+    for section in ps_sections:
+        xyz = np.stack((section['x'], section['y'], section['z']), axis=-1)
+        assert np.max(geom.spline_deviation(xyz, idx)) <= tolerance
+
+    # a straight line only needs its end points
+    line = np.linspace([0.0, 0.0, 0.0], [1.0, 2.0, 3.0], 50)
+    assert list(geom.decimate_curve(line, tolerance)) == [0, 49]
+
+    # a tolerance that can never be met is rejected rather than looping forever
+    for tolerance in [0.0, -1e-5]:
+        with pytest.raises(ValueError):
+            geom.decimate_curve(line, tolerance)
+        with pytest.raises(ValueError):
+            geom.decimate_curves(ps_sections, tolerance)
@@ -0,0 +1,50 @@
+"""Test functionality of protoblade's lod module."""
+import numpy as np
+import pytest
+from protoblade import blade, lod, machine
+
+
+def test_get_level():
+    assert lod.get_level('full').max_points == 0
+    with pytest.raises(ValueError) as excinfo:
+        lod.get_level('rough')
+    assert 'Invalid level of detail rough' in str(excinfo.value)
+
+
+def test_subsample():
+    np.testing.assert_array_equal(lod.subsample(5, 0), np.arange(5))
+    np.testing.assert_array_equal(lod.subsample(5, 10), np.arange(5))
+    np.testing.assert_array_equal(lod.subsample(11, 3), [0, 5, 10])
+    np.testing.assert_array_equal(lod.subsample(11, 1), [0, 10])
+
+
+def test_coarsen_blade(vki_sections):
+    ps_sections, ss_sections = vki_sections
+    blade_def = blade.Blade(name='stator', ps_sections=ps_sections, ss_sections=ss_sections, n_blade=100)
+
+    assert lod.coarsen_blade(blade_def, lod.LEVELS['full']) is blade_def
+
+    coarse = lod.coarsen_blade(blade_def, lod.LEVELS['coarse'])
+    assert coarse.ps_sections.shape == (3, 40)
+    assert coarse.ss_sections.shape == (3, 40)
+    assert (coarse.name, coarse.n_blade) == ('stator', 100)
+    # the leading and trailing edges are kept, so the sides still meet
+    np.testing.assert_array_equal(coarse.ps_sections[:, [0, -1]], ps_sections[:, [0, -1]])
+    np.testing.assert_array_equal(coarse.ss_sections[:, [0, -1]], ss_sections[:, [0, -1]])
+
+    level = lod.LevelOfDetail(max_sections=2)
+    np.testing.assert_array_equal(lod.coarsen_blade(blade_def, level).ps_sections, ps_sections[[0, -1]])
+
+
+def test_boolean_options():
+    boolean = machine.BooleanOptions(parallel=False, fuzzy=1e-7, glue='shift')
+    assert lod.boolean_options(boolean, lod.LEVELS['full'], 0.1) is boolean
+
+    coarse = lod.boolean_options(boolean, lod.LEVELS['coarse'], 0.1)
+    assert coarse.fuzzy == pytest.approx(1e-5)
+    assert (coarse.parallel, coarse.glue) == (False, 'shift')
+    assert boolean.fuzzy == 1e-7
+
+    # a looser tolerance set for the machine is kept
+    boolean.fuzzy = 1e-3
+    assert lod.boolean_options(boolean, lod.LEVELS['coarse'], 0.1) is boolean
@@ -9,3 +9,16 @@ def test_read_blade_configs(example_machine_configs,mocker):
     for config in example_machine_configs:
         obj = machine._read_toml(config)
         machine.Machine.from_config_file(config)
+
+
+def test_read_boolean_options(example_machine_configs,tmp_path,mocker):
+    mocker.patch('protoblade.geom.load_curves_from_fpd',return_value=np.zeros(10))
+    config = example_machine_configs[1]
+    config_with_options = tmp_path / 'with_boolean_options.toml'
+    options = "[machine.boolean]\nfuzzy = 1e-7\nglue = 'shift'\n\n[[stage]]"
+    config_with_options.write_text(config.read_text().replace('[[stage]]', options, 1))
+    default, with_options = [machine.Machine.from_config_file(fname) for fname in [config, config_with_options]]
+
+    assert (default.boolean.parallel, default.boolean.fuzzy, default.boolean.glue) == (True, 0.0, 'off')
+    assert (with_options.boolean.parallel, with_options.boolean.fuzzy, with_options.boolean.glue) == (True, 1e-7, 'shift')
+    assert with_options.boolean.summary() == 'parallel on, fuzzy tolerance 1e-07, glue shift'
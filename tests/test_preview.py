@@ -0,0 +1,70 @@
+"""Test functionality of protoblade's preview module."""
+import os
+import subprocess
+import sys
+from distutils.dir_util import copy_tree
+import numpy as np
+import pytest
+from protoblade import preview
+from protoblade.machine import Machine
+from protoblade.stage import Endwalls
+
+
+def test_create_preview(example_directory, tmp_path):
+    copy_tree(str(example_directory / 'axial_turbine'), str(tmp_path))
+    os.chdir(tmp_path)
+    machine = Machine.from_config_file('axial_turbine.toml')
+    endwalls = machine.stages[0].endwalls
+
+    curves = preview.create_preview(machine)
+
+    assert sorted(curves) == ['stage_1/hub', 'stage_1/shroud', 'stage_1/stator/midlines',
+                              'stage_1/stator/ps_sections', 'stage_1/stator/ss_sections']
+    assert len(curves['stage_1/stator/ps_sections']) == machine.stages[0].blades[0].ps_sections.shape[0]
+
+    z_min, z_max, _, _ = preview.endwall_extent(endwalls, machine.axis)
+    for midline in curves['stage_1/stator/midlines']:
+        assert midline.shape == (200, 3)
+        assert midline[0, 2] == pytest.approx(z_min)
+        assert midline[-1, 2] == pytest.approx(z_max)
+
+
+def test_endwall_extent_of_step_file(vki_endwalls_step):
+    # the extent found by cadquery is (-0.02, 0.03, 0.1585, 0.2864)
+    endwalls = Endwalls(type='step', step_fname=str(vki_endwalls_step))
+
+    extent = preview.endwall_extent(endwalls, ((0.0, 0.0, 0.0), (0.0, 0.0, 1.0)))
+
+    assert extent == pytest.approx((-0.02, 0.03, 0.1585, 0.2864))
+
+
+def test_write_preview(tmp_path):
+    curves = {'a': [np.zeros((3, 3)), np.ones((3, 3))], 'b': [np.zeros((2, 3)), np.ones((4, 3))]}
+
+    preview.write_preview(str(tmp_path / 'preview.npz'), curves)
+    data = np.load(tmp_path / 'preview.npz')
+    assert sorted(data) == ['a', 'b/0', 'b/1']
+    np.testing.assert_array_equal(data['a'][1], curves['a'][1])
+    np.testing.assert_array_equal(data['b/1'], curves['b'][1])
+
+    preview.write_preview(str(tmp_path / 'preview.vtk'), curves)
+    with open(tmp_path / 'preview.vtk') as f:
+        text = f.read()
+    assert 'POINTS 12 double' in text
+    assert 'LINES 4 16' in text
+    assert '4 8 9 10 11' in text
+    assert text.endswith('0\n0\n1\n1\n')
+
+    with pytest.raises(ValueError):
+        preview.write_preview(str(tmp_path / 'preview.step'), curves)
+
+
+def test_preview_does_not_import_cadquery(example_directory, tmp_path):
+    copy_tree(str(example_directory / 'axial_turbine'), str(tmp_path))
+    code = ("import sys; from protoblade.__main__ import create_preview; "
+            "create_preview('axial_turbine.toml'); assert 'cadquery' not in sys.modules")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+    subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env, check=True)
+
+    assert (tmp_path / 'axial_turbine-preview.vtk').is_file()
@@ -0,0 +1,57 @@
+"""Test functionality of protoblade's profiling module."""
+import json
+import pytest
+from protoblade import profiling
+
+
+class _Shape:
+    def Faces(self):
+        return [1, 2, 3]
+
+    def Edges(self):
+        return [1, 2]
+
+
+def test_profiler_records_nested_steps():
+    profiler = profiling.Profiler(label='stage_1/stator')
+
+    with profiler.step('outer', lambda: _Shape()):
+        with profiler.step('inner'):
+            data = [0.0] * 100000
+        del data
+
+    inner, outer = profiler.profile.steps
+    assert (inner.name, outer.name) == ('inner', 'outer')
+    assert outer.label == 'stage_1/stator'
+    assert outer.wall_time >= inner.wall_time
+    assert outer.peak_memory >= inner.peak_memory > 0
+    assert (outer.n_faces, outer.n_edges) == (3, 2)
+    assert (inner.n_faces, inner.n_edges) == (-1, -1)
+
+
+def test_profile_write(tmp_path):
+    profiler = profiling.Profiler(label='machine')
+    with profiler.step('load_machine'):
+        pass
+
+    other = profiling.Profiler(label='stage_1/stator')
+    with other.step('extrude_blade'):
+        pass
+    profiler.profile.extend(other.profile)
+
+    profiler.profile.write(tmp_path / 'profile.json')
+    with open(tmp_path / 'profile.json') as f:
+        steps = json.load(f)['steps']
+    assert [step['name'] for step in steps] == ['load_machine', 'extrude_blade']
+
+    profiler.profile.write(tmp_path / 'trace.json', 'chrome')
+    with open(tmp_path / 'trace.json') as f:
+        events = json.load(f)['traceEvents']
+    assert [event['tid'] for event in events] == ['machine', 'stage_1/stator']
+    assert all(event['ph'] == 'X' for event in events)
+
+    assert 'extrude_blade' in profiler.profile.summary()
+
+    with pytest.raises(ValueError) as excinfo:
+        profiler.profile.write(tmp_path / 'profile.txt', 'txt')
+    assert 'Invalid profile format' in str(excinfo.value)
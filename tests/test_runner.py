@@ -0,0 +1,176 @@
+"""Test functionality of protoblade's runner module."""
+import os
+import pathlib
+from distutils.dir_util import copy_tree
+import pytest
+from protoblade import runner, machine, stage, blade, cache
+from protoblade.__main__ import main
+from protoblade.cad import DomainCreator
+
+
+@pytest.fixture()
+def vki_machine(vki_sections):
+    ps_sections, ss_sections = vki_sections
+    endwalls = stage.Endwalls(type='step', step_fname='does_not_exist.step')
+    blades = [blade.Blade(name=name, ps_sections=ps_sections, ss_sections=ss_sections, n_blade=100)
+              for name in ['stator', 'rotor']]
+    stage_1 = stage.Stage(name='stage_1', endwalls=endwalls, blades=blades)
+    return machine.Machine(name='vki', units='metres', axis=((0.0, 0.0, 0.0), (0.0, 0.0, 1.0)), stages=[stage_1])
+
+
+def test_create_jobs(vki_machine):
+    jobs = runner.create_jobs(vki_machine, 'vki.step')
+    assert [job.fname_out for job in jobs] == ['vki-stage_1-stator.step', 'vki-stage_1-rotor.step']
+
+    jobs = runner.create_jobs(vki_machine, pathlib.Path('out') / 'vki.step')
+    assert [job.fname_out for job in jobs] == ['vki-stage_1-stator.step', 'vki-stage_1-rotor.step']
+    assert [job.lod for job in jobs] == ['full', 'full']
+
+
+def test_run_job_with_lod(vki_machine, mocker):
+    create_domain = mocker.patch('protoblade.cad.DomainCreator.create_domain', autospec=True)
+    mocker.patch('protoblade.cad.DomainCreator.export')
+    job = runner.create_jobs(vki_machine, 'vki.step', lod='coarse')[0]
+
+    assert runner.run_job(job).success
+    assert create_domain.call_args[0][0].lod == 'coarse'
+
+
+def test_run_job_with_threads(vki_machine, vki_endwalls, mocker):
+    create_midlines = mocker.patch('protoblade.geom.create_midlines', side_effect=RuntimeError('midlines'))
+    job = runner.create_jobs(vki_machine, 'vki.step')[0]
+    hub, shroud = vki_endwalls
+    job.endwalls = stage.Endwalls(hub=hub, shroud=shroud, type='fpd')
+    job.threads = 2
+
+    assert not runner.run_job(job).success
+    assert create_midlines.call_args[1]['workers'] == 2
+
+
+def test_main_default_manifest(example_directory, tmp_path, mocker):
+    mocker.patch.object(runner, 'run_jobs', return_value=[])
+    create_jobs = mocker.patch.object(runner, 'create_jobs', return_value=[])
+    copy_tree(str(example_directory / 'axial_turbine'), str(tmp_path))
+    os.chdir(tmp_path)
+
+    main('axial_turbine.toml', tmp_path / 'final.step', preflight=False)
+    assert create_jobs.call_args[1]['manifest'] == str(tmp_path / 'final-exports.json')
+
+    # an output which is not a file name has no manifest
+    main('axial_turbine.toml', mocker.sentinel.output, preflight=False)
+    assert not create_jobs.call_args[1]['manifest']
+
+
+def test_run_jobs_reports_errors(vki_machine, mocker):
+    mocker.patch('protoblade.cad.DomainCreator.create_domain', side_effect=RuntimeError('boolean failed'))
+    jobs = runner.create_jobs(vki_machine, 'vki.step')
+
+    results = runner.run_jobs(jobs, n_jobs=1)
+
+    assert [result.blade_name for result in results] == ['stator', 'rotor']
+    assert not any(result.success for result in results)
+    assert 'boolean failed' in results[0].error
+
+    summary = runner.summarise(results)
+    assert 'stage_1/stator: FAILED' in summary
+    assert '0 of 2 domains created successfully' in summary
+
+
+def test_run_job_with_passages(vki_machine, mocker):
+    create_passages = mocker.patch('protoblade.cad.DomainCreator.create_passages')
+    export = mocker.patch('protoblade.cad.DomainCreator.export')
+    job = runner.create_jobs(vki_machine, 'vki.step', passages=0, fuse_passages=True)[0]
+
+    result = runner.run_job(job)
+
+    assert result.success
+    assert result.passages == 100
+    create_passages.assert_called_once_with(100, True)
+    export.assert_called_once_with('passages', 'vki-stage_1-stator.step', None)
+    assert '(100 passages)' in runner.summarise([result])
+
+
+def test_run_job_exports_several_entities(vki_machine, mocker):
+    mocker.patch('protoblade.cad.DomainCreator.create_domain')
+    extrude_blade = mocker.patch('protoblade.cad.DomainCreator.extrude_blade')
+    export_all = mocker.patch('protoblade.cad.DomainCreator.export_all', return_value={'domain': True, 'blade': True})
+    job = runner.create_jobs(vki_machine, 'vki.brep', entities=['domain', 'blade'], tolerance=1e-4)[0]
+    assert job.fname_out == 'vki-stage_1-stator.brep'
+
+    result = runner.run_job(job)
+
+    assert result.success and not result.skipped
+    assert extrude_blade.call_count == 1
+    export_all.assert_called_once_with({'domain': 'vki-stage_1-stator.brep', 'blade': 'vki-stage_1-stator-blade.brep'},
+                                       None)
+    assert 'vki-stage_1-stator.brep, vki-stage_1-stator-blade.brep' in runner.summarise([result])
+
+    job.passages = 3
+    assert runner.export_filenames(job) == {'passages': 'vki-stage_1-stator.brep',
+                                            'blade': 'vki-stage_1-stator-blade.brep'}
+
+
+def test_run_job_skips_unchanged_output(vki_machine, vki_endwalls, tmp_path, mocker):
+    create_domain = mocker.patch('protoblade.cad.DomainCreator.create_domain')
+    job = runner.create_jobs(vki_machine, str(tmp_path / 'vki.step'), manifest=tmp_path / 'exports.json')[0]
+    hub, shroud = vki_endwalls
+    job.endwalls = stage.Endwalls(hub=hub, shroud=shroud, type='fpd')
+    assert not runner.is_current(job)
+
+    # an earlier run exported the domain from the same inputs
+    pathlib.Path(job.fname_out).write_text('domain')
+    creator = DomainCreator(job.blade_def, job.endwalls, job.units, job.axis)
+    cache.ExportManifest(job.manifest).record(job.fname_out, creator.export_key('domain', job.fname_out), {})
+    assert runner.is_current(job)
+
+    result = runner.run_job(job)
+    assert result.success and result.skipped
+    assert create_domain.call_count == 0
+    assert 'stage_1/stator: unchanged' in runner.summarise([result])
+
+    job.blade_def = blade.Blade(name='stator', ps_sections=job.blade_def.ps_sections,
+                                ss_sections=job.blade_def.ss_sections, n_blade=50)
+    assert not runner.is_current(job)
+
+
+def test_share_stage_endwalls(vki_machine, mocker):
+    create_stage_endwalls = mocker.patch('protoblade.cad.create_stage_endwalls', return_value=('endwalls', (0.2, 0.3)))
+    jobs = runner.create_jobs(vki_machine, 'vki.step')
+
+    runner.share_stage_endwalls(jobs)
+
+    create_stage_endwalls.assert_called_once()
+    for job in jobs:
+        assert job.cad_endwalls == 'endwalls'
+        assert job.endwall_extent == (0.2, 0.3)
+
+
+def test_share_stage_endwalls_failure(vki_machine):
+    jobs = runner.create_jobs(vki_machine, 'vki.step')
+
+    runner.share_stage_endwalls(jobs)
+
+    assert all(job.cad_endwalls is None for job in jobs)
+
+
+def test_run_jobs_in_process_pool(vki_machine, vki_endwalls, tmp_path):
+    jobs = runner.create_jobs(vki_machine, str(tmp_path / 'vki.step'), manifest=tmp_path / 'exports.json')
+
+    # the stator was exported by an earlier run, so its worker succeeds without any CAD
+    hub, shroud = vki_endwalls
+    jobs[0].endwalls = stage.Endwalls(hub=hub, shroud=shroud, type='fpd')
+    pathlib.Path(jobs[0].fname_out).write_text('domain')
+    creator = DomainCreator(jobs[0].blade_def, jobs[0].endwalls, jobs[0].units, jobs[0].axis)
+    cache.ExportManifest(jobs[0].manifest).record(jobs[0].fname_out,
+                                                  creator.export_key('domain', jobs[0].fname_out), {})
+
+    results = runner.run_jobs(jobs, n_jobs=2)
+
+    # the cores are shared out between the two processes
+    assert [job.threads for job in jobs] == [max(1, (os.cpu_count() or 1) // 2)] * 2
+    assert [result.fname_out for result in results] == [job.fname_out for job in jobs]
+    assert results[0].success and results[0].skipped
+    assert results[0].boolean == jobs[0].boolean.summary()
+    # the rotor fails in its worker on the missing endwall file, rather than in the pool
+    assert not results[1].success
+    assert 'does_not_exist.step' in results[1].error
@@ -0,0 +1,105 @@
+"""Test functionality of protoblade's sweep module."""
+import json
+import pytest
+import numpy as np
+from protoblade import sweep, runner, machine, stage, blade
+
+
+@pytest.fixture()
+def vki_machine(vki_sections, vki_endwalls):
+    ps_sections, ss_sections = vki_sections
+    hub, shroud = vki_endwalls
+    endwalls = stage.Endwalls(hub=hub, shroud=shroud, type='fpd')
+    blades = [blade.Blade(name=name, ps_sections=ps_sections, ss_sections=ss_sections, n_blade=100)
+              for name in ['stator', 'rotor']]
+    stage_1 = stage.Stage(name='stage_1', endwalls=endwalls, blades=blades)
+    return machine.Machine(name='vki', units='metres', axis=((0.0, 0.0, 0.0), (0.0, 0.0, 1.0)), stages=[stage_1])
+
+
+def write_sweep(tmp_path, mode, parameters):
+    fname = tmp_path / 'sweep.toml'
+    lines = ['[sweep]', f"mode = '{mode}'", '[sweep.parameters]']
+    lines += [f'"{path}" = {values}' for path, values in parameters.items()]
+    fname.write_text('\n'.join(lines))
+    return fname
+
+
+def test_load_sweep(tmp_path):
+    parameters = {'stage_1.stator.n_blade': [50, 60, 70], 'stage_1.stator.section_offset': [0.0, 0.001]}
+
+    variants = sweep.load_sweep(write_sweep(tmp_path, 'grid', parameters))
+    assert [variant.name for variant in variants] == ['v0', 'v1', 'v2', 'v3', 'v4', 'v5']
+    assert variants[1].overrides == {'stage_1.stator.n_blade': 50, 'stage_1.stator.section_offset': 0.001}
+
+    with pytest.raises(ValueError):
+        sweep.load_sweep(write_sweep(tmp_path, 'zip', parameters))
+
+    parameters['stage_1.stator.section_offset'].append(0.002)
+    variants = sweep.load_sweep(write_sweep(tmp_path, 'zip', parameters))
+    assert [variant.overrides['stage_1.stator.n_blade'] for variant in variants] == [50, 60, 70]
+
+    with pytest.raises(ValueError):
+        sweep.load_sweep(write_sweep(tmp_path, 'grid', {'stage_1.stator.chord': [1.0]}))
+
+
+def test_apply_overrides(vki_machine):
+    overrides = {'stage_1.rotor.n_blade': 50, 'stage_1.rotor.section_offset': 0.01}
+
+    new = sweep.apply_overrides(vki_machine, overrides)
+
+    stator, rotor = new.stages[0].blades
+    assert new.stages[0].endwalls is vki_machine.stages[0].endwalls
+    assert stator is vki_machine.stages[0].blades[0]
+    assert rotor.n_blade == 50
+    assert vki_machine.stages[0].blades[1].n_blade == 100
+    assert np.allclose(rotor.ps_sections['z'], vki_machine.stages[0].blades[1].ps_sections['z'] + 0.01)
+    assert np.array_equal(rotor.ss_sections['x'], vki_machine.stages[0].blades[1].ss_sections['x'])
+
+    with pytest.raises(ValueError):
+        sweep.apply_overrides(vki_machine, {'stage_1.fan.n_blade': 50})
+
+
+def test_run_sweep(vki_machine, tmp_path, mocker):
+    mocker.patch('protoblade.cad.create_stage_endwalls', return_value=('endwalls', (0.2, 0.3)))
+    mocker.patch('protoblade.cad.DomainCreator.create_domain')
+    mocker.patch('protoblade.cad.DomainCreator.export')
+    run_job = mocker.spy(runner, 'run_job')
+    variants = [sweep.Variant(name=f'v{n_blade}', overrides={'stage_1.stator.n_blade': n_blade})
+                for n_blade in [50, 60]]
+    manifest = tmp_path / 'manifest.json'
+
+    results = sweep.run_sweep(vki_machine, variants, 'vki.step', manifest=str(manifest))
+
+    assert [result.fname_out for result in results] == ['vki-v50-stage_1-stator.step', 'vki-v50-stage_1-rotor.step',
+                                                        'vki-v60-stage_1-stator.step', 'vki-v60-stage_1-rotor.step']
+    assert all(result.success for result in results)
+
+    # every job shares the same creators so unchanged products are reused
+    creators = {id(call.args[1]) for call in run_job.call_args_list}
+    assert len(creators) == 1
+    assert len(run_job.call_args_list[0].args[1]) == 2
+
+    data = json.loads(manifest.read_text())
+    assert [variant['name'] for variant in data['variants']] == ['v50', 'v60']
+    assert data['variants'][0]['overrides'] == {'stage_1.stator.n_blade': 50}
+    assert data['variants'][1]['outputs'][0]['fname_out'] == 'vki-v60-stage_1-stator.step'
+
+
+def test_run_sweep_output_names(vki_machine, mocker):
+    run_jobs = mocker.patch.object(runner, 'run_jobs', return_value=[])
+    variants = [sweep.Variant(name=f'v{n_blade}', overrides={'stage_1.stator.n_blade': n_blade})
+                for n_blade in [50, 60]]
+
+    # only the suffix of the output is replaced, whatever its format
+    sweep.run_sweep(vki_machine, variants, 'out.step/vki.brep')
+    assert [job.fname_out for job in run_jobs.call_args[0][0]] == [
+        'out.step/vki-v50-stage_1-stator.brep', 'out.step/vki-v50-stage_1-rotor.brep',
+        'out.step/vki-v60-stage_1-stator.brep', 'out.step/vki-v60-stage_1-rotor.brep']
+
+
+def test_create_batches(vki_machine):
+    variants = [sweep.apply_overrides(vki_machine, {'stage_1.stator.n_blade': n_blade}) for n_blade in range(4)]
+    jobs = [job for variant in variants for job in runner.create_jobs(variant, 'vki.step')]
+
+    assert runner._create_batches(jobs, 2) == [[0, 2, 4, 6], [1, 3, 5, 7]]
+    assert runner._create_batches(jobs, 4) == [[0, 2], [4, 6], [1, 3], [5, 7]]